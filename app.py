@@ -1,15 +1,26 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import os
 from pathlib import Path
 import sys
+import hashlib
+import uuid
+import threading
+from datetime import date
 from utils import (
     extract_exif_metadata,
     compute_hilal_position,
     predict_hilal_visibility,
     get_weather,
     calculate_moon_phase,
+    load_ephemeris,
+    calculate_moon_phases,
     get_moon_phase_name,
+    get_astro_cache_stats,
+    get_islamic_calendar_info,
 )
+from pipeline import run_stages
+from preview import get_preview
 
 
 # Panggil ini PALING ATAS, sebelum Streamlit lain
@@ -24,45 +35,204 @@ st.set_page_config(
     }
 )
 
+# --- Cache: resource dipakai bersama seluruh sesi, data dikunci hash unggahan + parameter ---
+@st.cache_resource(show_spinner=False)
+def get_ephemeris():
+    return load_ephemeris()
+
+@st.cache_resource(show_spinner=False)
+def get_weather_client():
+    from weather import get_default_client
+    return get_default_client()
+
+@st.cache_resource(show_spinner="Memuat model deteksi...")
+def get_detection_model(model_path="best.pt"):
+    from detect import load_model
+    return load_model(model_path)
+
+def _start_background_services():
+    try:
+        from weather_prefetch import start_weather_prefetcher
+        start_weather_prefetcher()
+    except Exception as e:
+        print(f"Weather prefetcher unavailable: {e}")
+    try:
+        from visibility_cache import start_background_precompute
+        start_background_precompute()
+    except Exception as e:
+        print(f"Visibility precompute unavailable: {e}")
+    try:
+        # Tabel ijtima' dibangun di sini, bukan di thread skrip saat sidebar dirender
+        from hijri import load_new_moon_table
+        load_new_moon_table()
+    except Exception as e:
+        print(f"New moon table unavailable: {e}")
+
+@st.cache_resource(show_spinner=False)
+def start_background_services():
+    """
+    Prefetch cuaca, precompute peta visibilitas dan tabel ijtima', sekali per proses.
+    Impor modulnya (requests, skyfield) dilakukan di thread latar belakang
+    agar tidak menunda tampilan halaman pertama.
+    """
+    thread = threading.Thread(target=_start_background_services, daemon=True, name="background-services")
+    thread.start()
+    return thread
+
+UPLOAD_DIR = Path("assets") / "uploads"
+
+def save_upload(uploaded, directory=UPLOAD_DIR):
+    """
+    Simpan unggahan dengan nama dari hash isinya, sehingga sesi lain dengan
+    file berbeda tidak pernah menimpa path yang sama.
+    Returns: (hash SHA-1 isi file = kunci cache data, path file)
+    """
+    data = uploaded.getbuffer()
+    digest = hashlib.sha1(data).hexdigest()
+    path = Path(directory) / f"{digest}{Path(uploaded.name).suffix.lower()}"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    return digest, path
+
+@st.cache_data(show_spinner=False)
+def cached_exif_metadata(digest, _path):
+    return extract_exif_metadata(_path)
+
+@st.cache_data(show_spinner=False)
+def cached_hilal_position(dt, lat, lon):
+    get_ephemeris()
+    return compute_hilal_position(dt, lat, lon)
+
+@st.cache_data(show_spinner=False)
+def cached_hilal_visibility(dt, lat, lon):
+    return predict_hilal_visibility(dt, lat, lon)
+
+@st.cache_data(show_spinner=False)
+def cached_moon_phase(dt):
+    return calculate_moon_phase(dt)
+
+@st.cache_data(show_spinner=False, ttl=600)
+def cached_weather(lat, lon):
+    get_weather_client()
+    return get_weather(lat, lon)
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def cached_islamic_calendar_info(day):
+    return get_islamic_calendar_info(day)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_detection(digest, model_path, _save_path):
+    from detect import detect_image
+    get_detection_model(model_path)
+    return detect_image(str(_save_path), model_path)
+
+SESSION_DETECTIONS = 4
+
+def session_video_detection(digest, model_path, save_path, preview_callback, **options):
+    """
+    Deteksi video dengan preview langsung, tanpa st.cache_data (callback menulis
+    ke placeholder Streamlit). Hasil lengkap disimpan per sesi menurut digest.
+    """
+    key = (digest, model_path, tuple(sorted(options.items())))
+    results = st.session_state.setdefault("video_detections", {})
+    if key in results:
+        return results[key]
+    from detect import detect_video
+    get_detection_model(model_path)
+    result = detect_video(str(save_path), model_path, preview_callback=preview_callback, **options)
+    if not result.aborted:
+        results[key] = result
+        while len(results) > SESSION_DETECTIONS:
+            results.pop(next(iter(results)))
+    return result
+
+# Batas tunggu (detik) agar worker yang dihentikan sempat mengembalikan hasil parsial
+DETECTION_STOP_GRACE = 10.0
+
+def request_detection_abort():
+    st.session_state["abort_notice"] = True
+
+def with_script_context(stages):
+    """
+    Bawa konteks sesi Streamlit ke thread pipeline agar st.cache_data berfungsi di sana
+    """
+    ctx = get_script_run_ctx()
+
+    def bind(func):
+        def run():
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return func()
+        return run
+
+    return {name: bind(func) for name, func in stages.items()}
+
 st.title("Sistem Deteksi Hilal")
 
 uploaded_file = st.file_uploader("Unggah Gambar Hilal", type=["jpg", "jpeg", "png"])
 
 if uploaded_file:
-    with open("temp.jpg", "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    upload_digest, upload_path = save_upload(uploaded_file)
 
     # --- Ekstraksi metadata EXIF ---
-    camera, dt, gps_lat, gps_lon = extract_exif_metadata("temp.jpg")
+    camera, dt, gps_lat, gps_lon = cached_exif_metadata(upload_digest, str(upload_path))
 
     st.subheader("📷 Metadata Foto")
     st.write(f"Perangkat/Kamera: {camera}")
     st.write(f"Waktu Pengambilan: {dt if dt else 'Tidak tersedia'}")
     st.write(f"Latitude: {gps_lat if gps_lat is not None else 'Tidak tersedia'}")
     st.write(f"Longitude: {gps_lon if gps_lon is not None else 'Tidak tersedia'}")
+    if gps_lat is not None and gps_lon is not None:
+        try:
+            from locations import find_nearest_post
+            post = find_nearest_post(gps_lat, gps_lon)
+            st.write(f"Pos/Kota Terdekat: {post['name']} ({post['distance_km']} km)")
+        except Exception as e:
+            st.caption(f"Pencarian pos terdekat gagal: {e}")
 
     # --- Auto-Deteksi Lokasi & Posisi Hilal ---
     if dt and gps_lat is not None and gps_lon is not None:
-        alt, az = compute_hilal_position(dt, gps_lat, gps_lon)
-        st.subheader("🌙 Posisi Hilal (Otomatis)")
-        st.write(f"Altitud: {alt:.2f}°")
-        st.write(f"Azimut: {az:.2f}°")
-
-        visibility = predict_hilal_visibility(dt, gps_lat, gps_lon)
-        st.subheader("🔮 Prediksi Visibilitas Hilal")
-        st.write(visibility)
-
-        # --- Kecerlangan Langit (Estimasi) ---
-        weather = get_weather(gps_lat, gps_lon)
-        st.subheader("🌤️ Data Cuaca & Kecerlangan Langit")
-        st.write(weather)
-
-        # --- Fase Bulan ---
-        moon_phase = calculate_moon_phase(dt)
-        st.subheader("🌗 Fase Bulan")
-        st.write(f"Fase: {moon_phase['phase_name']}")
-        st.write(f"Derajat Fase: {moon_phase['phase_degrees']}°")
-        st.write(f"Iluminasi: {moon_phase['illumination']}%")
+        # Posisi, visibilitas, cuaca dan fase dihitung bersamaan; panel diisi saat hasil tiba
+        panels = {name: st.empty() for name in ("position", "visibility", "weather", "phase")}
+        observation_stages = {
+            "position": lambda: cached_hilal_position(dt, gps_lat, gps_lon),
+            "visibility": lambda: cached_hilal_visibility(dt, gps_lat, gps_lon),
+            "weather": lambda: cached_weather(gps_lat, gps_lon),
+            "phase": lambda: cached_moon_phase(dt),
+        }
+        for result in run_stages(with_script_context(observation_stages)):
+            with panels[result.name].container():
+                if not result.ok:
+                    st.warning(f"⚠️ {result.name}: {result.error}")
+                elif result.name == "position":
+                    alt, az = result.value
+                    st.subheader("🌙 Posisi Hilal (Otomatis)")
+                    st.write(f"Altitud: {alt:.2f}°")
+                    st.write(f"Azimut: {az:.2f}°")
+                elif result.name == "visibility":
+                    st.subheader("🔮 Prediksi Visibilitas Hilal")
+                    st.write(result.value)
+                elif result.name == "weather":
+                    # --- Kecerlangan Langit (Estimasi) ---
+                    st.subheader("🌤️ Data Cuaca & Kecerlangan Langit")
+                    st.write(result.value)
+                elif result.name == "phase":
+                    # --- Fase Bulan ---
+                    moon_phase = result.value
+                    st.subheader("🌗 Fase Bulan")
+                    st.write(f"Fase: {moon_phase['phase_name']}")
+                    st.write(f"Derajat Fase: {moon_phase['phase_degrees']}°")
+                    st.write(f"Iluminasi: {moon_phase['illumination']}%")
+
+                    try:
+                        import pandas as pd
+                        days = pd.date_range(pd.Timestamp(dt).normalize() - pd.Timedelta(days=15), periods=31, freq="D")
+                        phases = calculate_moon_phases(days)
+                        st.line_chart(pd.DataFrame({"Iluminasi (%)": phases["illumination"]}, index=days))
+                    except Exception as e:
+                        st.caption(f"Grafik fase tidak tersedia: {e}")
     else:
         st.warning(
             "Metadata EXIF tidak tersedia atau tidak lengkap pada gambar yang diunggah. "
@@ -70,14 +240,14 @@ if uploaded_file:
         )
 
     # --- Preview gambar ---
-    st.image("temp.jpg", caption="Gambar Hilal yang Diupload", use_column_width=True)
+    st.image(get_preview(str(upload_path)), caption="Gambar Hilal yang Diupload", use_column_width=True)
 
 # Add current directory to path
 sys.path.append(str(Path(__file__).parent))
 
 # Import dengan error handling
 try:
-    from detect import detect_image, detect_video
+    from detect import rethreshold_detections
     DETECTION_AVAILABLE = True
 except ImportError as e:
     st.error(f"Error importing modules: {e}")
@@ -88,23 +258,10 @@ assets_dir = Path("assets")
 assets_dir.mkdir(exist_ok=True)
 
 # Predefined cities in Indonesia
-CITIES = {
-    "Jakarta": {"lat": -6.2088, "lon": 106.8456, "timezone": "WIB"},
-    "Surabaya": {"lat": -7.2575, "lon": 112.7521, "timezone": "WIB"},
-    "Bandung": {"lat": -6.9175, "lon": 107.6191, "timezone": "WIB"},
-    "Medan": {"lat": 3.5952, "lon": 98.6722, "timezone": "WIB"},
-    "Semarang": {"lat": -6.9667, "lon": 110.4167, "timezone": "WIB"},
-    "Makassar": {"lat": -5.1477, "lon": 119.4327, "timezone": "WITA"},
-    "Palembang": {"lat": -2.9761, "lon": 104.7754, "timezone": "WIB"},
-    "Bandar Lampung": {"lat": -5.4292, "lon": 105.2610, "timezone": "WIB"},
-    "Denpasar": {"lat": -8.6705, "lon": 115.2126, "timezone": "WITA"},
-    "Balikpapan": {"lat": -1.2379, "lon": 116.8529, "timezone": "WITA"},
-    "Pontianak": {"lat": -0.0263, "lon": 109.3425, "timezone": "WIB"},
-    "Manado": {"lat": 1.4748, "lon": 124.8421, "timezone": "WIT"},
-    "Yogyakarta": {"lat": -7.7956, "lon": 110.3695, "timezone": "WIB"},
-    "Malang": {"lat": -7.9797, "lon": 112.6304, "timezone": "WIB"},
-    "Padang": {"lat": -0.9471, "lon": 100.4172, "timezone": "WIB"}
-}
+from locations import CITIES, register_post
+
+# Hangatkan cache cuaca menjelang maghrib dan peta visibilitas (sekali per proses)
+start_background_services()
 
 # Custom CSS for astronomical theme
 st.markdown("""
@@ -277,6 +434,19 @@ with st.sidebar:
     - **> 21.5**: 🌌 Dark Sky (Excellent)
     """)
     
+    st.markdown("---")
+    st.markdown("### 🕌 Kalender Hijriah")
+    try:
+        hijri_info = cached_islamic_calendar_info(date.today())
+        if "hijri_day" in hijri_info:
+            st.markdown(f"**{hijri_info['hijri_day']} {hijri_info['month_name']} {hijri_info['hijri_year']} H**")
+            st.markdown(f"Ijtima' berikutnya: {hijri_info['next_ijtima']}")
+        else:
+            st.markdown(f"**{hijri_info['estimated_month']} {hijri_info['estimated_hijri_year']} H** (perkiraan)")
+        st.caption(hijri_info["note"])
+    except Exception as e:
+        st.caption(f"Kalender tidak tersedia: {e}")
+    
     st.markdown("---")
     st.markdown("### 🎯 Detection Classes")
     st.markdown("""
@@ -303,7 +473,14 @@ with col1:
         # Preview media dalam container yang lebih menarik
         with st.container():
             if media_file.type.startswith("image"):
-                st.image(media_file, caption="🖼️ Preview - Ready for Analysis", use_column_width=True)
+                media_preview_digest, media_preview_path = save_upload(media_file)
+                if uploaded_file and media_preview_digest == upload_digest:
+                    st.caption("🖼️ Preview - sama dengan gambar yang diunggah di atas")
+                else:
+                    st.image(
+                        get_preview(str(media_preview_path)),
+                        caption="🖼️ Preview - Ready for Analysis", use_column_width=True
+                    )
             else:
                 st.video(media_file)
 
@@ -426,6 +603,16 @@ if lat and lon:
         lon_float = float(lon)
         st.success(f"✅ **Coordinates Set:** {lat_float}°, {lon_float}°")
         
+        # Pos manual ikut di-prefetch cuacanya menjelang maghrib, hanya jika disimpan
+        if location_mode == "🎯 Koordinat Manual":
+            post_name = f"Manual {lat_float:.2f},{lon_float:.2f}"
+            if st.button("📌 Simpan sebagai pos observasi", help="Cuaca pos ini diperbarui otomatis menjelang maghrib"):
+                saved_post = (round(lat_float, 4), round(lon_float, 4))
+                if st.session_state.get("saved_post") != saved_post:
+                    register_post(post_name, lat_float, lon_float)
+                    st.session_state["saved_post"] = saved_post
+                st.caption(f"Pos **{post_name}** disimpan untuk prefetch cuaca.")
+        
         # Tampilkan peta mini (placeholder)
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
@@ -447,6 +634,26 @@ detection_col1, detection_col2 = st.columns([1, 1])
 
 with detection_col1:
     process_button = st.button("🚀 Mulai Analisis Deteksi", type="primary")
+    
+    # Overlay klien: video asli + track deteksi, tanpa encode ulang di server
+    render_video = True
+    keyframe_interval = 1
+    best_frames = None
+    if media_file and not media_file.type.startswith("image"):
+        video_result_mode = st.radio(
+            "Mode hasil video:",
+            ["🎞️ Overlay di browser (cepat)", "🎬 Encode ulang dengan kotak"],
+            horizontal=True
+        )
+        render_video = video_result_mode == "🎬 Encode ulang dengan kotak"
+        keyframe_interval = st.select_slider(
+            "Deteksi setiap N frame (kotak di antaranya mengikuti optical flow):",
+            options=[1, 5, 10, 15, 30],
+            value=1,
+            help="N > 1 memangkas inferensi; deteksi ulang otomatis jika flow tidak stabil"
+        )
+        if st.checkbox("🔍 Hanya frame tertajam per detik", help="Skor ketajaman + kontras langit; inferensi hanya pada frame terbaik"):
+            best_frames = st.slider("Frame terbaik per detik", 1, 10, 3)
 
 with detection_col2:
     if media_file:
@@ -454,6 +661,25 @@ with detection_col2:
     else:
         st.metric("Media Status", "⏳ Waiting")
 
+if st.session_state.pop("abort_notice", False):
+    st.info("⏹️ Deteksi video dihentikan oleh operator.")
+
+# Hasil parsial dari deteksi video yang dihentikan (disimpan sebelum rerun)
+partial_detection = st.session_state.pop("partial_detection", None)
+if partial_detection is not None:
+    partial_stats = partial_detection.stats
+    st.markdown("#### ⏹️ Hasil Parsial Deteksi")
+    partial_col1, partial_col2, partial_col3 = st.columns(3)
+    partial_col1.metric("🎯 Detections Found", partial_stats["total_detections"])
+    partial_col2.metric("🎞️ Frame dengan hilal", partial_stats["frames_with_detections"])
+    partial_col3.metric("🏆 Best Confidence", f"{partial_stats['max_confidence'] * 100:.1f}%")
+    if "candidates" in partial_detection.artifacts:
+        st.session_state["last_candidates"] = partial_detection.artifacts["candidates"]
+    if partial_detection.csv_path and os.path.exists(partial_detection.csv_path):
+        with open(partial_detection.csv_path, "rb") as f:
+            st.download_button("📊 Download Partial Data", f, file_name=Path(partial_detection.csv_path).name,
+                               mime="text/csv")
+
 if process_button:
     if not media_file:
         st.warning("⚠️ Please upload an image or video file first!")
@@ -483,88 +709,67 @@ if process_button:
             status_text.text(phases[1])
             progress_bar.progress(25)
             
-            save_path = assets_dir / media_file.name
-            with open(save_path, "wb") as f:
-                f.write(media_file.getbuffer())
+            media_digest, save_path = save_upload(media_file)
             
-            # Phase 2: Detection
+            # Phase 2: Deteksi dan cuaca berjalan bersamaan
             status_text.text(phases[2])
-            progress_bar.progress(50)
+            progress_bar.progress(40)
             
+            media_type = "image" if media_file.type.startswith("image") else "video"
+            stages = {}
+            live_preview = None
             if DETECTION_AVAILABLE:
-                status_text.text(phases[3])
-                progress_bar.progress(70)
-                
-                if media_file.type.startswith("image"):
-                    output_path, csv_path = detect_image(str(save_path), "best.pt")
-                else:
-                    output_path, csv_path = detect_video(str(save_path), "best.pt")
-                
-                status_text.text(phases[4])
-                progress_bar.progress(90)
-                
-                # Display results
-                if output_path and os.path.exists(output_path):
-                    status_text.text(phases[5])
-                    progress_bar.progress(100)
+                # Preview langsung untuk video: frame teranotasi + statistik berjalan
+                if media_type == "video":
+                    live_panel = st.empty()
+                    with live_panel.container():
+                        st.markdown("#### 🎬 Live Preview")
+                        live_image = st.empty()
+                        live_stats = st.empty()
+                        st.button("⏹️ Hentikan Deteksi", on_click=request_detection_abort)
                     
-                    st.success("🎉 **Detection Analysis Complete!**")
+                    # Worker hanya menaruh frame terbaru dan membaca event stop; semua
+                    # pemanggilan st dilakukan thread skrip (lihat show_live_preview)
+                    detection_job = {"stop": threading.Event(), "done": threading.Event(),
+                                     "preview": None, "shown": None, "result": None}
                     
-                    # Enhanced result display
-                    result_col1, result_col2 = st.columns([2, 1])
+                    def update_live_preview(frame, stats):
+                        detection_job["preview"] = (frame, stats)
+                        return not detection_job["stop"].is_set()
+                    live_preview = update_live_preview
                     
-                    with result_col1:
-                        st.markdown("#### 🎯 Detection Results")
-                        if media_file.type.startswith("image"):
-                            st.image(output_path, caption="🌙 Hilal Detection with Bounding Boxes", use_column_width=True)
-                        else:
-                            st.video(output_path)
+                    def show_live_preview():
+                        update = detection_job["preview"]
+                        if update is None or update is detection_job["shown"]:
+                            return
+                        detection_job["shown"] = update
+                        frame, stats = update
+                        live_image.image(frame, caption=f"Frame {stats['frame']}/{stats['total_frames']}")
+                        live_stats.markdown(
+                            f"**Deteksi:** {stats['detections']} | "
+                            f"**Frame dengan hilal:** {stats['frames_with_detections']} | "
+                            f"**Confidence tertinggi:** {stats['max_confidence'] * 100:.1f}%"
+                        )
                     
-                    with result_col2:
-                        st.markdown("#### 📈 Detection Statistics")
-                        
-                        # Parse CSV to show detection stats
-                        if csv_path and os.path.exists(csv_path):
-                            import pandas as pd
-                            try:
-                                df = pd.read_csv(csv_path)
-                                detection_count = len(df)
-                                if detection_count > 0:
-                                    avg_confidence = df['confidence'].mean() * 100
-                                    max_confidence = df['confidence'].max() * 100
-                                    
-                                    st.metric("🎯 Detections Found", detection_count)
-                                    st.metric("📊 Avg Confidence", f"{avg_confidence:.1f}%")
-                                    st.metric("🏆 Best Confidence", f"{max_confidence:.1f}%")
-                                else:
-                                    st.metric("🎯 Detections Found", "0")
-                                    st.info("No hilal detected in this image/video")
-                            except:
-                                st.warning("Unable to parse detection data")
-                        
-                        # Analysis summary
-                        st.markdown("#### 🌟 Analysis Summary")
-                        st.info(f"""
-                        **Media Type:** {media_file.type.split('/')[0].title()}  
-                        **File Size:** {len(media_file.getvalue()) / 1024:.1f} KB  
-                        **Processing:** YOLOv5 Neural Network  
-                        **Confidence Threshold:** 25%
-                        """)
+                    def run_video_detection():
+                        try:
+                            detection_job["result"] = session_video_detection(
+                                media_digest, "best.pt", save_path, live_preview,
+                                render=render_video, keyframe_interval=keyframe_interval, best_frames=best_frames
+                            )
+                            return detection_job["result"]
+                        finally:
+                            detection_job["done"].set()
                 
+                if live_preview is not None:
+                    stages["detection"] = run_video_detection
                 else:
-                    st.error("❌ Detection processing failed")
-            else:
-                st.warning("⚠️ Detection system unavailable - showing original file")
-                output_path = str(save_path)
-                csv_path = None
-                progress_bar.progress(100)
-                status_text.text("✅ File processed (detection unavailable)")
-                
-                # Show original file
-                if media_file.type.startswith("image"):
-                    st.image(output_path, caption="📷 Original Image (Detection Unavailable)", use_column_width=True)
-                else:
-                    st.video(output_path)
+                    stages["detection"] = lambda: cached_detection(media_digest, "best.pt", save_path)
+            if lat and lon:
+                stages["weather"] = lambda: cached_weather(lat, lon)
+            
+            # Panel diisi sesuai urutan hasil tiba, bukan urutan tahap
+            detection_panel = st.empty()
             
             # Enhanced Information Panels
             st.markdown("---")
@@ -594,34 +799,143 @@ if process_button:
                         break
             
             with info_col2:
-                # Weather information
-                if lat and lon:
-                    st.markdown("#### 🌤️ Kondisi Cuaca")
-                    try:
-                        status_text.text("🌡️ Retrieving weather data...")
-                        weather = get_weather(lat, lon)
-                        
-                        weather_metrics = [
-                            ("🌡️", "Temperature", f"{weather.get('suhu', 'N/A')}°C"),
-                            ("💧", "Humidity", f"{weather.get('kelembapan', 'N/A')}%"),
-                            ("☁️", "Condition", weather.get('cuaca', 'N/A'))
-                        ]
-                        
-                        for icon, label, value in weather_metrics:
-                            st.markdown(f"""
-                            <div style="display: flex; align-items: center; padding: 8px; background: rgba(255, 255, 255, 0.1); border-radius: 8px; margin: 5px 0;">
-                                <span style="font-size: 1.5em; margin-right: 10px;">{icon}</span>
-                                <div>
-                                    <strong>{label}:</strong> {value}
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                    except Exception as e:
-                        st.warning(f"⚠️ Weather data unavailable: {str(e)}")
-                else:
-                    st.info("📍 Set coordinates to view weather data")
+                weather_panel = st.empty()
+                if not (lat and lon):
+                    weather_panel.info("📍 Set coordinates to view weather data")
             
+            output_path, detection = None, None
+            weather = {}
+            
+            if not DETECTION_AVAILABLE:
+                output_path = str(save_path)
+                with detection_panel.container():
+                    st.warning("⚠️ Detection system unavailable - showing original file")
+                    
+                    # Show original file
+                    if media_type == "image":
+                        st.image(get_preview(output_path), caption="📷 Original Image (Detection Unavailable)", use_column_width=True)
+                    else:
+                        st.video(output_path)
+            else:
+                status_text.text(phases[3])
+            
+            completed = 0
+            live_poll = show_live_preview if live_preview is not None else None
+            # Deteksi video yang melewati batas waktu dihentikan (melepas lock model)
+            live_cancels = {"detection": detection_job["stop"].set} if live_preview is not None else None
+            try:
+                for result in run_stages(with_script_context(stages), poll=live_poll, cancels=live_cancels):
+                    completed += 1
+                    progress_bar.progress(40 + int(60 * completed / len(stages)))
+                
+                    if result.name == "detection":
+                        status_text.text(phases[4])
+                        if result.ok:
+                            detection = result.value
+                            output_path = detection.output_path
+                            if "candidates" in detection.artifacts:
+                                st.session_state["last_candidates"] = detection.artifacts["candidates"]
+                        if live_preview is not None:
+                            live_panel.empty()
+                    
+                        with detection_panel.container():
+                            # Display results
+                            if output_path and os.path.exists(output_path):
+                                st.success("🎉 **Detection Analysis Complete!**")
+                            
+                                # Enhanced result display
+                                result_col1, result_col2 = st.columns([2, 1])
+                            
+                                with result_col1:
+                                    st.markdown("#### 🎯 Detection Results")
+                                    if media_type == "image":
+                                        st.image(get_preview(output_path), caption="🌙 Hilal Detection with Bounding Boxes", use_column_width=True)
+                                    elif "track_json" in detection.artifacts:
+                                        from overlay_player import render_overlay_player
+                                        render_overlay_player(
+                                            output_path, detection.artifacts["track_json"], digest=media_digest
+                                        )
+                                    else:
+                                        st.video(output_path)
+                            
+                                with result_col2:
+                                    st.markdown("#### 📈 Detection Statistics")
+                                
+                                    # Statistik langsung dari hasil deteksi (tanpa membaca CSV)
+                                    if detection.model_available:
+                                        detection_stats = detection.stats
+                                        if detection_stats["total_detections"] > 0:
+                                            st.metric("🎯 Detections Found", detection_stats["total_detections"])
+                                            st.metric("📊 Avg Confidence", f"{detection_stats['avg_confidence'] * 100:.1f}%")
+                                            st.metric("🏆 Best Confidence", f"{detection_stats['max_confidence'] * 100:.1f}%")
+                                        else:
+                                            st.metric("🎯 Detections Found", "0")
+                                            st.info("No hilal detected in this image/video")
+                                    else:
+                                        st.warning("Detection model unavailable - no statistics")
+                                
+                                    # Analysis summary
+                                    st.markdown("#### 🌟 Analysis Summary")
+                                    st.info(f"""
+                                    **Media Type:** {media_file.type.split('/')[0].title()}  
+                                    **File Size:** {len(media_file.getvalue()) / 1024:.1f} KB  
+                                    **Processing:** YOLOv5 Neural Network ({detection.timings.get('total', 0):.1f} s)  
+                                    **Confidence Threshold:** {(detection.conf_threshold or 0.25) * 100:.0f}%
+                                    """)
+                                    if detection.timings.get("frames") and detection.timings.get("keyframes", 0) < detection.timings["frames"]:
+                                        st.caption(
+                                            f"🔑 YOLO dijalankan pada {detection.timings['keyframes']}/{detection.timings['frames']} frame"
+                                            + (f" ({detection.timings['forced_keyframes']} deteksi ulang karena drift)"
+                                               if "forced_keyframes" in detection.timings else "")
+                                        )
+                                    if detection.best_frames:
+                                        import pandas as pd
+                                        st.markdown("#### 🔍 Frame Terbaik")
+                                        best_df = pd.DataFrame(detection.best_frames)
+                                        st.dataframe(
+                                            best_df.sort_values("score", ascending=False).head(10)[
+                                                ["frame", "timestamp", "score", "sharpness", "contrast", "detections"]
+                                            ].round(2),
+                                            hide_index=True, use_container_width=True
+                                        )
+                            else:
+                                st.error(f"❌ Detection processing failed{': ' + str(result.error) if result.error else ''}")
+                
+                    elif result.name == "weather":
+                        with weather_panel.container():
+                            st.markdown("#### 🌤️ Kondisi Cuaca")
+                            if not result.ok:
+                                st.warning(f"⚠️ Weather data unavailable: {result.error}")
+                            else:
+                                weather = result.value or {}
+                            
+                                weather_metrics = [
+                                    ("🌡️", "Temperature", f"{weather.get('suhu', 'N/A')}°C"),
+                                    ("💧", "Humidity", f"{weather.get('kelembapan', 'N/A')}%"),
+                                    ("☁️", "Condition", weather.get('cuaca', 'N/A'))
+                                ]
+                            
+                                for icon, label, value in weather_metrics:
+                                    st.markdown(f"""
+                                    <div style="display: flex; align-items: center; padding: 8px; background: rgba(255, 255, 255, 0.1); border-radius: 8px; margin: 5px 0;">
+                                        <span style="font-size: 1.5em; margin-right: 10px;">{icon}</span>
+                                        <div>
+                                            <strong>{label}:</strong> {value}
+                                        </div>
+                                    </div>
+                                    """, unsafe_allow_html=True)
+            finally:
+                # Skrip berhenti sebelum deteksi selesai (tombol stop atau rerun lain memicu
+                # RerunException): hentikan worker dan simpan hasil parsialnya untuk run berikutnya
+                if live_preview is not None and not detection_job["done"].is_set():
+                    detection_job["stop"].set()
+                    if detection_job["done"].wait(DETECTION_STOP_GRACE) and detection_job["result"] is not None:
+                        st.session_state["partial_detection"] = detection_job["result"]
+            
+            status_text.text(phases[5])
+            progress_bar.progress(100)
+            
+
             with info_col3:
                 st.markdown("#### 📥 Unduh Hasil")
                 
@@ -643,21 +957,35 @@ if process_button:
                         st.download_button(
                             f"{icon} Download {label}",
                             f,
-                            file_name=f"hilal_detection_{Path(output_path).name}",
+                            file_name=f"hilal_detection_{Path(media_file.name).stem}{Path(output_path).suffix}",
                             mime=mime_type
                         )
                 
+                csv_path = detection.csv_path if detection is not None else None
                 if csv_path and os.path.exists(csv_path):
                     with open(csv_path, "rb") as f:
                         st.download_button(
                             "📊 Download Detection Data",
                             f,
-                            file_name=f"hilal_data_{Path(csv_path).name}",
+                            file_name=f"hilal_data_{Path(media_file.name).stem}.csv",
                             mime="text/csv"
                         )
                 
+                if detection is not None:
+                    for extension, mime in (("vtt", "text/vtt"), ("json", "application/json")):
+                        track_file = Path(detection.artifacts.get(f"track_{extension}", ""))
+                        if track_file.is_file():
+                            with open(track_file, "rb") as f:
+                                st.download_button(
+                                    f"🏷️ Download Detection Track ({extension.upper()})",
+                                    f,
+                                    file_name=track_file.name,
+                                    mime=mime
+                                )
+                
                 # Analysis report
                 if st.button("📋 Generate Report"):
+                    import pandas as pd
                     report_content = f"""
 # Hilal Detection Report
 **Generated:** {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -678,6 +1006,14 @@ if process_button:
 - **Temperature:** {weather.get('suhu', 'N/A')}°C
 - **Humidity:** {weather.get('kelembapan', 'N/A')}%
                     """
+                    if detection is not None and detection.best_frames:
+                        report_content += "\n## Best Frames (sharpness + contrast)\n"
+                        report_content += "| Frame | Time (s) | Score | Sharpness | Contrast | Detections |\n|---|---|---|---|---|---|\n"
+                        for best in sorted(detection.best_frames, key=lambda b: -b["score"])[:10]:
+                            report_content += (
+                                f"| {best['frame']} | {best['timestamp']:.2f} | {best['score']:.1f} | "
+                                f"{best['sharpness']:.1f} | {best['contrast']:.1f} | {best['detections']} |\n"
+                            )
                     
                     st.download_button(
                         "📄 Download Full Report",
@@ -695,6 +1031,126 @@ if process_button:
             progress_bar.empty()
             status_text.empty()
 
+# --- Eksplorasi Ambang Deteksi ---
+if st.session_state.get("last_candidates") and os.path.exists(st.session_state["last_candidates"]):
+    st.markdown("### 🎚️ Eksplorasi Ambang Deteksi")
+    st.caption("Filter ulang kandidat tersimpan dari analisis terakhir tanpa menjalankan model lagi")
+    
+    threshold_col1, threshold_col2 = st.columns(2)
+    with threshold_col1:
+        conf_threshold = st.slider("Confidence", 0.05, 0.95, 0.25, 0.01)
+    with threshold_col2:
+        iou_threshold = st.slider("IoU (NMS)", 0.1, 0.9, 0.45, 0.05)
+    
+    try:
+        rethreshold = rethreshold_detections(st.session_state["last_candidates"], conf_threshold, iou_threshold)
+        rethreshold_output = rethreshold.output_path
+        rethreshold_df = rethreshold.to_pandas(derived=False)
+        
+        view_col1, view_col2 = st.columns([2, 1])
+        with view_col1:
+            if Path(rethreshold_output).suffix.lower() in [".jpg", ".jpeg", ".png"]:
+                st.image(get_preview(rethreshold_output), caption=f"conf ≥ {conf_threshold:.2f}, IoU {iou_threshold:.2f}", use_column_width=True)
+            elif "frame" in rethreshold_df and len(rethreshold_df) > 0:
+                st.bar_chart(rethreshold_df.groupby("frame").size().rename("Deteksi per frame"))
+        with view_col2:
+            st.metric("🎯 Detections Found", len(rethreshold_df))
+            if len(rethreshold_df) > 0:
+                st.metric("🏆 Best Confidence", f"{rethreshold_df['confidence'].max() * 100:.1f}%")
+            with open(rethreshold.csv_path, "rb") as f:
+                st.download_button("📊 Download Filtered Data", f, file_name=Path(rethreshold.csv_path).name, mime="text/csv")
+    except Exception as e:
+        st.warning(f"⚠️ Filter ulang gagal: {e}")
+
+# --- Mode Batch ---
+st.markdown("### 📦 Mode Batch (Banyak File)")
+
+with st.expander("Analisis banyak foto/video sekaligus"):
+    batch_files = st.file_uploader(
+        "Unggah beberapa Gambar/Video Hilal",
+        type=["jpg", "png", "jpeg", "mp4", "mov", "avi"],
+        accept_multiple_files=True,
+        key="batch_files"
+    )
+    batch_workers = st.slider("Worker paralel", 1, 8, 4)
+    
+    if st.button("🚀 Proses Semua File", disabled=not batch_files):
+        if not DETECTION_AVAILABLE:
+            st.warning("⚠️ Detection system unavailable")
+        else:
+            from pipeline import run_batch, build_batch_zip, BATCH_COLUMNS
+            import pandas as pd
+            
+            # Direktori per run: file bernama sama dari sesi lain tidak saling menimpa
+            batch_dir = assets_dir / "batch" / uuid.uuid4().hex[:12]
+            batch_dir.mkdir(parents=True, exist_ok=True)
+            batch_paths = []
+            for i, batch_file in enumerate(batch_files):
+                batch_path = batch_dir / batch_file.name
+                if batch_path.exists():
+                    batch_path = batch_dir / f"{i}_{batch_file.name}"
+                batch_path.write_bytes(batch_file.getbuffer())
+                batch_paths.append(str(batch_path))
+            
+            batch_progress = st.progress(0)
+            batch_table = st.empty()
+            batch_rows = []
+            
+            # Baris tabel muncul segera setelah masing-masing file selesai
+            for row in run_batch(batch_paths, "best.pt", max_workers=batch_workers, output_dir=batch_dir):
+                batch_rows.append(row)
+                batch_progress.progress(len(batch_rows) / len(batch_paths))
+                batch_table.dataframe(
+                    pd.DataFrame(batch_rows, columns=BATCH_COLUMNS).drop(columns=["output_path", "csv_path"]),
+                    use_container_width=True
+                )
+            
+            positives = sum(1 for row in batch_rows if row["detections"])
+            st.success(f"🎉 {len(batch_rows)} file diproses, {positives} dengan deteksi hilal")
+            
+            zip_path = build_batch_zip(
+                batch_rows, str(batch_dir / f"hilal_batch_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.zip")
+            )
+            with open(zip_path, "rb") as f:
+                st.download_button(
+                    "🗜️ Download Semua Hasil (ZIP)",
+                    f,
+                    file_name=Path(zip_path).name,
+                    mime="application/zip"
+                )
+
+# --- Peta Visibilitas Hilal ---
+st.markdown("### 🗺️ Peta Visibilitas Hilal")
+
+with st.expander("Hitung peta visibilitas untuk satu malam"):
+    map_col1, map_col2, map_col3, map_col4 = st.columns(4)
+    with map_col1:
+        map_date = st.date_input("Tanggal (maghrib)")
+    with map_col2:
+        map_criterion = st.selectbox("Kriteria", ["MABIMS", "Odeh", "Yallop"])
+    with map_col3:
+        map_region = st.selectbox("Wilayah", ["indonesia", "asia_tenggara", "timur_tengah", "global"])
+    with map_col4:
+        map_resolution = st.selectbox("Resolusi (°)", [0.1, 0.25, 0.5, 1.0], index=0)
+
+    if st.button("🗺️ Buat Peta Visibilitas"):
+        try:
+            from visibility import visibility_map_to_image, summarize_visibility_map
+            from visibility_cache import get_visibility_map
+
+            vis_map = get_visibility_map(map_date, map_criterion, map_region, map_resolution)
+            st.image(
+                visibility_map_to_image(vis_map),
+                caption=(
+                    f"Kriteria {map_criterion} | {vis_map['date']} | "
+                    f"{len(vis_map['lats'])}x{len(vis_map['lons'])} titik | {vis_map['compute_seconds']} s"
+                ),
+                use_column_width=True
+            )
+            st.write(summarize_visibility_map(vis_map))
+        except Exception as e:
+            st.warning(f"⚠️ Peta visibilitas tidak tersedia: {str(e)}")
+
 # --- Enhanced Footer ---
 st.markdown("---")
 st.markdown("""
@@ -744,6 +1200,14 @@ if st.checkbox("🔧 Developer Debug Panel"):
             else:
                 st.write("- Assets directory not found")
         
+        st.write("**🧮 Astro Cache:**")
+        for cache_stats in get_astro_cache_stats():
+            st.write(
+                f"- {cache_stats['function']}: hit rate {cache_stats['hit_rate']*100:.1f}% "
+                f"({cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                f"{cache_stats['size']}/{cache_stats['maxsize']} entries)"
+            )
+
         st.write("**🌐 Session State:**")
         for key, value in st.session_state.items():
             st.write(f"- {key}: {str(value)[:100]}...")
@@ -0,0 +1,321 @@
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from media_metadata import extract_metadata_batch, iter_media_files
+
+CATALOG_PATH = os.environ.get("HILAL_CATALOG_DB", os.path.join("assets", "observations.sqlite"))
+DEFAULT_CRITERION = "MABIMS"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    mtime REAL,
+    media_type TEXT,
+    camera TEXT,
+    observed_at TEXT,
+    lat REAL,
+    lon REAL,
+    moon_alt REAL,
+    moon_az REAL,
+    criterion TEXT,
+    visibility_zone TEXT,
+    visibility_value REAL,
+    visible INTEGER,
+    detection_count INTEGER,
+    max_confidence REAL,
+    avg_confidence REAL,
+    detection_status TEXT,
+    ingested_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_observed_at ON observations (observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_location ON observations (lat, lon);
+CREATE INDEX IF NOT EXISTS idx_observations_confidence ON observations (max_confidence);
+CREATE INDEX IF NOT EXISTS idx_observations_moon_alt ON observations (moon_alt);
+
+CREATE TABLE IF NOT EXISTS detections (
+    observation_id INTEGER NOT NULL REFERENCES observations (id) ON DELETE CASCADE,
+    frame INTEGER,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+    confidence REAL,
+    class_name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_detections_observation ON detections (observation_id);
+CREATE INDEX IF NOT EXISTS idx_detections_confidence ON detections (confidence);
+"""
+
+OBSERVATION_COLUMNS = [
+    "path", "size", "mtime", "media_type", "camera", "observed_at", "lat", "lon",
+    "moon_alt", "moon_az", "criterion", "visibility_zone", "visibility_value", "visible",
+    "detection_count", "max_confidence", "avg_confidence", "detection_status", "ingested_at",
+]
+
+# detection_status: "ok", "failed" (di-ingest ulang pada run berikutnya) atau NULL (tidak dideteksi)
+DETECTION_FAILED = "failed"
+# Jumlah parameter per query IN (...); SQLite lama membatasi 999 variabel
+SQL_CHUNK_SIZE = 500
+
+
+def connect(db_path=None):
+    """
+    Buka (dan inisialisasi) katalog observasi SQLite
+    """
+    db_path = db_path or CATALOG_PATH
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    # Katalog lama: tambahkan kolom yang belum ada
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(observations)")}
+    if "detection_status" not in columns:
+        conn.execute("ALTER TABLE observations ADD COLUMN detection_status TEXT")
+    return conn
+
+
+def _pending_files(conn, paths):
+    """
+    File baru atau berubah (size/mtime) sejak ingest terakhir, atau yang
+    deteksinya gagal pada ingest sebelumnya
+    """
+    known = {
+        path: (size, mtime, status)
+        for path, size, mtime, status in conn.execute(
+            "SELECT path, size, mtime, detection_status FROM observations"
+        )
+    }
+    pending = []
+    for path in paths:
+        stat = os.stat(path)
+        size, mtime, status = known.get(str(path), (None, None, None))
+        if (size, mtime) != (stat.st_size, stat.st_mtime) or status == DETECTION_FAILED:
+            pending.append((str(path), stat.st_size, stat.st_mtime))
+    return pending
+
+
+def _observation_ids(conn, paths):
+    """
+    path -> id observasi, query IN dipecah per SQL_CHUNK_SIZE path
+    """
+    paths = list(paths)
+    ids = {}
+    for start in range(0, len(paths), SQL_CHUNK_SIZE):
+        chunk = paths[start:start + SQL_CHUNK_SIZE]
+        ids.update(conn.execute(
+            f"SELECT path, id FROM observations WHERE path IN ({', '.join('?' for _ in chunk)})", chunk
+        ).fetchall())
+    return ids
+
+
+def _add_astronomy(table, criterion):
+    """
+    Posisi bulan saat pengambilan dan visibilitas malam itu, dihitung vektor
+    per tanggal untuk semua baris yang punya waktu + GPS
+    """
+    from visibility import compute_moon_altaz, evaluate_visibility_points
+
+    for column in ("moon_alt", "moon_az", "visibility_value"):
+        table[column] = np.nan
+    table["visibility_zone"] = None
+    table["visible"] = None
+    table["criterion"] = criterion
+
+    located = table["datetime"].notna() & table["lat"].notna() & table["lon"].notna()
+    if not located.any():
+        return table
+
+    rows = table[located]
+    try:
+        alt, az = compute_moon_altaz(rows["datetime"].dt.to_pydatetime(), rows["lat"].values, rows["lon"].values)
+        table.loc[located, "moon_alt"] = alt
+        table.loc[located, "moon_az"] = az
+
+        for evening, group in rows.groupby(rows["datetime"].dt.date):
+            result = evaluate_visibility_points(evening, group["lat"].values, group["lon"].values, criterion)
+            table.loc[group.index, "visibility_value"] = result["value"]
+            table.loc[group.index, "visibility_zone"] = result["zone_label"]
+            table.loc[group.index, "visible"] = result["visible"].astype(int)
+    except Exception as e:
+        print(f"Catalog astronomy failed: {e}")
+    return table
+
+
+def _run_detection(path, media_type, model_path):
+    """
+    Jalankan detect.py; tabel deteksi diambil langsung dari hasilnya
+    """
+    from detect import detect_image, detect_video
+
+    detector = detect_image if media_type == "image" else detect_video
+    result = detector(path, model_path)
+    if not result.model_available:
+        return pd.DataFrame()
+    return result.to_pandas(derived=False, include_frame=media_type != "image")
+
+
+def ingest(paths, db_path=None, criterion=DEFAULT_CRITERION, detect_media=("image",),
+           model_path="best.pt", max_workers=None):
+    """
+    Ingest media secara bulk dan inkremental: metadata EXIF, posisi bulan,
+    visibilitas dan hasil deteksi. File yang tidak berubah dilewati, kecuali
+    yang deteksinya gagal (dicoba lagi).
+    Returns: jumlah observasi yang ditambahkan/diperbarui.
+    """
+    if isinstance(paths, (str, Path)) and Path(paths).is_dir():
+        paths = list(iter_media_files(paths))
+
+    conn = connect(db_path)
+    try:
+        pending = _pending_files(conn, paths)
+        if not pending:
+            return 0
+
+        table = extract_metadata_batch([path for path, _, _ in pending], max_workers=max_workers)
+        table["size"] = [size for _, size, _ in pending]
+        table["mtime"] = [mtime for _, _, mtime in pending]
+        table = _add_astronomy(table, criterion)
+
+        detections = {}
+        table["detection_count"] = None
+        table["max_confidence"] = None
+        table["avg_confidence"] = None
+        table["detection_status"] = None
+        for index, row in table.iterrows():
+            if row["media_type"] not in detect_media:
+                continue
+            try:
+                df = _run_detection(row["path"], row["media_type"], model_path)
+            except Exception as e:
+                print(f"Catalog detection for {row['path']} failed: {e}")
+                table.at[index, "detection_status"] = DETECTION_FAILED
+                continue
+            table.at[index, "detection_status"] = "ok"
+            detections[row["path"]] = df
+            has_conf = len(df) > 0 and "confidence" in df
+            table.at[index, "detection_count"] = len(df)
+            table.at[index, "max_confidence"] = float(df["confidence"].max()) if has_conf else None
+            table.at[index, "avg_confidence"] = float(df["confidence"].mean()) if has_conf else None
+
+        table["observed_at"] = table["datetime"].map(lambda dt: dt.isoformat() if pd.notna(dt) else None)
+        table["ingested_at"] = datetime.utcnow().isoformat(timespec="seconds")
+
+        records = [
+            tuple(None if (isinstance(v, float) and np.isnan(v)) else (v.item() if hasattr(v, "item") else v)
+                  for v in row)
+            for row in table[OBSERVATION_COLUMNS].itertuples(index=False, name=None)
+        ]
+
+        placeholders = ", ".join("?" for _ in OBSERVATION_COLUMNS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in OBSERVATION_COLUMNS if c != "path")
+        with conn:
+            conn.executemany(
+                f"INSERT INTO observations ({', '.join(OBSERVATION_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(path) DO UPDATE SET {updates}",
+                records,
+            )
+            if detections:
+                ids = _observation_ids(conn, detections)
+                conn.executemany(
+                    "DELETE FROM detections WHERE observation_id = ?", [(ids[p],) for p in detections]
+                )
+                conn.executemany(
+                    "INSERT INTO detections (observation_id, frame, x1, y1, x2, y2, confidence, class_name) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            ids[path],
+                            int(det["frame"]) if "frame" in det and pd.notna(det["frame"]) else None,
+                            float(det["x1"]), float(det["y1"]), float(det["x2"]), float(det["y2"]),
+                            float(det["confidence"]),
+                            str(det.get("class_name", "Hilal")),
+                        )
+                        for path, df in detections.items()
+                        for det in df.to_dict("records")
+                    ],
+                )
+        return len(records)
+    finally:
+        conn.close()
+
+
+def query_observations(db_path=None, start=None, end=None, positive=None, min_confidence=None,
+                       max_moon_alt=None, min_moon_alt=None, bbox=None, hijri_month=None, limit=None):
+    """
+    Cari observasi di katalog tanpa mengulang deteksi/perhitungan astronomi.
+
+    bbox: (lat_min, lat_max, lon_min, lon_max)
+    positive: True = hanya yang ada deteksi, False = hanya yang tanpa deteksi
+    hijri_month: (tahun, bulan), misal (1446, 9) untuk Ramadan 1446
+    """
+    if hijri_month is not None:
+        from hijri import hijri_month_range
+        start, end = hijri_month_range(*hijri_month)
+
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("observed_at >= ?")
+        params.append(pd.Timestamp(start).isoformat())
+    if end is not None:
+        clauses.append("observed_at < ?")
+        params.append(pd.Timestamp(end).isoformat())
+    if positive is True:
+        clauses.append("detection_count > 0")
+    elif positive is False:
+        clauses.append("detection_count = 0")
+    if min_confidence is not None:
+        clauses.append("max_confidence >= ?")
+        params.append(min_confidence)
+    if max_moon_alt is not None:
+        clauses.append("moon_alt < ?")
+        params.append(max_moon_alt)
+    if min_moon_alt is not None:
+        clauses.append("moon_alt >= ?")
+        params.append(min_moon_alt)
+    if bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = bbox
+        clauses.append("lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?")
+        params.extend([lat_min, lat_max, lon_min, lon_max])
+
+    sql = "SELECT * FROM observations"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY observed_at"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def get_detections(observation_id, db_path=None):
+    """
+    Semua bounding box tersimpan untuk satu observasi
+    """
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(
+            "SELECT * FROM detections WHERE observation_id = ? ORDER BY frame, confidence DESC",
+            conn, params=[observation_id],
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) >= 3 and sys.argv[1] == "ingest":
+        print(f"{ingest(sys.argv[2])} observations ingested into {CATALOG_PATH}")
+    else:
+        print(query_observations(positive=True, max_moon_alt=5, hijri_month=(1446, 9)).head(20))
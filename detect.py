@@ -1,30 +1,67 @@
 import cv2
 import os
-import pandas as pd
+import importlib.util
+import json
 import numpy as np
 from pathlib import Path
+from functools import lru_cache
+import threading
 import math
+import time
+from functools import partial
 
-# Import ultralytics YOLO dengan error handling
-try:
-    from ultralytics import YOLO
-    ULTRALYTICS_AVAILABLE = True
-except ImportError:
-    ULTRALYTICS_AVAILABLE = False
+from detections import DetectionArray, DetectionResult
+from frame_quality import BestFrameSelector, DEFAULT_TOP_K, DEFAULT_WINDOW_SECONDS
+from video_reader import VideoReader, INFERENCE_DECODE_SIZE
+
+# Ultralytics/torch baru diimpor saat model pertama kali dimuat (load_model);
+# di sini cukup cek ketersediaannya tanpa biaya impor
+ULTRALYTICS_AVAILABLE = importlib.util.find_spec("ultralytics") is not None
+if not ULTRALYTICS_AVAILABLE:
     print("Ultralytics not available, trying alternative imports...")
     
-# Alternative import jika ultralytics tidak tersedia
-if not ULTRALYTICS_AVAILABLE:
-    try:
-        import torch
-        import torchvision
+    # Alternative import jika ultralytics tidak tersedia
+    if importlib.util.find_spec("torch") is not None:
         print("PyTorch available, using manual detection...")
-    except ImportError:
+    else:
         print("PyTorch also not available")
 
 # Fix untuk video capture headless
 os.environ["OPENCV_VIDEOIO_PRIORITY_MSMF"] = "0"
 
+CONFIDENCE_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+# Kandidat disimpan dengan ambang rendah dan NMS longgar agar ambang bisa
+# diubah di UI tanpa menjalankan model lagi
+CANDIDATE_CONFIDENCE = 0.05
+CANDIDATE_IOU = 0.9
+
+# Mode keyframe video: YOLO setiap KEYFRAME_INTERVAL frame, kotak di antaranya
+# digeser dengan optical flow Lucas-Kanade. Deteksi ulang dipaksa jika kualitas
+# flow (fraksi titik yang lolos cek maju-mundur) turun di bawah FLOW_MIN_QUALITY.
+KEYFRAME_INTERVAL = 10
+FLOW_MIN_QUALITY = 0.5
+FLOW_MIN_POINTS = 4
+FLOW_FB_THRESHOLD = 1.0
+FLOW_LK_PARAMS = dict(
+    winSize=(15, 15), maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+# Predictor ultralytics tidak thread-safe: inferensi pada model bersama diserialisasi,
+# sementara decode, anotasi dan penulisan file tetap berjalan paralel
+_predict_lock = threading.Lock()
+
+@lru_cache(maxsize=4)
+def load_model(model_path="best.pt"):
+    """
+    Muat model YOLO sekali per path dan pakai ulang di semua deteksi
+    """
+    if not ULTRALYTICS_AVAILABLE:
+        raise ImportError("ultralytics not available")
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
 def draw_enhanced_bounding_box(image, x1, y1, x2, y2, confidence, class_name="Hilal", class_id=0):
     """
     Gambar bounding box yang lebih menarik dan visible untuk deteksi hilal
@@ -141,16 +178,140 @@ def draw_enhanced_bounding_box(image, x1, y1, x2, y2, confidence, class_name="Hi
     
     return image
 
-def detect_image(image_path, model_path="best.pt"):
+def result_to_arrays(result):
+    """
+    Hasil ultralytics -> (xyxy float32 [n,4], confidence float32 [n], class int32 [n])
+    """
+    if result is None or result.boxes is None:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32)
+    return (
+        result.boxes.xyxy.cpu().numpy().astype(np.float32).reshape(-1, 4),
+        result.boxes.conf.cpu().numpy().astype(np.float32),
+        result.boxes.cls.cpu().numpy().astype(np.int32),
+    )
+
+def nms(boxes, scores, iou_threshold):
+    """
+    Non-maximum suppression greedy (NumPy). Returns: indeks yang dipertahankan,
+    terurut dari skor tertinggi
+    """
+    order = np.argsort(-scores, kind="stable")
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+def filter_candidates(boxes, confidences, classes, conf=CONFIDENCE_THRESHOLD, iou=IOU_THRESHOLD):
+    """
+    Filter ulang kandidat tersimpan: ambang confidence lalu NMS per kelas.
+    Returns: indeks kandidat yang lolos
+    """
+    index = np.nonzero(confidences >= conf)[0]
+    if index.size == 0:
+        return index
+    # Geser kotak per kelas agar NMS tidak menekan kotak dari kelas lain
+    offset = classes[index, None].astype(np.float32) * (float(boxes[index].max()) + 1)
+    return index[nms(boxes[index] + offset, confidences[index], iou)]
+
+def candidates_path_for(source_path, output_dir="assets"):
+    return Path(output_dir) / f"detected_{Path(source_path).stem}_candidates.npz"
+
+def save_candidates(path, frames, boxes, confidences, classes, class_names, source_path, is_video=False, fps=None,
+                    keyframe_interval=1):
+    """
+    Simpan kandidat ambang rendah per artefak (.npz) untuk filter ulang tanpa inferensi
+    """
+    meta = {
+        "source": str(source_path),
+        "is_video": is_video,
+        "fps": fps,
+        "class_names": {str(k): v for k, v in dict(class_names).items()},
+        "candidate_confidence": CANDIDATE_CONFIDENCE,
+        "candidate_iou": CANDIDATE_IOU,
+        # > 1: kandidat frame di antara keyframe adalah hasil propagasi optical flow
+        "keyframe_interval": keyframe_interval,
+    }
+    np.savez_compressed(
+        path,
+        frame=np.asarray(frames, dtype=np.int32),
+        xyxy=np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+        confidence=np.asarray(confidences, dtype=np.float32),
+        cls=np.asarray(classes, dtype=np.int32),
+        meta=np.array(json.dumps(meta)),
+    )
+    return path
+
+def load_candidates(path):
+    with np.load(path) as data:
+        candidates = {key: data[key] for key in ("frame", "xyxy", "confidence", "cls")}
+        meta = json.loads(str(data["meta"]))
+    meta["class_names"] = {int(k): v for k, v in meta["class_names"].items()}
+    candidates["meta"] = meta
+    return candidates
+
+def annotate_image(image, boxes, confidences, classes, class_names):
+    """
+    Gambar bounding box + ringkasan pada salinan gambar.
+    Returns: (gambar teranotasi, DetectionArray)
+    """
+    annotated_image = image.copy()
+    height, width = image.shape[:2]
+    detections = DetectionArray(len(boxes), image_size=(width, height), class_names=class_names)
+    detections.append(boxes, confidences, classes)
+    
+    for box, conf, cls in zip(boxes, confidences, classes):
+        x1, y1, x2, y2 = (float(v) for v in box)
+        class_name = class_names.get(int(cls), f'Class_{int(cls)}')
+        
+        # Draw enhanced bounding box
+        annotated_image = draw_enhanced_bounding_box(
+            annotated_image, x1, y1, x2, y2, float(conf), class_name, int(cls)
+        )
+    
+    # Add detection summary overlay
+    if len(detections):
+        summary_text = f"🌙 {len(detections)} Hilal Detected"
+        avg_conf = float(detections.confidence.mean()) * 100
+        
+        # Add summary at top of image
+        cv2.rectangle(annotated_image, (10, 10), (400, 80), (0, 0, 0), -1)
+        cv2.rectangle(annotated_image, (10, 10), (400, 80), (0, 255, 255), 2)
+        cv2.putText(annotated_image, summary_text, (20, 35), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        cv2.putText(annotated_image, f"Avg Confidence: {avg_conf:.1f}%", (20, 60), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    else:
+        # No detections found
+        cv2.rectangle(annotated_image, (10, 10), (300, 60), (0, 0, 0), -1)
+        cv2.rectangle(annotated_image, (10, 10), (300, 60), (0, 0, 255), 2)
+        cv2.putText(annotated_image, "No Hilal Detected", (20, 40), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+    
+    return annotated_image, detections
+
+def detect_image(image_path, model_path="best.pt", output_dir="assets"):
     """
     Deteksi objek pada gambar menggunakan YOLOv5/v8 dengan enhanced bounding boxes
+
+    Returns: DetectionResult (bisa di-unpack sebagai output_path, csv_path)
     """
     try:
         if not ULTRALYTICS_AVAILABLE:
-            return create_dummy_detection(image_path, "image")
-            
+            return create_dummy_detection(image_path, "image", output_dir)
+        
+        started = time.perf_counter()
         # Load model
-        model = YOLO(model_path)
+        model = load_model(model_path)
         
         # Load original image
         original_image = cv2.imread(image_path)
@@ -158,282 +319,656 @@ def detect_image(image_path, model_path="best.pt"):
             raise ValueError("Could not load image")
         
         # Create output directory
-        output_dir = Path("assets")
-        output_dir.mkdir(exist_ok=True)
-        
-        # Predict
-        results = model.predict(
-            source=image_path, 
-            imgsz=640, 
-            conf=0.25,
-            save=False,
-            verbose=False
-        )
-
-        # Create annotated image
-        annotated_image = original_image.copy()
-        detections_data = []
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
         
-        if len(results) > 0 and results[0].boxes is not None:
-            boxes = results[0].boxes.xyxy.cpu().numpy()
-            confidences = results[0].boxes.conf.cpu().numpy()
-            classes = results[0].boxes.cls.cpu().numpy()
-            
-            # Get class names if available
-            class_names = getattr(model, 'names', {0: 'Hilal'})
-            
-            for i, (box, conf, cls) in enumerate(zip(boxes, confidences, classes)):
-                x1, y1, x2, y2 = box
-                class_name = class_names.get(int(cls), f'Class_{int(cls)}')
-                
-                # Draw enhanced bounding box
-                annotated_image = draw_enhanced_bounding_box(
-                    annotated_image, x1, y1, x2, y2, conf, class_name, int(cls)
-                )
-                
-                # Store detection data
-                detections_data.append({
-                    'detection_id': i + 1,
-                    'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
-                    'width': x2 - x1, 'height': y2 - y1,
-                    'center_x': (x1 + x2) / 2, 'center_y': (y1 + y2) / 2,
-                    'confidence': conf,
-                    'class': int(cls),
-                    'class_name': class_name,
-                    'area': (x2 - x1) * (y2 - y1)
-                })
+        # Predict dengan ambang rendah; kandidat disimpan untuk filter ulang
+        inference_started = time.perf_counter()
+        with _predict_lock:
+            results = model.predict(
+                source=image_path, 
+                imgsz=640, 
+                conf=CANDIDATE_CONFIDENCE,
+                iou=CANDIDATE_IOU,
+                save=False,
+                verbose=False
+            )
         
-        # Add detection summary overlay
-        if detections_data:
-            summary_text = f"🌙 {len(detections_data)} Hilal Detected"
-            avg_conf = np.mean([d['confidence'] for d in detections_data]) * 100
-            
-            # Add summary at top of image
-            cv2.rectangle(annotated_image, (10, 10), (400, 80), (0, 0, 0), -1)
-            cv2.rectangle(annotated_image, (10, 10), (400, 80), (0, 255, 255), 2)
-            cv2.putText(annotated_image, summary_text, (20, 35), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-            cv2.putText(annotated_image, f"Avg Confidence: {avg_conf:.1f}%", (20, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        else:
-            # No detections found
-            cv2.rectangle(annotated_image, (10, 10), (300, 60), (0, 0, 0), -1)
-            cv2.rectangle(annotated_image, (10, 10), (300, 60), (0, 0, 255), 2)
-            cv2.putText(annotated_image, "No Hilal Detected", (20, 40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        inference_seconds = time.perf_counter() - inference_started
+        
+        class_names = getattr(model, 'names', {0: 'Hilal'})
+        boxes, confidences, classes = result_to_arrays(results[0] if len(results) > 0 else None)
+        candidates_path = save_candidates(
+            candidates_path_for(image_path, output_dir), np.zeros(len(boxes)), boxes, confidences, classes,
+            class_names, image_path
+        )
+        
+        # Create annotated image
+        keep = filter_candidates(boxes, confidences, classes)
+        annotated_image, detections = annotate_image(
+            original_image, boxes[keep], confidences[keep], classes[keep], class_names
+        )
         
         # Save annotated image
         output_path = output_dir / f"detected_{Path(image_path).name}"
         cv2.imwrite(str(output_path), annotated_image)
         
-        # Save enhanced CSV
-        csv_path = save_enhanced_detection_csv(detections_data, output_dir, Path(image_path).stem)
-        
-        return str(output_path), str(csv_path) if csv_path else None
+        # CSV ditulis saat pertama kali dibutuhkan (result.csv_path)
+        return DetectionResult(
+            "image", image_path, output_path, detections,
+            timings={"inference": inference_seconds, "total": time.perf_counter() - started},
+            artifacts={"candidates": str(candidates_path)},
+            csv_writer=partial(save_enhanced_detection_csv, detections, output_dir, Path(image_path).stem),
+            conf_threshold=CONFIDENCE_THRESHOLD,
+        )
         
     except Exception as e:
         print(f"Error in detect_image: {e}")
-        return create_dummy_detection(image_path, "image")
+        return create_dummy_detection(image_path, "image", output_dir)
+
+def rethreshold_detections(candidates_path, conf=CONFIDENCE_THRESHOLD, iou=IOU_THRESHOLD, output_dir="assets"):
+    """
+    Terapkan ambang confidence/IoU baru pada kandidat tersimpan tanpa inferensi ulang.
+    Gambar: anotasi dirender ulang ke rethreshold_<nama>. Video: hanya CSV
+    yang ditulis ulang (video teranotasi tidak di-encode ulang).
+    Returns: DetectionResult (CSV lazy)
+    """
+    started = time.perf_counter()
+    candidates = load_candidates(candidates_path)
+    meta = candidates["meta"]
+    source = Path(meta["source"])
+    output_dir = Path(output_dir)
+    boxes, confidences, classes, frames = (
+        candidates["xyxy"], candidates["confidence"], candidates["cls"], candidates["frame"]
+    )
+    
+    if not meta["is_video"]:
+        image = cv2.imread(str(source))
+        if image is None:
+            raise ValueError(f"Could not load {source}")
+        keep = filter_candidates(boxes, confidences, classes, conf, iou)
+        annotated_image, detections = annotate_image(
+            image, boxes[keep], confidences[keep], classes[keep], meta["class_names"]
+        )
+        output_path = output_dir / f"rethreshold_{source.name}"
+        cv2.imwrite(str(output_path), annotated_image)
+        return DetectionResult(
+            "image", source, output_path, detections,
+            timings={"total": time.perf_counter() - started},
+            artifacts={"candidates": str(candidates_path)},
+            csv_writer=partial(
+                save_enhanced_detection_csv, detections, output_dir, f"{source.stem}_rethreshold",
+                conf_threshold=conf
+            ),
+            conf_threshold=conf,
+        )
+    
+    keep = [
+        in_frame[filter_candidates(boxes[in_frame], confidences[in_frame], classes[in_frame], conf, iou)]
+        for in_frame in np.split(np.argsort(frames, kind="stable"),
+                                 np.nonzero(np.diff(np.sort(frames, kind="stable")))[0] + 1)
+        if in_frame.size
+    ]
+    keep = np.concatenate(keep) if keep else np.zeros(0, np.int64)
+    detections = DetectionArray.from_arrays(
+        boxes[keep], confidences[keep], classes[keep], frames[keep], class_names=meta["class_names"]
+    )
+    rendered = output_dir / f"detected_{source.name}"
+    return DetectionResult(
+        "video", source, rendered if rendered.exists() else source, detections,
+        timings={"total": time.perf_counter() - started},
+        artifacts={"candidates": str(candidates_path)},
+        csv_writer=partial(
+            save_enhanced_detection_csv, detections, output_dir, f"{source.stem}_rethreshold",
+            is_video=True, conf_threshold=conf, fps=meta.get("fps")
+        ),
+        conf_threshold=conf, fps=meta.get("fps"),
+    )
+
+def _box_points(gray_box, max_points=30):
+    """
+    Titik fitur di dalam kotak; dilengkapi grid 5x5 jika teksturnya minim
+    (hilal tipis sering hanya memberi sedikit sudut)
+    """
+    points = cv2.goodFeaturesToTrack(gray_box, maxCorners=max_points, qualityLevel=0.01, minDistance=3)
+    if points is None or len(points) < FLOW_MIN_POINTS:
+        height, width = gray_box.shape[:2]
+        grid = np.stack(np.meshgrid(np.linspace(0, width - 1, 5), np.linspace(0, height - 1, 5)), axis=-1)
+        grid = grid.reshape(-1, 1, 2)
+        points = grid if points is None else np.concatenate([points.astype(np.float64), grid])
+    return points.astype(np.float32)
+
+def propagate_boxes(prev_gray, gray, boxes, margin=0.5):
+    """
+    Geser kotak dari frame sebelumnya ke frame ini dengan optical flow
+    Lucas-Kanade sparse yang dihitung hanya di ROI sekitar tiap kotak.
+    Pergeseran kotak = median pergeseran titik yang lolos cek maju-mundur.
+    Returns: (kotak baru [n,4], kualitas [n] 0-1)
+    """
+    height, width = gray.shape[:2]
+    new_boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    quality = np.zeros(len(new_boxes), np.float32)
+    for i, (x1, y1, x2, y2) in enumerate(new_boxes.copy()):
+        pad = margin * max(x2 - x1, y2 - y1) + 8
+        rx1, ry1 = int(max(x1 - pad, 0)), int(max(y1 - pad, 0))
+        rx2, ry2 = int(min(x2 + pad, width)), int(min(y2 + pad, height))
+        bx1, by1 = int(max(x1, 0)) - rx1, int(max(y1, 0)) - ry1
+        bx2, by2 = int(min(x2, width)) - rx1, int(min(y2, height)) - ry1
+        if bx2 - bx1 < 2 or by2 - by1 < 2:
+            continue
+        
+        prev_roi, roi = prev_gray[ry1:ry2, rx1:rx2], gray[ry1:ry2, rx1:rx2]
+        points = _box_points(prev_roi[by1:by2, bx1:bx2]) + np.float32([bx1, by1])
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(prev_roi, roi, points, None, **FLOW_LK_PARAMS)
+        backward, status_back, _ = cv2.calcOpticalFlowPyrLK(roi, prev_roi, forward, None, **FLOW_LK_PARAMS)
+        fb_error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < FLOW_FB_THRESHOLD)
+        if good.sum() < FLOW_MIN_POINTS:
+            continue
+        
+        quality[i] = good.mean()
+        dx, dy = np.median((forward - points).reshape(-1, 2)[good], axis=0)
+        new_boxes[i] = [
+            np.clip(x1 + dx, 0, width), np.clip(y1 + dy, 0, height),
+            np.clip(x2 + dx, 0, width), np.clip(y2 + dy, 0, height),
+        ]
+    return new_boxes, quality
+
+def make_preview_frame(frame, max_width=480):
+    """
+    Perkecil frame BGR ke ukuran preview dan ubah ke RGB untuk ditampilkan
+    """
+    height, width = frame.shape[:2]
+    if width > max_width:
+        scale = max_width / width
+        frame = cv2.resize(frame, (max_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+def track_path_for(source_path, output_dir="assets", extension="json"):
+    return Path(output_dir) / f"detected_{Path(source_path).stem}_track.{extension}"
+
+def _vtt_timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
 
-def detect_video(video_path, model_path="best.pt"):
+def save_detection_track(detections, source_path, fps, width, height, total_frames, output_dir="assets"):
+    """
+    Track deteksi per frame untuk overlay di sisi klien:
+    JSON ringkas {frame: [[x1, y1, x2, y2, conf, cls], ...]} dan WebVTT metadata
+    (satu cue per frame berisi JSON kotaknya).
+    Returns: (json_path, vtt_path)
+    """
+    fps = fps or 30
+    frames = {}
+    for frame, rows in detections.frames():
+        values = np.stack([rows["x1"], rows["y1"], rows["x2"], rows["y2"], rows["confidence"]], axis=1)
+        frames[frame] = [
+            [*np.round(box[:4].astype(float), 1).tolist(), round(float(box[4]), 3), int(cls)]
+            for box, cls in zip(values, rows["class"])
+        ]
+    class_names = {
+        int(c): detections.class_names.get(int(c), f'Class_{int(c)}') for c in np.unique(detections.data["class"])
+    }
+    
+    json_path = track_path_for(source_path, output_dir, "json")
+    with open(json_path, 'w') as f:
+        json.dump({
+            "source": Path(source_path).name,
+            "fps": fps, "width": width, "height": height, "total_frames": total_frames,
+            "class_names": class_names,
+            "frames": frames,
+        }, f, separators=(",", ":"))
+    
+    vtt_path = track_path_for(source_path, output_dir, "vtt")
+    with open(vtt_path, 'w') as f:
+        f.write("WEBVTT\n\n")
+        for frame in sorted(frames):
+            start, end = frame / fps, (frame + 1) / fps
+            f.write(f"{_vtt_timestamp(start)} --> {_vtt_timestamp(end)}\n")
+            f.write(json.dumps(frames[frame], separators=(",", ":")) + "\n\n")
+    
+    return str(json_path), str(vtt_path)
+
+def detect_video(video_path, model_path="best.pt", preview_callback=None, preview_every=15, preview_width=480,
+                 render=True, keyframe_interval=1, best_frames=None, quality_window=DEFAULT_WINDOW_SECONDS,
+                 decode_size=None, start=None, end=None, stride=1, output_dir="assets"):
     """
     Deteksi objek pada video menggunakan YOLOv5/v8 dengan enhanced bounding boxes
+
+    preview_callback(frame_rgb, stats) dipanggil setiap preview_every frame dengan
+    frame teranotasi yang diperkecil dan statistik berjalan. Jika callback
+    mengembalikan False, proses dihentikan dan hasil parsial disimpan.
+
+    render=False: video tidak dianotasi/di-encode ulang; output_path adalah video
+    asli dan kotak disimpan sebagai track JSON/WebVTT untuk overlay di klien.
+
+    keyframe_interval > 1: YOLO hanya pada keyframe (atau lebih awal jika flow
+    drift), frame di antaranya memakai kotak hasil propagate_boxes. Semua
+    kandidat keyframe ikut dipropagasi dan disimpan per frame, sehingga filter
+    ulang tetap mencakup frame di antara keyframe.
+
+    best_frames=K: lihat detect_video_best_frames (inferensi hanya pada K frame
+    tertajam per quality_window detik).
+
+    decode_size: sisi terpanjang frame saat decode (lihat VideoReader). Default
+    INFERENCE_DECODE_SIZE jika render=False, resolusi asli jika render=True.
+    Kotak selalu disimpan dalam koordinat resolusi asli.
+    start, end (detik), stride: hanya proses rentang/setiap frame ke-stride.
+
+    Returns: DetectionResult (bisa di-unpack sebagai output_path, csv_path)
     """
+    reader_options = dict(
+        max_side=decode_size if decode_size is not None else (None if render else INFERENCE_DECODE_SIZE),
+        start=start, end=end, stride=stride,
+    )
+    if best_frames:
+        # Mode frame terbaik tidak meng-encode video: decode cukup seukuran input model
+        reader_options["max_side"] = decode_size if decode_size is not None else INFERENCE_DECODE_SIZE
+        return detect_video_best_frames(
+            video_path, model_path, best_frames, quality_window, preview_callback, preview_width,
+            output_dir=output_dir, **reader_options
+        )
     try:
         if not ULTRALYTICS_AVAILABLE:
-            return create_dummy_detection(video_path, "video")
-            
+            return create_dummy_detection(video_path, "video", output_dir)
+        
+        started = time.perf_counter()
         # Load model
-        model = YOLO(model_path)
+        model = load_model(model_path)
         
         # Create output directory
-        output_dir = Path("assets")
-        output_dir.mkdir(exist_ok=True)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
         output_path = output_dir / f"detected_{Path(video_path).name}"
 
-        # Open input video
-        cap = cv2.VideoCapture(video_path)
+        # Open input video (decode diperkecil bila memungkinkan)
+        reader = VideoReader(video_path, **reader_options)
         
         # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = reader.fps
+        width, height = reader.source_width, reader.source_height
+        total_frames = reader.source_frames
+        frames_to_process = reader.frame_count
         
-        # Define codec and create VideoWriter
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+        # Define codec and create VideoWriter (ukuran frame hasil decode)
+        out = None
+        if render:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(str(output_path), fourcc, fps / reader.stride, (reader.width, reader.height))
+        else:
+            output_path = Path(video_path)
         
-        all_detections = []
+        class_names = getattr(model, 'names', {0: 'Hilal'})
+        all_detections = DetectionArray(image_size=(width, height), class_names=class_names)
+        candidate_frames, candidate_boxes, candidate_confidences, candidate_classes = [], [], [], []
         frame_count = 0
+        frames_with_detections = 0
+        max_confidence = 0.0
+        aborted = False
+        inference_seconds = 0.0
+        keyframes = forced_keyframes = 0
+        last_keyframe = -keyframe_interval
+        prev_gray = None
+        # Kandidat keyframe terakhir (ikut dipropagasi) dan indeks yang lolos filter
+        frame_boxes = np.zeros((0, 4), np.float32)
+        frame_confidences = np.zeros(0, np.float32)
+        frame_classes = np.zeros(0, np.int32)
+        keep = np.zeros(0, np.intp)
         
-        print(f"Processing {total_frames} frames...")
+        print(f"Processing {frames_to_process} frames ({reader.backend}, {reader.width}x{reader.height})...")
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        for frame_index, frame in reader:
+            # Keyframe: jalankan YOLO; selain itu geser kotak terakhir dengan optical flow
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if keyframe_interval > 1 else None
+            is_keyframe = prev_gray is None or frame_count - last_keyframe >= keyframe_interval
+            if not is_keyframe and len(frame_boxes):
+                propagated, flow_quality = propagate_boxes(prev_gray, gray, frame_boxes)
+                if keep.size and flow_quality[keep].min() < FLOW_MIN_QUALITY:
+                    # Drift pada kotak yang dilaporkan: deteksi ulang lebih awal
+                    is_keyframe = True
+                    forced_keyframes += 1
+                else:
+                    frame_boxes = propagated
+            
+            if is_keyframe:
+                # Run detection on frame (ambang rendah, kandidat disimpan)
+                inference_started = time.perf_counter()
+                with _predict_lock:
+                    results = model.predict(
+                        source=frame,
+                        imgsz=640,
+                        conf=CANDIDATE_CONFIDENCE,
+                        iou=CANDIDATE_IOU,
+                        verbose=False
+                    )
+                inference_seconds += time.perf_counter() - inference_started
+                keyframes += 1
+                last_keyframe = frame_count
                 
-            # Run detection on frame
-            results = model.predict(
-                source=frame,
-                imgsz=640,
-                conf=0.25,
-                verbose=False
+                frame_boxes, frame_confidences, frame_classes = result_to_arrays(
+                    results[0] if len(results) > 0 else None
+                )
+                keep = filter_candidates(frame_boxes, frame_confidences, frame_classes)
+            prev_gray = gray
+            
+            if len(frame_boxes):
+                candidate_frames.append(np.full(len(frame_boxes), frame_index, np.int32))
+                candidate_boxes.append(reader.scale_boxes(frame_boxes))
+                candidate_confidences.append(frame_confidences)
+                candidate_classes.append(frame_classes)
+            
+            # Anotasi hanya dibutuhkan untuk video output atau frame preview
+            preview_due = preview_callback is not None and (
+                (frame_count + 1) % preview_every == 0 or frame_count + 1 == frames_to_process
             )
+            draw = render or preview_due
             
             # Process detections
-            annotated_frame = frame.copy()
-            frame_detections = []
+            annotated_frame = frame.copy() if draw else frame
+            frame_detections = 0
             
-            if len(results) > 0 and results[0].boxes is not None:
-                boxes = results[0].boxes.xyxy.cpu().numpy()
-                confidences = results[0].boxes.conf.cpu().numpy()
-                classes = results[0].boxes.cls.cpu().numpy()
-                
-                class_names = getattr(model, 'names', {0: 'Hilal'})
+            boxes, confidences, classes = frame_boxes[keep], frame_confidences[keep], frame_classes[keep]
+            if len(boxes):
+                all_detections.append(reader.scale_boxes(boxes), confidences, classes, frame=frame_index)
+                frame_detections = len(boxes)
+                frames_with_detections += 1
+                max_confidence = max(max_confidence, float(confidences.max()))
                 
-                for i, (box, conf, cls) in enumerate(zip(boxes, confidences, classes)):
-                    x1, y1, x2, y2 = box
-                    class_name = class_names.get(int(cls), f'Class_{int(cls)}')
-                    
-                    # Draw enhanced bounding box
-                    annotated_frame = draw_enhanced_bounding_box(
-                        annotated_frame, x1, y1, x2, y2, conf, class_name, int(cls)
-                    )
-                    
-                    # Store detection for this frame
-                    frame_detections.append({
-                        'frame': frame_count,
-                        'detection_id': i + 1,
-                        'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
-                        'confidence': conf,
-                        'class': int(cls),
-                        'class_name': class_name
-                    })
+                # Draw enhanced bounding box
+                if draw:
+                    for (x1, y1, x2, y2), conf, cls in zip(boxes, confidences, classes):
+                        class_name = class_names.get(int(cls), f'Class_{int(cls)}')
+                        annotated_frame = draw_enhanced_bounding_box(
+                            annotated_frame, x1, y1, x2, y2, conf, class_name, int(cls)
+                        )
             
             # Add frame counter and detection info
-            info_text = f"Frame: {frame_count+1}/{total_frames}"
+            info_text = f"Frame: {frame_index+1}/{total_frames}"
             if frame_detections:
-                info_text += f" | Detections: {len(frame_detections)}"
+                info_text += f" | Detections: {frame_detections}"
             
-            cv2.rectangle(annotated_frame, (10, height-60), (400, height-10), (0, 0, 0), -1)
-            cv2.putText(annotated_frame, info_text, (20, height-30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+            if draw:
+                cv2.rectangle(annotated_frame, (10, reader.height-60), (400, reader.height-10), (0, 0, 0), -1)
+                cv2.putText(annotated_frame, info_text, (20, reader.height-30), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
             
             # Write processed frame
-            out.write(annotated_frame)
-            
-            # Store detections
-            all_detections.extend(frame_detections)
+            if out is not None:
+                out.write(annotated_frame)
             
             frame_count += 1
             
+            # Live preview
+            if preview_due:
+                stats = {
+                    'frame': frame_count,
+                    'total_frames': frames_to_process,
+                    'detections': len(all_detections),
+                    'frame_detections': frame_detections,
+                    'frames_with_detections': frames_with_detections,
+                    'max_confidence': max_confidence,
+                }
+                if preview_callback(make_preview_frame(annotated_frame, preview_width), stats) is False:
+                    aborted = True
+                    print(f"Video processing aborted at frame {frame_count}/{frames_to_process}")
+                    break
+            
             # Progress indicator
             if frame_count % 30 == 0:
-                progress = (frame_count / total_frames) * 100
-                print(f"Progress: {progress:.1f}% ({frame_count}/{total_frames})")
+                progress = (frame_count / max(frames_to_process, 1)) * 100
+                print(f"Progress: {progress:.1f}% ({frame_count}/{frames_to_process})")
         
-        cap.release()
-        out.release()
-        cv2.destroyAllWindows()
+        reader.close()
+        if out is not None:
+            out.release()
+            artifacts = {}
+        else:
+            track_json, track_vtt = save_detection_track(
+                all_detections, video_path, fps, width, height, total_frames, output_dir
+            )
+            artifacts = {"track_json": track_json, "track_vtt": track_vtt}
         
-        # Save CSV with all detections
-        csv_path = save_enhanced_detection_csv(all_detections, output_dir, Path(video_path).stem, is_video=True)
+        # Save candidates for re-thresholding
+        if candidate_boxes:
+            artifacts["candidates"] = str(save_candidates(
+                candidates_path_for(video_path, output_dir),
+                np.concatenate(candidate_frames), np.concatenate(candidate_boxes),
+                np.concatenate(candidate_confidences), np.concatenate(candidate_classes),
+                class_names, video_path, is_video=True, fps=fps, keyframe_interval=keyframe_interval
+            ))
         
-        print(f"Video processing complete: {len(all_detections)} total detections")
+        status = "aborted" if aborted else "complete"
+        print(f"Video processing {status}: {len(all_detections)} total detections")
         
-        return str(output_path), str(csv_path) if csv_path else None
+        # CSV ditulis saat pertama kali dibutuhkan (result.csv_path)
+        return DetectionResult(
+            "video", video_path, output_path, all_detections,
+            timings={
+                "inference": inference_seconds,
+                "total": time.perf_counter() - started,
+                "frames": frame_count,
+                "decode": f"{reader.backend} {reader.width}x{reader.height}",
+                "keyframes": keyframes,
+                "forced_keyframes": forced_keyframes,
+            },
+            artifacts=artifacts,
+            csv_writer=partial(
+                save_enhanced_detection_csv, all_detections, output_dir, Path(video_path).stem,
+                is_video=True, fps=fps
+            ),
+            conf_threshold=CONFIDENCE_THRESHOLD, aborted=aborted, total_frames=total_frames, fps=fps,
+        )
         
     except Exception as e:
         print(f"Error in detect_video: {e}")
-        return create_dummy_detection(video_path, "video")
+        return create_dummy_detection(video_path, "video", output_dir)
 
-def save_enhanced_detection_csv(detections_data, output_dir, filename_stem, is_video=False):
+def detect_video_best_frames(video_path, model_path="best.pt", top_k=DEFAULT_TOP_K,
+                             window_seconds=DEFAULT_WINDOW_SECONDS, preview_callback=None, preview_width=480,
+                             max_side=INFERENCE_DECODE_SIZE, start=None, end=None, stride=1, output_dir="assets"):
     """
-    Simpan hasil deteksi ke CSV dengan informasi yang lebih lengkap
+    Deteksi video hanya pada top_k frame dengan kualitas terbaik (ketajaman +
+    kontras bagian langit) dalam tiap jendela window_seconds. Seeing senja
+    berubah dari frame ke frame; frame buram tidak perlu diinferensi.
+
+    Video tidak di-encode ulang: output_path adalah video asli, kotak disimpan
+    sebagai track overlay. preview_callback dipanggil untuk tiap frame terpilih.
+    max_side, start, end, stride: diteruskan ke VideoReader.
+
+    Returns: DetectionResult dengan best_frames (frame terpilih + skornya)
     """
     try:
-        csv_path = output_dir / f"detected_{filename_stem}.csv"
+        if not ULTRALYTICS_AVAILABLE:
+            return create_dummy_detection(video_path, "video", output_dir)
+        
+        started = time.perf_counter()
+        model = load_model(model_path)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
         
-        if detections_data:
-            # Convert to DataFrame
-            df = pd.DataFrame(detections_data)
+        reader = VideoReader(video_path, max_side=max_side, start=start, end=end, stride=stride)
+        frames = iter(reader)
+        fps = reader.fps
+        width, height = reader.source_width, reader.source_height
+        total_frames = reader.source_frames
+        
+        class_names = getattr(model, 'names', {0: 'Hilal'})
+        all_detections = DetectionArray(image_size=(width, height), class_names=class_names)
+        candidate_frames, candidate_boxes, candidate_confidences, candidate_classes = [], [], [], []
+        # Jendela dalam indeks frame sumber, jadi tetap benar dengan stride
+        selector = BestFrameSelector(top_k, round(window_seconds * fps))
+        selected_frames = []
+        frames_with_detections = 0
+        max_confidence = 0.0
+        inference_seconds = scoring_seconds = 0.0
+        frame_count = 0
+        aborted = False
+        
+        print(f"Scoring {reader.frame_count} frames ({reader.backend}, {reader.width}x{reader.height}), "
+              f"top {top_k} per {window_seconds:g} s...")
+        
+        while not aborted:
+            item = next(frames, None)
+            ret = item is not None
+            scoring_started = time.perf_counter()
+            selected = selector.offer(*item) if ret else selector.flush()
+            scoring_seconds += time.perf_counter() - scoring_started
             
-            # Add summary statistics for images
-            if not is_video:
-                # Add relative positions (normalized to 0-1)
-                if 'x1' in df.columns:
-                    # Assuming standard image dimensions for normalization
-                    # In real implementation, you'd get actual image dimensions
-                    df['rel_x1'] = df['x1'] / 640  # Normalize by detection image size
-                    df['rel_y1'] = df['y1'] / 640
-                    df['rel_x2'] = df['x2'] / 640
-                    df['rel_y2'] = df['y2'] / 640
+            for frame_index, best_frame, quality in selected:
+                inference_started = time.perf_counter()
+                with _predict_lock:
+                    results = model.predict(
+                        source=best_frame,
+                        imgsz=640,
+                        conf=CANDIDATE_CONFIDENCE,
+                        iou=CANDIDATE_IOU,
+                        verbose=False
+                    )
+                inference_seconds += time.perf_counter() - inference_started
                 
-                # Add detection statistics
-                summary_stats = {
-                    'total_detections': len(df),
-                    'avg_confidence': df['confidence'].mean() if 'confidence' in df else 0,
-                    'max_confidence': df['confidence'].max() if 'confidence' in df else 0,
-                    'min_confidence': df['confidence'].min() if 'confidence' in df else 0,
-                }
+                boxes, confidences, classes = result_to_arrays(results[0] if len(results) > 0 else None)
+                boxes = reader.scale_boxes(boxes)
+                candidate_frames.append(np.full(len(boxes), frame_index, np.int32))
+                candidate_boxes.append(boxes)
+                candidate_confidences.append(confidences)
+                candidate_classes.append(classes)
                 
-                # Add summary as comment in CSV
-                with open(csv_path, 'w') as f:
-                    f.write("# Hilal Detection Results\n")
-                    f.write(f"# Total Detections: {summary_stats['total_detections']}\n")
-                    f.write(f"# Average Confidence: {summary_stats['avg_confidence']:.3f}\n")
-                    f.write(f"# Max Confidence: {summary_stats['max_confidence']:.3f}\n")
-                    f.write(f"# Detection Model: YOLOv5/v8\n")
-                    f.write(f"# Confidence Threshold: 0.25\n#\n")
+                keep = filter_candidates(boxes, confidences, classes)
+                boxes, confidences, classes = boxes[keep], confidences[keep], classes[keep]
+                all_detections.append(boxes, confidences, classes, frame=frame_index)
+                if len(boxes):
+                    frames_with_detections += 1
+                    max_confidence = max(max_confidence, float(confidences.max()))
                 
-                # Append DataFrame
-                df.to_csv(csv_path, mode='a', index=False)
-            else:
-                # For video, group by frame
-                df['timestamp'] = df['frame'] / 30.0  # Assuming 30fps
-                df.to_csv(csv_path, index=False)
+                selected_frames.append({
+                    'frame': frame_index,
+                    'timestamp': frame_index / fps,
+                    **quality,
+                    'detections': len(boxes),
+                    'max_confidence': float(confidences.max()) if len(boxes) else 0.0,
+                })
                 
-                # Add video summary
-                with open(csv_path.parent / f"video_summary_{filename_stem}.txt", 'w') as f:
-                    f.write(f"Video Detection Summary\n")
-                    f.write(f"======================\n")
-                    f.write(f"Total Frames Processed: {df['frame'].max() + 1 if len(df) > 0 else 0}\n")
-                    f.write(f"Total Detections: {len(df)}\n")
-                    f.write(f"Frames with Detections: {df['frame'].nunique() if len(df) > 0 else 0}\n")
-                    f.write(f"Average Confidence: {df['confidence'].mean():.3f}\n")
-            
-            return csv_path
-        else:
-            # No detections - create empty CSV with headers
-            if is_video:
-                headers = ['frame', 'detection_id', 'x1', 'y1', 'x2', 'y2', 'confidence', 'class', 'class_name', 'timestamp']
-            else:
-                headers = ['detection_id', 'x1', 'y1', 'x2', 'y2', 'width', 'height', 'center_x', 'center_y', 
-                          'confidence', 'class', 'class_name', 'area', 'rel_x1', 'rel_y1', 'rel_x2', 'rel_y2']
+                if preview_callback is not None:
+                    annotated_frame = best_frame.copy()
+                    for (x1, y1, x2, y2), conf, cls in zip(boxes / np.float32(reader.scale * 2), confidences, classes):
+                        annotated_frame = draw_enhanced_bounding_box(
+                            annotated_frame, x1, y1, x2, y2, conf,
+                            class_names.get(int(cls), f'Class_{int(cls)}'), int(cls)
+                        )
+                    stats = {
+                        'frame': frame_index + 1,
+                        'total_frames': total_frames,
+                        'detections': len(all_detections),
+                        'frame_detections': len(boxes),
+                        'frames_with_detections': frames_with_detections,
+                        'max_confidence': max_confidence,
+                        'quality': quality['score'],
+                    }
+                    if preview_callback(make_preview_frame(annotated_frame, preview_width), stats) is False:
+                        aborted = True
+                        print(f"Video processing aborted at frame {frame_index + 1}/{total_frames}")
+                        break
             
-            df = pd.DataFrame(columns=headers)
+            if not ret:
+                break
+            frame_count += 1
+        
+        reader.close()
+        
+        track_json, track_vtt = save_detection_track(
+            all_detections, video_path, fps, width, height, total_frames, output_dir
+        )
+        artifacts = {"track_json": track_json, "track_vtt": track_vtt}
+        if candidate_boxes:
+            artifacts["candidates"] = str(save_candidates(
+                candidates_path_for(video_path, output_dir),
+                np.concatenate(candidate_frames), np.concatenate(candidate_boxes),
+                np.concatenate(candidate_confidences), np.concatenate(candidate_classes),
+                class_names, video_path, is_video=True, fps=fps
+            ))
+        
+        print(f"Best-frame detection: {len(selected_frames)}/{frame_count} frames analyzed, "
+              f"{len(all_detections)} detections")
+        
+        return DetectionResult(
+            "video", video_path, video_path, all_detections,
+            timings={
+                "inference": inference_seconds,
+                "scoring": scoring_seconds,
+                "total": time.perf_counter() - started,
+                "frames": frame_count,
+                "decode": f"{reader.backend} {reader.width}x{reader.height}",
+                "keyframes": len(selected_frames),
+            },
+            artifacts=artifacts,
+            csv_writer=partial(
+                save_enhanced_detection_csv, all_detections, output_dir, Path(video_path).stem,
+                is_video=True, fps=fps
+            ),
+            conf_threshold=CONFIDENCE_THRESHOLD, aborted=aborted, total_frames=total_frames, fps=fps,
+            best_frames=selected_frames,
+        )
+    
+    except Exception as e:
+        print(f"Error in detect_video_best_frames: {e}")
+        return create_dummy_detection(video_path, "video", output_dir)
+
+def save_enhanced_detection_csv(detections, output_dir, filename_stem, is_video=False,
+                                conf_threshold=CONFIDENCE_THRESHOLD, fps=None):
+    """
+    Simpan hasil deteksi (DetectionArray) ke CSV dengan informasi yang lebih lengkap
+    """
+    try:
+        csv_path = output_dir / f"detected_{filename_stem}.csv"
+        
+        if not is_video:
+            # Kolom turunan (ukuran, pusat, luas, koordinat relatif) dihitung vektor
+            df = detections.to_pandas(derived=True, include_frame=False)
+            stats = detections.stats()
             
             with open(csv_path, 'w') as f:
-                f.write("# Hilal Detection Results - No Detections Found\n")
-                f.write("# Model: YOLOv5/v8\n")
-                f.write("# Confidence Threshold: 0.25\n#\n")
+                if len(detections):
+                    f.write("# Hilal Detection Results\n")
+                    f.write(f"# Total Detections: {stats['total_detections']}\n")
+                    f.write(f"# Average Confidence: {stats['avg_confidence']:.3f}\n")
+                    f.write(f"# Max Confidence: {stats['max_confidence']:.3f}\n")
+                    f.write(f"# Detection Model: YOLOv5/v8\n")
+                else:
+                    f.write("# Hilal Detection Results - No Detections Found\n")
+                    f.write("# Model: YOLOv5/v8\n")
+                f.write(f"# Confidence Threshold: {conf_threshold}\n#\n")
             
+            # Append DataFrame
             df.to_csv(csv_path, mode='a', index=False)
-            return csv_path
+        else:
+            # For video, one row per box with frame + timestamp
+            df = detections.to_pandas(derived=False, fps=fps or 30)
+            df.to_csv(csv_path, index=False)
+            
+            if len(detections):
+                stats = detections.stats()
+                with open(csv_path.parent / f"video_summary_{filename_stem}.txt", 'w') as f:
+                    f.write(f"Video Detection Summary\n")
+                    f.write(f"======================\n")
+                    f.write(f"Total Frames Processed: {int(detections.data['frame'].max()) + 1}\n")
+                    f.write(f"Total Detections: {stats['total_detections']}\n")
+                    f.write(f"Frames with Detections: {stats['frames_with_detections']}\n")
+                    f.write(f"Average Confidence: {stats['avg_confidence']:.3f}\n")
+        
+        return csv_path
             
     except Exception as e:
         print(f"Error saving enhanced CSV: {e}")
         return None
 
-def create_dummy_detection(file_path, media_type):
+def create_dummy_detection(file_path, media_type, output_dir="assets"):
     """
     Buat hasil deteksi dummy jika model tidak tersedia
     """
     try:
-        output_dir = Path("assets")
-        output_dir.mkdir(exist_ok=True)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
         
         if media_type == "image":
             # Load and annotate image with "Model Not Available" message
@@ -482,12 +1017,8 @@ def create_dummy_detection(file_path, media_type):
             f.write("# No detections performed\n")
             f.write("detection_id,x1,y1,x2,y2,confidence,class,class_name\n")
         
-        return str(output_path), str(csv_path)
+        return DetectionResult(media_type, file_path, output_path, csv_path=csv_path, model_available=False)
         
     except Exception as e:
         print(f"Error creating dummy detection: {e}")
-        return None, None                     
-           
-                
-                   
-                   
\ No newline at end of file
+        return DetectionResult(media_type, file_path, model_available=False)
@@ -0,0 +1,291 @@
+import numpy as np
+
+# Satu baris per bounding box; kolom sama dengan CSV deteksi
+DETECTION_DTYPE = np.dtype([
+    ("frame", np.int32),
+    ("detection_id", np.int32),
+    ("x1", np.float32),
+    ("y1", np.float32),
+    ("x2", np.float32),
+    ("y2", np.float32),
+    ("confidence", np.float32),
+    ("class", np.int32),
+])
+
+DEFAULT_CAPACITY = 256
+
+
+class DetectionArray:
+    """
+    Kontainer deteksi kolumnar: structured array NumPy yang dialokasikan di
+    depan dan tumbuh 2x saat penuh, tanpa dict per kotak.
+
+    image_size: (lebar, tinggi) media asli, dipakai untuk koordinat ternormalisasi
+    class_names: dict id kelas -> nama
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, image_size=None, class_names=None):
+        self._data = np.zeros(max(int(capacity), 1), dtype=DETECTION_DTYPE)
+        self._size = 0
+        self.image_size = image_size
+        self.class_names = dict(class_names or {0: "Hilal"})
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f"DetectionArray({self._size} detections, capacity={len(self._data)})"
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._data):
+            return
+        capacity = len(self._data)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros(capacity, dtype=DETECTION_DTYPE)
+        grown[:self._size] = self._data[:self._size]
+        self._data = grown
+
+    def append(self, boxes, confidences, classes, frame=0):
+        """
+        Tambahkan semua kotak satu frame sekaligus (xyxy [n,4], conf [n], cls [n])
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        n = len(boxes)
+        if n == 0:
+            return self
+        self._reserve(n)
+        rows = self._data[self._size:self._size + n]
+        rows["frame"] = frame
+        rows["detection_id"] = np.arange(1, n + 1)
+        rows["x1"], rows["y1"], rows["x2"], rows["y2"] = boxes.T
+        rows["confidence"] = confidences
+        rows["class"] = classes
+        self._size += n
+        return self
+
+    @classmethod
+    def from_arrays(cls, boxes, confidences, classes, frames=None, image_size=None, class_names=None):
+        """
+        Bangun dari array kandidat; detection_id dinomori ulang per frame
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        detections = cls(len(boxes), image_size, class_names)
+        n = len(boxes)
+        frames = np.zeros(n, np.int32) if frames is None else np.asarray(frames, np.int32)
+        rows = detections._data[:n]
+        rows["frame"] = frames
+        rows["x1"], rows["y1"], rows["x2"], rows["y2"] = boxes.T
+        rows["confidence"] = confidences
+        rows["class"] = classes
+        if n:
+            # Nomor urut dalam tiap frame (frame tidak harus terurut)
+            order = np.argsort(frames, kind="stable")
+            sorted_frames = frames[order]
+            starts = np.r_[0, np.nonzero(np.diff(sorted_frames))[0] + 1]
+            ranks = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+            rows["detection_id"][order] = ranks + 1
+        detections._size = n
+        return detections
+
+    @property
+    def data(self):
+        """
+        View (tanpa salinan) ke baris yang terisi
+        """
+        return self._data[:self._size]
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    @property
+    def xyxy(self):
+        data = self.data
+        return np.stack([data["x1"], data["y1"], data["x2"], data["y2"]], axis=1)
+
+    @property
+    def confidence(self):
+        return self.data["confidence"]
+
+    @property
+    def width(self):
+        return self.data["x2"] - self.data["x1"]
+
+    @property
+    def height(self):
+        return self.data["y2"] - self.data["y1"]
+
+    @property
+    def center_x(self):
+        return (self.data["x1"] + self.data["x2"]) / 2
+
+    @property
+    def center_y(self):
+        return (self.data["y1"] + self.data["y2"]) / 2
+
+    @property
+    def area(self):
+        return self.width * self.height
+
+    def normalized(self):
+        """
+        Koordinat relatif 0-1 terhadap ukuran media asli: dict rel_x1..rel_y2
+        """
+        if not self.image_size:
+            raise ValueError("image_size tidak diketahui")
+        image_width, image_height = self.image_size
+        data = self.data
+        return {
+            "rel_x1": data["x1"] / image_width,
+            "rel_y1": data["y1"] / image_height,
+            "rel_x2": data["x2"] / image_width,
+            "rel_y2": data["y2"] / image_height,
+        }
+
+    def class_name_array(self):
+        unique, inverse = np.unique(self.data["class"], return_inverse=True)
+        names = np.array([self.class_names.get(int(c), f"Class_{int(c)}") for c in unique], dtype=object)
+        return names[inverse]
+
+    def frames(self):
+        """
+        Iterasi (frame, view baris frame itu), terurut per frame
+        """
+        data = self.data
+        if not len(data):
+            return
+        order = np.argsort(data["frame"], kind="stable")
+        sorted_data = data[order]
+        bounds = np.r_[0, np.nonzero(np.diff(sorted_data["frame"]))[0] + 1, len(sorted_data)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield int(sorted_data["frame"][start]), sorted_data[start:end]
+
+    def columns(self, derived=True, fps=None, include_frame=True):
+        """
+        Dict nama kolom -> array. Kolom dasar adalah view ke buffer;
+        kolom turunan dihitung vektor.
+        """
+        data = self.data
+        columns = {}
+        if include_frame:
+            columns["frame"] = data["frame"]
+        columns["detection_id"] = data["detection_id"]
+        for name in ("x1", "y1", "x2", "y2"):
+            columns[name] = data[name]
+        if derived:
+            columns.update(width=self.width, height=self.height, center_x=self.center_x, center_y=self.center_y)
+        columns["confidence"] = data["confidence"]
+        columns["class"] = data["class"]
+        columns["class_name"] = self.class_name_array()
+        if derived:
+            columns["area"] = self.area
+            if self.image_size:
+                columns.update(self.normalized())
+        if fps and include_frame:
+            columns["timestamp"] = data["frame"] / float(fps)
+        return columns
+
+    def to_pandas(self, derived=True, fps=None, include_frame=True):
+        """
+        DataFrame dari kolom NumPy (tanpa dict per baris)
+        """
+        import pandas as pd
+        return pd.DataFrame(self.columns(derived, fps, include_frame), copy=False)
+
+    def to_arrow(self, derived=True, fps=None, include_frame=True):
+        """
+        pyarrow.Table; kolom numerik dari buffer NumPy (view kontiguous
+        diteruskan tanpa salinan, field structured array disalin sekali)
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow diperlukan untuk to_arrow()") from e
+        columns = self.columns(derived, fps, include_frame)
+        return pa.table({
+            name: pa.array(np.ascontiguousarray(values)) if values.dtype != object else pa.array(values.tolist())
+            for name, values in columns.items()
+        })
+
+    def stats(self):
+        """
+        Ringkasan: jumlah, frame dengan deteksi, confidence rata-rata/maks/min
+        """
+        confidence = self.confidence
+        if not len(confidence):
+            return {"total_detections": 0, "frames_with_detections": 0,
+                    "avg_confidence": 0.0, "max_confidence": 0.0, "min_confidence": 0.0}
+        return {
+            "total_detections": int(len(confidence)),
+            "frames_with_detections": int(len(np.unique(self.data["frame"]))),
+            "avg_confidence": float(confidence.mean()),
+            "max_confidence": float(confidence.max()),
+            "min_confidence": float(confidence.min()),
+        }
+
+
+class DetectionResult:
+    """
+    Hasil satu deteksi: array deteksi, ringkasan, waktu proses dan path artefak.
+
+    CSV bersifat lazy: ditulis saat csv_path pertama kali diakses (csv_writer
+    dipanggil sekali). Tetap bisa di-unpack seperti hasil lama:
+        output_path, csv_path = detect_image(...)
+    """
+
+    def __init__(self, media_type, source_path, output_path=None, detections=None, timings=None,
+                 artifacts=None, csv_writer=None, csv_path=None, conf_threshold=None,
+                 model_available=True, aborted=False, total_frames=None, fps=None, best_frames=None):
+        self.media_type = media_type
+        self.source_path = str(source_path)
+        self.output_path = str(output_path) if output_path else None
+        self.detections = detections if detections is not None else DetectionArray()
+        self.timings = dict(timings or {})
+        self.artifacts = dict(artifacts or {})
+        self.conf_threshold = conf_threshold
+        self.model_available = model_available
+        self.aborted = aborted
+        self.total_frames = total_frames
+        self.fps = fps
+        # Mode frame terbaik: list dict frame, timestamp, sharpness, contrast, score, detections
+        self.best_frames = list(best_frames or [])
+        self._csv_writer = csv_writer
+        self._csv_path = str(csv_path) if csv_path else None
+
+    def __repr__(self):
+        return (f"DetectionResult({self.media_type!r}, {len(self.detections)} detections, "
+                f"output_path={self.output_path!r})")
+
+    def __iter__(self):
+        yield self.output_path
+        yield self.csv_path
+
+    def __getitem__(self, index):
+        return (self.output_path, self.csv_path)[index]
+
+    def __len__(self):
+        return 2
+
+    @property
+    def csv_path(self):
+        if self._csv_path is None and self._csv_writer is not None:
+            writer, self._csv_writer = self._csv_writer, None
+            path = writer()
+            self._csv_path = str(path) if path else None
+        return self._csv_path
+
+    @property
+    def csv_written(self):
+        return self._csv_path is not None
+
+    @property
+    def count(self):
+        return len(self.detections)
+
+    @property
+    def stats(self):
+        return self.detections.stats()
+
+    def to_pandas(self, **kwargs):
+        return self.detections.to_pandas(**kwargs)
@@ -0,0 +1,123 @@
+import heapq
+
+import cv2
+import numpy as np
+
+# Skor dihitung pada versi kecil bagian langit (atas frame, tanpa latar depan)
+QUALITY_WIDTH = 320
+SKY_FRACTION = 0.75
+DEFAULT_TOP_K = 3
+DEFAULT_WINDOW_SECONDS = 1.0
+
+
+def sky_region(frame, width=QUALITY_WIDTH, sky_fraction=SKY_FRACTION):
+    """
+    Frame BGR -> grayscale float32 yang diperkecil, hanya bagian langit
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    height, current = gray.shape[:2]
+    if current > width:
+        gray = cv2.resize(gray, (width, max(round(height * width / current), 3)), interpolation=cv2.INTER_AREA)
+    rows = max(int(gray.shape[0] * sky_fraction), 3)
+    return gray[:rows].astype(np.float32)
+
+
+def score_frames(regions):
+    """
+    Skor kualitas untuk satu atau banyak region [n, h, w] sekaligus (vektor):
+    ketajaman = varians Laplacian 4-tetangga, kontras = simpangan baku intensitas.
+    Returns: (sharpness [n], contrast [n], score [n])
+    """
+    g = np.asarray(regions, dtype=np.float32)
+    if g.ndim == 2:
+        g = g[None]
+    n = len(g)
+    laplacian = g[:, :-2, 1:-1] + g[:, 2:, 1:-1] + g[:, 1:-1, :-2] + g[:, 1:-1, 2:] - 4 * g[:, 1:-1, 1:-1]
+    sharpness = laplacian.reshape(n, -1).var(axis=1)
+    contrast = g.reshape(n, -1).std(axis=1)
+    # Akar varians agar ketajaman dan kontras berbobot setara (satuan intensitas)
+    score = np.sqrt(sharpness) * contrast
+    return sharpness, contrast, score
+
+
+def frame_quality(frame, width=QUALITY_WIDTH, sky_fraction=SKY_FRACTION):
+    """
+    Skor satu frame BGR: dict sharpness, contrast, score
+    """
+    sharpness, contrast, score = score_frames(sky_region(frame, width, sky_fraction))
+    return {"sharpness": float(sharpness[0]), "contrast": float(contrast[0]), "score": float(score[0])}
+
+
+class BestFrameSelector:
+    """
+    Pilih top_k frame terbaik per jendela window_frames frame dalam satu
+    lintasan. Hanya top_k frame penuh yang disimpan di memori (min-heap).
+    """
+
+    def __init__(self, top_k=DEFAULT_TOP_K, window_frames=30):
+        self.top_k = max(int(top_k), 1)
+        self.window_frames = max(int(window_frames), 1)
+        self._window = None
+        self._heap = []
+
+    def offer(self, index, frame):
+        """
+        Nilai satu frame. Returns: list frame terpilih dari jendela yang baru
+        selesai (kosong jika jendela belum berganti)
+        """
+        window = index // self.window_frames
+        finished = self.flush() if self._window is not None and window != self._window else []
+        self._window = window
+
+        # Frame disalin hanya jika masuk top_k (buffer decode bisa dipakai ulang)
+        quality = frame_quality(frame)
+        if len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, (quality["score"], index, quality, frame.copy()))
+        elif quality["score"] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (quality["score"], index, quality, frame.copy()))
+        return finished
+
+    def flush(self):
+        """
+        Frame terpilih jendela saat ini, urut indeks: list (index, frame, quality)
+        """
+        selected = sorted(((index, frame, quality) for _, index, quality, frame in self._heap), key=lambda item: item[0])
+        self._heap = []
+        return selected
+
+
+def score_video(video_path, step=1, batch_size=64):
+    """
+    Skor kualitas semua frame video (setiap `step` frame), dihitung per batch.
+    Frame didekode langsung pada resolusi kecil (VideoReader).
+    Returns: dict array frame, sharpness, contrast, score
+    """
+    from video_reader import VideoReader
+
+    frames, regions, results = [], [], []
+    with VideoReader(video_path, max_side=2 * QUALITY_WIDTH, stride=step) as reader:
+        for index, frame in reader:
+            frames.append(index)
+            regions.append(sky_region(frame))
+            if len(regions) == batch_size:
+                results.append(score_frames(regions))
+                regions = []
+    if regions:
+        results.append(score_frames(regions))
+    if not results:
+        empty = np.zeros(0, np.float32)
+        return {"frame": np.zeros(0, np.int32), "sharpness": empty, "contrast": empty, "score": empty}
+    sharpness, contrast, score = (np.concatenate(parts) for parts in zip(*results))
+    return {"frame": np.asarray(frames, np.int32), "sharpness": sharpness, "contrast": contrast, "score": score}
+
+
+if __name__ == "__main__":
+    import sys
+
+    for target in sys.argv[1:]:
+        scores = score_video(target)
+        best = np.argsort(-scores["score"])[:10]
+        print(f"{target}: {len(scores['frame'])} frames")
+        for i in best:
+            print(f"  frame {scores['frame'][i]:6d}  score {scores['score'][i]:9.1f}  "
+                  f"sharpness {scores['sharpness'][i]:9.1f}  contrast {scores['contrast'][i]:6.1f}")
@@ -0,0 +1,270 @@
+import os
+import threading
+import time
+from datetime import date as date_cls, datetime, timedelta, timezone
+
+import numpy as np
+
+from utils import load_ephemeris, load_timescale
+
+ISLAMIC_MONTHS = [
+    "Muharram", "Safar", "Rabi' al-Awwal", "Rabi' al-Thani",
+    "Jumada al-Awwal", "Jumada al-Thani", "Rajab", "Sha'ban",
+    "Ramadan", "Shawwal", "Dhu al-Qi'dah", "Dhu al-Hijjah"
+]
+
+# Ijtima' yang mengawali 1 Muharram 1446 H (2024-07-05 22:57 UTC)
+ANCHOR_CONJUNCTION = datetime(2024, 7, 5, 22, 57, tzinfo=timezone.utc)
+ANCHOR_HIJRI_INDEX = 1445 * 12
+
+# Lokasi acuan penentuan awal bulan (Jakarta, UTC+7)
+REFERENCE_LOCATION = {"lat": -6.2088, "lon": 106.8456, "utc_offset": 7}
+DEFAULT_CRITERION = "MABIMS"
+# Malam yang dievaluasi untuk awal bulan: malam ijtima' (D), D+1 dan D+2
+MONTH_START_EVENINGS = 3
+
+TABLE_DIR = os.environ.get("HILAL_TABLE_DIR", "assets")
+TABLE_YEARS = (1900, 2050)  # rentang de421
+# Setelah gagal membangun tabel (misal de421 tidak bisa diunduh), coba lagi paling cepat sesudah ini
+TABLE_RETRY_SECONDS = 600
+
+_table = None
+_table_lock = threading.Lock()
+_table_failure = None  # (waktu monotonic, pesan) kegagalan build terakhir
+_table_thread = None
+_month_starts = {}
+
+
+def _to_unix(dt):
+    if isinstance(dt, date_cls) and not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _from_unix(seconds):
+    return datetime.fromtimestamp(float(seconds), tz=timezone.utc).replace(tzinfo=None)
+
+
+def build_new_moon_table(start_year=TABLE_YEARS[0], end_year=TABLE_YEARS[1], ephemeris='de421.bsp'):
+    """
+    Cari semua instan ijtima' dengan skyfield dalam rentang tahun.
+    Returns: array float64 detik Unix (UTC), terurut
+    """
+    from skyfield import almanac
+
+    ts = load_timescale()
+    eph = load_ephemeris(ephemeris)
+    t0 = ts.utc(start_year, 1, 1)
+    t1 = ts.utc(end_year, 12, 31)
+    times, phases = almanac.find_discrete(t0, t1, almanac.moon_phases(eph))
+    new_moons = times[phases == 0]
+    return np.array([dt.timestamp() for dt in new_moons.utc_datetime()], dtype=np.float64)
+
+
+def table_path(ephemeris='de421.bsp', years=TABLE_YEARS):
+    name = os.path.splitext(os.path.basename(ephemeris))[0]
+    return os.path.join(TABLE_DIR, f"new_moons_{name}_{years[0]}_{years[1]}.npy")
+
+
+def _recent_failure():
+    if _table_failure is not None and time.monotonic() - _table_failure[0] < TABLE_RETRY_SECONDS:
+        return _table_failure[1]
+    return None
+
+
+def load_new_moon_table(ephemeris='de421.bsp', years=TABLE_YEARS):
+    """
+    Tabel ijtima' biner (.npy, ~15 KB). Dibangun sekali lalu dipakai ulang.
+    Kegagalan build diingat: selama TABLE_RETRY_SECONDS langsung raise
+    tanpa mencoba mengunduh ephemeris lagi.
+    """
+    global _table, _table_failure
+    with _table_lock:
+        if _table is not None:
+            return _table
+        path = table_path(ephemeris, years)
+        if os.path.exists(path):
+            _table = np.load(path)
+            return _table
+        failure = _recent_failure()
+        if failure:
+            raise RuntimeError(f"Tabel ijtima' tidak tersedia: {failure}")
+        try:
+            table = build_new_moon_table(years[0], years[1], ephemeris)
+        except Exception as e:
+            _table_failure = (time.monotonic(), str(e))
+            raise
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, table)
+        os.replace(tmp_path, path)
+        _table = table
+        _table_failure = None
+        return _table
+
+
+def _build_table_in_background():
+    try:
+        load_new_moon_table()
+    except Exception as e:
+        print(f"New moon table build failed: {e}")
+
+
+def new_moon_table_available():
+    """
+    Cek tanpa blok apakah tabel ijtima' siap (sudah dimuat atau ada di disk).
+    Jika belum, build dijalankan di thread latar belakang (kecuali baru saja
+    gagal) dan pemanggil memakai perhitungan siklus rata-rata sementara itu.
+    """
+    global _table_thread
+    if _table is not None or os.path.exists(table_path()):
+        return True
+    if _recent_failure() is None and (_table_thread is None or not _table_thread.is_alive()):
+        _table_thread = threading.Thread(target=_build_table_in_background, daemon=True, name="new-moon-table")
+        _table_thread.start()
+    return False
+
+
+def _conjunction_index(when):
+    """
+    Indeks ijtima' terakhir pada atau sebelum waktu tertentu (bisect, O(log n))
+    """
+    table = load_new_moon_table()
+    index = int(np.searchsorted(table, _to_unix(when), side="right")) - 1
+    if index < 0 or index >= len(table) - 1:
+        raise ValueError("Tanggal di luar rentang tabel ijtima'")
+    return index
+
+
+def previous_new_moon(when):
+    return _from_unix(load_new_moon_table()[_conjunction_index(when)])
+
+
+def next_new_moon(when):
+    return _from_unix(load_new_moon_table()[_conjunction_index(when) + 1])
+
+
+def get_moon_age(when=None):
+    """
+    Umur bulan, fase dan ijtima' sebelum/sesudah dari tabel
+    """
+    when = when or datetime.utcnow()
+    table = load_new_moon_table()
+    index = _conjunction_index(when)
+    previous, following = table[index], table[index + 1]
+    now = _to_unix(when)
+    fraction = (now - previous) / (following - previous)
+    phase_degrees = fraction * 360.0
+    return {
+        "age_hours": round(float(now - previous) / 3600.0, 2),
+        "age_days": round(float(now - previous) / 86400.0, 2),
+        "phase_degrees": round(float(phase_degrees), 1),
+        "illumination": round(float(50 * (1 - np.cos(np.radians(phase_degrees)))), 1),
+        "lunation_days": round(float(following - previous) / 86400.0, 3),
+        "previous_ijtima": _from_unix(previous),
+        "next_ijtima": _from_unix(following),
+    }
+
+
+def _anchor_index():
+    table = load_new_moon_table()
+    return int(np.argmin(np.abs(table - ANCHOR_CONJUNCTION.timestamp())))
+
+
+def _hijri_index(conjunction_index):
+    return ANCHOR_HIJRI_INDEX + (conjunction_index - _anchor_index())
+
+
+def _month_start(conjunction_index, criterion, location):
+    """
+    Tanggal 1 bulan Hijriah yang diawali ijtima' ke-i: hari sesudah maghrib
+    pertama (malam ijtima' s.d. MONTH_START_EVENINGS malam) yang memenuhi
+    kriteria di lokasi acuan; jika tidak ada, istikmal sesudah malam terakhir.
+    Hasil hanya di-cache jika semua evaluasi berhasil.
+    """
+    key = (conjunction_index, criterion, location["lat"], location["lon"])
+    if key in _month_starts:
+        return _month_starts[key]
+
+    from visibility import evaluate_visibility_points
+
+    conjunction = _from_unix(load_new_moon_table()[conjunction_index])
+    local_date = (conjunction + timedelta(hours=location["utc_offset"])).date()
+
+    for offset in range(MONTH_START_EVENINGS):
+        evening = local_date + timedelta(days=offset)
+        try:
+            result = evaluate_visibility_points(evening, [location["lat"]], [location["lon"]], criterion)
+        except Exception as e:
+            print(f"Month start evaluation failed: {e}")
+            # Perkiraan tanpa cache; dicoba lagi pada pemanggilan berikutnya
+            return local_date + timedelta(days=offset + 1)
+        sunset_utc = datetime(evening.year, evening.month, evening.day) + timedelta(
+            hours=float(result["sunset_utc_hours"][0])
+        )
+        if conjunction < sunset_utc and bool(result["visible"][0]):
+            start = evening + timedelta(days=1)
+            break
+    else:
+        # Istikmal: hilal tidak memenuhi kriteria di semua malam yang dievaluasi
+        start = local_date + timedelta(days=MONTH_START_EVENINGS)
+
+    _month_starts[key] = start
+    return start
+
+
+def gregorian_to_hijri(day=None, criterion=DEFAULT_CRITERION, location=REFERENCE_LOCATION):
+    """
+    Konversi tanggal Masehi ke Hijriah berdasarkan ijtima' dan kriteria visibilitas
+    """
+    day = day or datetime.utcnow().date()
+    if isinstance(day, datetime):
+        day = day.date()
+
+    index = _conjunction_index(day + timedelta(days=1))
+    start = _month_start(index, criterion, location)
+    if day < start:
+        index -= 1
+        start = _month_start(index, criterion, location)
+
+    hijri_index = _hijri_index(index)
+    month = hijri_index % 12 + 1
+    return {
+        "year": hijri_index // 12 + 1,
+        "month": month,
+        "day": (day - start).days + 1,
+        "month_name": ISLAMIC_MONTHS[month - 1],
+        "month_start": start,
+        "criterion": criterion,
+    }
+
+
+def hijri_month_start(year, month, criterion=DEFAULT_CRITERION, location=REFERENCE_LOCATION):
+    """
+    Tanggal Masehi untuk 1 bulan Hijriah tertentu
+    """
+    table = load_new_moon_table()
+    index = _anchor_index() + ((year - 1) * 12 + (month - 1)) - ANCHOR_HIJRI_INDEX
+    if index < 0 or index >= len(table) - 1:
+        raise ValueError("Bulan Hijriah di luar rentang tabel ijtima'")
+    return _month_start(index, criterion, location)
+
+
+def hijri_month_range(year, month, criterion=DEFAULT_CRITERION, location=REFERENCE_LOCATION):
+    """
+    (tanggal awal, tanggal awal bulan berikutnya) untuk satu bulan Hijriah
+    """
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return (
+        hijri_month_start(year, month, criterion, location),
+        hijri_month_start(next_year, next_month, criterion, location),
+    )
+
+
+if __name__ == "__main__":
+    table = load_new_moon_table()
+    print(f"{len(table)} new moons, {table.nbytes} bytes -> {table_path()}")
+    print(get_moon_age())
+    print(gregorian_to_hijri())
@@ -0,0 +1,229 @@
+import csv
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils import calculate_distances, calculate_qibla_directions, get_location_types
+
+# scipy opsional; diimpor saat gazetteer pertama kali dibangun
+SCIPY_AVAILABLE = importlib.util.find_spec("scipy") is not None
+
+# Gazetteer CSV: name,lat,lon[,timezone,kind] (kabupaten/kota dan pos observasi)
+GAZETTEER_PATH = os.environ.get("HILAL_GAZETTEER", os.path.join("assets", "gazetteer.csv"))
+
+# Predefined cities in Indonesia
+CITIES = {
+    "Jakarta": {"lat": -6.2088, "lon": 106.8456, "timezone": "WIB"},
+    "Surabaya": {"lat": -7.2575, "lon": 112.7521, "timezone": "WIB"},
+    "Bandung": {"lat": -6.9175, "lon": 107.6191, "timezone": "WIB"},
+    "Medan": {"lat": 3.5952, "lon": 98.6722, "timezone": "WIB"},
+    "Semarang": {"lat": -6.9667, "lon": 110.4167, "timezone": "WIB"},
+    "Makassar": {"lat": -5.1477, "lon": 119.4327, "timezone": "WITA"},
+    "Palembang": {"lat": -2.9761, "lon": 104.7754, "timezone": "WIB"},
+    "Bandar Lampung": {"lat": -5.4292, "lon": 105.2610, "timezone": "WIB"},
+    "Denpasar": {"lat": -8.6705, "lon": 115.2126, "timezone": "WITA"},
+    "Balikpapan": {"lat": -1.2379, "lon": 116.8529, "timezone": "WITA"},
+    "Pontianak": {"lat": -0.0263, "lon": 109.3425, "timezone": "WIB"},
+    "Manado": {"lat": 1.4748, "lon": 124.8421, "timezone": "WIT"},
+    "Yogyakarta": {"lat": -7.7956, "lon": 110.3695, "timezone": "WIB"},
+    "Malang": {"lat": -7.9797, "lon": 112.6304, "timezone": "WIB"},
+    "Padang": {"lat": -0.9471, "lon": 100.4172, "timezone": "WIB"}
+}
+
+# Pos observasi tambahan yang disimpan pengguna saat runtime (hanya untuk prefetch
+# cuaca, tidak masuk gazetteer bersama). Dibatasi jumlah dan umurnya.
+CUSTOM_POSTS = OrderedDict()
+MAX_CUSTOM_POSTS = 32
+CUSTOM_POST_TTL = 3 * 24 * 3600
+_posts_lock = threading.Lock()
+
+
+def _expire_posts(now):
+    while CUSTOM_POSTS:
+        name, post = next(iter(CUSTOM_POSTS.items()))
+        if now - post["saved_at"] < CUSTOM_POST_TTL and len(CUSTOM_POSTS) <= MAX_CUSTOM_POSTS:
+            break
+        del CUSTOM_POSTS[name]
+
+
+def register_post(name, lat, lon, timezone=None):
+    """
+    Daftarkan pos observasi kustom agar ikut di-prefetch cuacanya.
+    Pos terlama dibuang setelah CUSTOM_POST_TTL atau jika melebihi MAX_CUSTOM_POSTS.
+    """
+    post = {"lat": round(float(lat), 4), "lon": round(float(lon), 4), "timezone": timezone}
+    now = time.time()
+    with _posts_lock:
+        CUSTOM_POSTS.pop(name, None)
+        CUSTOM_POSTS[name] = {**post, "saved_at": now}
+        _expire_posts(now)
+    return post
+
+
+def get_observation_posts():
+    """
+    Semua lokasi: kota bawaan + pos kustom yang belum kedaluwarsa
+    """
+    with _posts_lock:
+        _expire_posts(time.time())
+        custom = {name: {key: value for key, value in post.items() if key != "saved_at"}
+                  for name, post in CUSTOM_POSTS.items()}
+    return {**CITIES, **custom}
+
+
+def _unit_vectors(lats, lons):
+    """
+    Koordinat -> vektor satuan 3D; jarak tali busur monoton dengan jarak lingkaran besar
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class Gazetteer:
+    """
+    Daftar lokasi dalam array ringkas dengan KD-tree untuk pencarian pos terdekat.
+    Tanpa scipy, pencarian memakai brute force NumPy (tetap vektor).
+    """
+
+    def __init__(self, names, lats, lons, timezones=None, kinds=None):
+        self.names = np.asarray(names, dtype=object)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.timezones = np.asarray(timezones if timezones is not None else [None] * len(self.names), dtype=object)
+        self.kinds = np.asarray(kinds if kinds is not None else ["city"] * len(self.names), dtype=object)
+        self._xyz = _unit_vectors(self.lats, self.lons)
+        self._tree = None
+        if SCIPY_AVAILABLE and len(self.names):
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(self._xyz)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Dari dict {nama: {"lat", "lon", "timezone", "kind"}}
+        """
+        names = list(records)
+        return cls(
+            names,
+            [records[n]["lat"] for n in names],
+            [records[n]["lon"] for n in names],
+            [records[n].get("timezone") for n in names],
+            [records[n].get("kind", "city") for n in names],
+        )
+
+    def nearest(self, lats, lons, k=1, chunk_size=4096):
+        """
+        Lokasi terdekat untuk array koordinat.
+        Returns: (indeks, jarak_km), bentuk (n,) untuk k=1 atau (n, k)
+        """
+        query = np.atleast_2d(_unit_vectors(lats, lons))
+        k = min(k, len(self))
+        if self._tree is not None:
+            _, index = self._tree.query(query, k=k)
+        else:
+            parts = []
+            for start in range(0, len(query), chunk_size):
+                chord = -(query[start:start + chunk_size] @ self._xyz.T)
+                if k == 1:
+                    parts.append(np.argmin(chord, axis=1))
+                else:
+                    part = np.argpartition(chord, k - 1, axis=1)[:, :k]
+                    order = np.argsort(np.take_along_axis(chord, part, axis=1), axis=1)
+                    parts.append(np.take_along_axis(part, order, axis=1))
+            index = np.concatenate(parts)
+        index = np.asarray(index)
+        q_lat = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        q_lon = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        if index.ndim == 2:
+            q_lat, q_lon = q_lat[:, None], q_lon[:, None]
+        distance = calculate_distances(q_lat, q_lon, self.lats[index], self.lons[index])
+        return index, distance
+
+    def nearest_post(self, lat, lon):
+        """
+        Pos/kota terdekat untuk satu koordinat (misal GPS dari EXIF)
+        """
+        index, distance = self.nearest([lat], [lon])
+        i = int(index[0])
+        return {
+            "name": self.names[i],
+            "lat": float(self.lats[i]),
+            "lon": float(self.lons[i]),
+            "timezone": self.timezones[i],
+            "kind": self.kinds[i],
+            "distance_km": round(float(distance[0]), 1),
+        }
+
+    def annotate(self, lats, lons):
+        """
+        Geoprocessing massal: pos terdekat, jarak, kiblat dan jenis wilayah per koordinat
+        """
+        index, distance = self.nearest(lats, lons)
+        qibla = calculate_qibla_directions(lats, lons)
+        return {
+            "nearest_post": self.names[index],
+            "nearest_distance_km": distance,
+            "qibla_direction": qibla["qibla_direction"],
+            "qibla_distance_km": qibla["distance_km"],
+            "location_type": get_location_types(lats, lons),
+        }
+
+
+def read_gazetteer_csv(path):
+    """
+    Baca CSV gazetteer (name,lat,lon[,timezone,kind]) -> dict lokasi
+    """
+    records = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                records[row["name"]] = {
+                    "lat": float(row["lat"]),
+                    "lon": float(row["lon"]),
+                    "timezone": row.get("timezone") or None,
+                    "kind": row.get("kind") or "city",
+                }
+            except (KeyError, ValueError) as e:
+                print(f"Skipping gazetteer row {row}: {e}")
+    return records
+
+
+_gazetteer = None
+
+
+def get_gazetteer(path=None):
+    """
+    Gazetteer bersama: CSV (jika ada) + kota bawaan. Pos kustom pengguna
+    tidak dimasukkan agar tidak menjadi hasil pos terdekat bagi pengguna lain.
+    """
+    global _gazetteer
+    with _posts_lock:
+        if _gazetteer is not None and path is None:
+            return _gazetteer
+        path = path or GAZETTEER_PATH
+        records = {}
+        if os.path.exists(path):
+            try:
+                records.update(read_gazetteer_csv(path))
+            except OSError as e:
+                print(f"Gazetteer load failed: {e}")
+        records.update(CITIES)
+        gazetteer = Gazetteer.from_records(records)
+        if path == GAZETTEER_PATH:
+            _gazetteer = gazetteer
+        return gazetteer
+
+
+def find_nearest_post(lat, lon):
+    """
+    Pos observasi/kota terdekat dari koordinat GPS
+    """
+    return get_gazetteer().nearest_post(lat, lon)
@@ -0,0 +1,214 @@
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from utils import read_exif_tags, exif_tags_to_metadata
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".heic", ".dng"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".3gp"}
+
+METADATA_COLUMNS = ["path", "media_type", "camera", "datetime", "lat", "lon", "error"]
+
+# Epoch waktu QuickTime/MP4 (detik sejak 1904-01-01 UTC)
+QUICKTIME_EPOCH = datetime(1904, 1, 1)
+# Batas ukuran atom 'moov' yang dibaca (metadata, bukan data media)
+MAX_MOOV_BYTES = 32 * 1024 * 1024
+
+_ISO6709 = re.compile(r"([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)")
+
+
+def _iter_boxes(data, start=0, end=None):
+    """
+    Iterasi box MP4/QuickTime dalam buffer: (type, payload_start, payload_end)
+    """
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                break
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            break
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_moov(f, file_size):
+    """
+    Cari atom 'moov' di level atas hanya dengan membaca header box (seek)
+    """
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            return None
+        if box_type == b"moov":
+            if size > MAX_MOOV_BYTES:
+                return None
+            f.seek(pos + header_size)
+            return f.read(size - header_size)
+        pos += size
+    return None
+
+
+def _parse_iso6709(text):
+    match = _ISO6709.match(text.strip())
+    if not match:
+        return None, None
+    return float(match.group(1)), float(match.group(2))
+
+
+def _parse_mvhd(data, start):
+    version = data[start]
+    if version == 1:
+        seconds = struct.unpack(">Q", data[start + 4:start + 12])[0]
+    else:
+        seconds = struct.unpack(">I", data[start + 4:start + 8])[0]
+    if seconds == 0:
+        return None
+    return QUICKTIME_EPOCH + timedelta(seconds=seconds)
+
+
+def _parse_quicktime_keys(moov, meta_start, meta_end):
+    """
+    Metadata QuickTime 'mdta' (keys + ilst), dipakai kamera ponsel
+    """
+    keys = []
+    values = {}
+    for box_type, start, end in _iter_boxes(moov, meta_start, meta_end):
+        if box_type == b"keys":
+            count = struct.unpack(">I", moov[start + 4:start + 8])[0]
+            pos = start + 8
+            for _ in range(count):
+                key_size = struct.unpack(">I", moov[pos:pos + 4])[0]
+                keys.append(moov[pos + 8:pos + key_size].decode("utf-8", "ignore"))
+                pos += key_size
+        elif box_type == b"ilst":
+            for item_type, item_start, item_end in _iter_boxes(moov, start, end):
+                index = struct.unpack(">I", item_type)[0]
+                for data_type, data_start, data_end in _iter_boxes(moov, item_start, item_end):
+                    if data_type == b"data" and 1 <= index <= len(keys):
+                        raw = moov[data_start + 8:data_end]
+                        values[keys[index - 1]] = raw.decode("utf-8", "ignore")
+    return values
+
+
+def extract_video_metadata(video_path):
+    """
+    Waktu pembuatan dan GPS dari container MP4/MOV tanpa mendekode video.
+    Returns: (camera, datetime, lat, lon)
+    """
+    camera, dt, lat, lon = None, None, None, None
+    with open(video_path, "rb") as f:
+        moov = _find_moov(f, os.fstat(f.fileno()).st_size)
+    if not moov:
+        return camera, dt, lat, lon
+
+    for box_type, start, end in _iter_boxes(moov):
+        if box_type == b"mvhd":
+            dt = _parse_mvhd(moov, start)
+        elif box_type == b"udta":
+            for sub_type, sub_start, sub_end in _iter_boxes(moov, start, end):
+                if sub_type == b"\xa9xyz":
+                    # 2 byte panjang string + 2 byte kode bahasa
+                    lat, lon = _parse_iso6709(moov[sub_start + 4:sub_end].decode("utf-8", "ignore"))
+                elif sub_type == b"\xa9mod" and camera is None:
+                    camera = moov[sub_start + 4:sub_end].decode("utf-8", "ignore").strip("\x00")
+        elif box_type == b"meta":
+            values = _parse_quicktime_keys(moov, start, end)
+            if "com.apple.quicktime.location.ISO6709" in values:
+                lat, lon = _parse_iso6709(values["com.apple.quicktime.location.ISO6709"])
+            if "com.apple.quicktime.model" in values:
+                camera = values["com.apple.quicktime.model"]
+            if "com.apple.quicktime.creationdate" in values:
+                try:
+                    created = datetime.fromisoformat(values["com.apple.quicktime.creationdate"])
+                    dt = created.replace(tzinfo=None) - (created.utcoffset() or timedelta(0))
+                except ValueError:
+                    pass
+    return camera, dt, lat, lon
+
+
+def extract_media_metadata(path):
+    """
+    Metadata satu file (foto atau video) sebagai dict baris tabel
+    """
+    suffix = Path(path).suffix.lower()
+    media_type = "video" if suffix in VIDEO_EXTENSIONS else "image"
+    row = {"path": str(path), "media_type": media_type, "camera": None,
+           "datetime": None, "lat": None, "lon": None, "error": None}
+    try:
+        if media_type == "video":
+            camera, dt, lat, lon = extract_video_metadata(path)
+        else:
+            camera, dt, lat, lon = exif_tags_to_metadata(read_exif_tags(path))
+        row.update(camera=str(camera) if camera is not None else None, datetime=dt, lat=lat, lon=lon)
+    except Exception as e:
+        row["error"] = str(e)
+    return row
+
+
+def iter_media_files(directory, recursive=True):
+    """
+    Semua file foto/video di direktori
+    """
+    extensions = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+    pattern = "**/*" if recursive else "*"
+    for path in Path(directory).glob(pattern):
+        if path.suffix.lower() in extensions and path.is_file():
+            yield path
+
+
+def extract_metadata_batch(paths, max_workers=None):
+    """
+    Ekstraksi metadata paralel (thread pool, I/O-bound) untuk banyak file.
+    Returns: DataFrame kolumnar (path, media_type, camera, datetime, lat, lon, error)
+    """
+    if isinstance(paths, (str, Path)) and Path(paths).is_dir():
+        paths = list(iter_media_files(paths))
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+
+    columns = {name: [] for name in METADATA_COLUMNS}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exif") as pool:
+        for row in pool.map(extract_media_metadata, paths):
+            for name in METADATA_COLUMNS:
+                columns[name].append(row[name])
+
+    df = pd.DataFrame(columns)
+    df["datetime"] = pd.to_datetime(df["datetime"])
+    df["lat"] = pd.to_numeric(df["lat"])
+    df["lon"] = pd.to_numeric(df["lon"])
+    return df
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "."
+    start = time.perf_counter()
+    table = extract_metadata_batch(target)
+    elapsed = time.perf_counter() - start
+    print(table.head(20))
+    print(f"{len(table)} files in {elapsed:.2f} s")
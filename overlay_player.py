@@ -0,0 +1,118 @@
+import json
+import mimetypes
+import os
+from pathlib import Path
+
+# Video diputar lewat endpoint media Streamlit (/media/...): MIME video yang benar
+# dan dukungan Range request. Folder static/ tidak dipakai karena Streamlit 1.28
+# menyajikan selain gambar sebagai text/plain dan menolak file > 200 MB.
+# Media manager menyimpan isi file di memori selama sesi, jadi video di atas
+# OVERLAY_MAX_BYTES tidak disematkan (track tetap bisa diunduh).
+OVERLAY_MAX_BYTES = 500 * 1024 ** 2
+
+PLAYER_TEMPLATE = """
+<div style="position: relative; width: 100%;">
+  <video id="hilal-video" src="__VIDEO_URL__" controls playsinline style="width: 100%; display: block;"></video>
+  <canvas id="hilal-overlay" style="position: absolute; left: 0; top: 0; pointer-events: none;"></canvas>
+</div>
+<div id="hilal-info" style="font-family: sans-serif; font-size: 13px; color: #FFD700; margin-top: 4px;"></div>
+<script>
+const track = __TRACK__;
+const video = document.getElementById("hilal-video");
+const canvas = document.getElementById("hilal-overlay");
+const info = document.getElementById("hilal-info");
+const ctx = canvas.getContext("2d");
+
+function color(conf) {
+  if (conf > 0.8) return "#00FF00";
+  if (conf > 0.5) return "#FFFF00";
+  return "#FFA500";
+}
+
+function draw() {
+  canvas.width = video.clientWidth;
+  canvas.height = video.clientHeight;
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  const frame = Math.floor(video.currentTime * track.fps + 1e-3);
+  const boxes = track.frames[frame] || [];
+  const sx = canvas.width / track.width;
+  const sy = canvas.height / track.height;
+  ctx.lineWidth = 2;
+  ctx.font = "13px sans-serif";
+  for (const [x1, y1, x2, y2, conf, cls] of boxes) {
+    ctx.strokeStyle = color(conf);
+    ctx.fillStyle = color(conf);
+    ctx.strokeRect(x1 * sx, y1 * sy, (x2 - x1) * sx, (y2 - y1) * sy);
+    const label = (track.class_names[cls] || "Hilal") + " " + (conf * 100).toFixed(1) + "%";
+    ctx.fillText(label, x1 * sx, Math.max(12, y1 * sy - 4));
+  }
+  info.textContent = "Frame " + (frame + 1) + "/" + track.total_frames + " | Deteksi: " + boxes.length;
+}
+
+function loop() {
+  draw();
+  if (video.requestVideoFrameCallback) {
+    video.requestVideoFrameCallback(loop);
+  } else if (!video.paused) {
+    requestAnimationFrame(loop);
+  }
+}
+
+video.addEventListener("loadedmetadata", draw);
+video.addEventListener("seeked", draw);
+video.addEventListener("play", loop);
+window.addEventListener("resize", draw);
+</script>
+"""
+
+
+def media_url(path, key):
+    """
+    Daftarkan video ke media file manager Streamlit. Returns: URL relatif
+    terhadap halaman, atau None jika runtime Streamlit tidak tersedia
+    """
+    try:
+        from streamlit.runtime import Runtime
+        manager = Runtime.instance().media_file_mgr
+    except Exception as e:
+        print(f"Streamlit media manager unavailable: {e}")
+        return None
+    mimetype = mimetypes.guess_type(str(path))[0] or "video/mp4"
+    return manager.add(str(path), mimetype, f"overlay.{key}").lstrip("/")
+
+
+def build_player_html(video_url, track):
+    """
+    HTML pemutar video + kanvas overlay yang menggambar kotak dari track per frame
+    """
+    return (PLAYER_TEMPLATE
+            .replace("__VIDEO_URL__", video_url)
+            .replace("__TRACK__", json.dumps(track, separators=(",", ":"))))
+
+
+def render_overlay_player(video_path, track_path, width=720, digest=None):
+    """
+    Tampilkan video asli dengan overlay deteksi yang digambar di browser.
+    Tanpa media manager: st.video biasa; video terlalu besar: hanya unduhan track.
+    digest: kunci media (misal digest isi upload), default nama file
+    """
+    import streamlit as st
+    import streamlit.components.v1 as components
+
+    with open(track_path) as f:
+        track = json.load(f)
+    vtt_path = Path(track_path).with_suffix(".vtt")
+    if os.path.getsize(video_path) > OVERLAY_MAX_BYTES:
+        st.info(f"Video lebih dari {OVERLAY_MAX_BYTES // 1024 ** 2} MB tidak diputar di browser; "
+                "unduh track deteksi untuk dipakai di pemutar lokal.")
+        video_url = None
+    else:
+        video_url = media_url(video_path, digest or Path(video_path).name)
+        if video_url is None:
+            st.video(str(video_path))
+    if video_url is not None:
+        aspect = (track.get("height") or 9) / (track.get("width") or 16)
+        components.html(build_player_html(video_url, track), height=int(width * aspect) + 40)
+    elif vtt_path.exists():
+        with open(vtt_path, "rb") as f:
+            st.download_button("🎞️ Download Track (WebVTT)", f, file_name=vtt_path.name, mime="text/vtt")
@@ -0,0 +1,239 @@
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+# Batas waktu per tahap (detik), dihitung sejak tahap mulai berjalan
+STAGE_TIMEOUTS = {
+    "detection": 600.0,
+    "position": 15.0,
+    "visibility": 30.0,
+    "weather": 8.0,
+    "phase": 15.0,
+}
+DEFAULT_STAGE_TIMEOUT = 60.0
+# Interval cek tahap yang masih antre di pool (deadline-nya belum mulai)
+STAGE_START_POLL = 0.5
+
+_stage_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="analysis-stage")
+
+
+class StageResult:
+    """
+    Hasil satu tahap analisis: value jika berhasil, error jika gagal/timeout
+    """
+
+    def __init__(self, name, value=None, error=None, elapsed=0.0):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"StageResult({self.name!r}, {status}, {self.elapsed:.2f}s)"
+
+
+def run_stages(stages, timeouts=None, poll=None, poll_interval=0.2, cancels=None):
+    """
+    Jalankan tahap-tahap independen secara bersamaan dan hasilkan StageResult
+    segera setelah masing-masing selesai (urutan selesai, bukan urutan input).
+    Batas waktu tiap tahap dihitung sejak tahap mulai berjalan (bukan sejak
+    diantrekan di pool bersama). Tahap yang melewatinya dilaporkan sebagai
+    TimeoutError; cancels[nama] dipanggil agar tahap panjang bisa berhenti,
+    selain itu thread-nya dibiarkan selesai sendiri di latar belakang.
+
+    stages: dict nama -> callable tanpa argumen
+    timeouts: dict nama -> detik (default STAGE_TIMEOUTS)
+    poll: callable tanpa argumen yang dipanggil di thread pemanggil setiap
+    poll_interval detik selama menunggu (misal memperbarui UI)
+    cancels: dict nama -> callable tanpa argumen untuk menghentikan tahap
+    """
+    timeouts = {**STAGE_TIMEOUTS, **(timeouts or {})}
+    cancels = cancels or {}
+    started = time.monotonic()
+    stage_started = {}
+
+    def timed(name, func):
+        def run():
+            stage_started[name] = time.monotonic()
+            return func()
+        return run
+
+    futures = {}
+    for name, func in stages.items():
+        futures[_stage_pool.submit(timed(name, func))] = name
+
+    def deadline(future):
+        name = futures[future]
+        if name not in stage_started:
+            return None
+        return stage_started[name] + timeouts.get(name, DEFAULT_STAGE_TIMEOUT)
+
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        # Future yang sudah selesai tidak pernah dianggap timeout
+        expired = {future for future in pending
+                   if not future.done() and deadline(future) is not None and deadline(future) <= now}
+        for future in expired:
+            future.cancel()
+            name = futures[future]
+            if name in cancels:
+                cancels[name]()
+            limit = timeouts.get(name, DEFAULT_STAGE_TIMEOUT)
+            yield StageResult(name, error=TimeoutError(f"{name} melewati batas {limit:g} s"), elapsed=now - started)
+        pending -= expired
+        if not pending:
+            break
+
+        # Tahap yang masih antre belum punya deadline: bangun berkala untuk mengeceknya
+        known = [deadline(future) for future in pending if deadline(future) is not None]
+        timeout = min(known) - now if known else STAGE_START_POLL
+        if len(known) < len(pending):
+            timeout = min(timeout, STAGE_START_POLL)
+        if poll is not None:
+            timeout = min(timeout, poll_interval)
+        done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        if poll is not None:
+            poll()
+        for future in done:
+            name = futures[future]
+            elapsed = time.monotonic() - started
+            try:
+                yield StageResult(name, value=future.result(), elapsed=elapsed)
+            except Exception as e:
+                print(f"Stage {name} failed: {e}")
+                yield StageResult(name, error=e, elapsed=elapsed)
+
+
+def run_all(stages, timeouts=None):
+    """
+    Seperti run_stages, tapi tunggu semuanya: dict nama -> StageResult
+    """
+    return {result.name: result for result in run_stages(stages, timeouts)}
+
+
+def build_observation_stages(dt, lat, lon):
+    """
+    Tahap astronomi + cuaca untuk satu observasi (waktu + koordinat)
+    """
+    from utils import compute_hilal_position, predict_hilal_visibility, get_weather, calculate_moon_phase
+
+    return {
+        "position": lambda: compute_hilal_position(dt, lat, lon),
+        "visibility": lambda: predict_hilal_visibility(dt, lat, lon),
+        "weather": lambda: get_weather(lat, lon),
+        "phase": lambda: calculate_moon_phase(dt),
+    }
+
+
+def build_analysis_stages(media_path, media_type, model_path="best.pt", lat=None, lon=None, dt=None):
+    """
+    Tahap analisis lengkap: deteksi, ditambah cuaca jika ada koordinat dan
+    posisi/visibilitas/fase jika ada waktu pengamatan
+    """
+    stages = {}
+    if media_path is not None:
+        from detect import detect_image, detect_video
+
+        detector = detect_image if media_type == "image" else detect_video
+        stages["detection"] = lambda: detector(str(media_path), model_path)
+
+    if lat is not None and lon is not None:
+        if dt is not None:
+            stages.update(build_observation_stages(dt, lat, lon))
+        else:
+            from utils import get_weather
+            stages["weather"] = lambda: get_weather(lat, lon)
+    return stages
+
+
+BATCH_COLUMNS = [
+    "file", "media_type", "status", "detections", "max_confidence", "avg_confidence",
+    "camera", "datetime", "lat", "lon", "output_path", "csv_path", "seconds", "error",
+]
+
+
+def _process_batch_file(path, model_path, output_dir="assets"):
+    from detect import detect_image, detect_video
+    from media_metadata import extract_media_metadata
+
+    start = time.perf_counter()
+    metadata = extract_media_metadata(path)
+    row = {name: None for name in BATCH_COLUMNS}
+    row.update(
+        file=os.path.basename(path), media_type=metadata["media_type"], camera=metadata["camera"],
+        datetime=metadata["datetime"], lat=metadata["lat"], lon=metadata["lon"],
+    )
+    detector = detect_image if metadata["media_type"] == "image" else detect_video
+    result = detector(str(path), model_path, output_dir=output_dir)
+    stats = result.stats if result.model_available else None
+    row.update(
+        status="ok" if result.output_path else "failed",
+        detections=stats["total_detections"] if stats else 0,
+        max_confidence=stats["max_confidence"] if stats and stats["total_detections"] else None,
+        avg_confidence=stats["avg_confidence"] if stats and stats["total_detections"] else None,
+        output_path=result.output_path, csv_path=result.csv_path,
+        seconds=round(time.perf_counter() - start, 2),
+    )
+    return row
+
+
+def run_batch(paths, model_path="best.pt", max_workers=4, output_dir="assets"):
+    """
+    Proses banyak file (metadata + deteksi) dengan worker pool.
+    Menghasilkan satu dict baris per file segera setelah file itu selesai.
+    Output deteksi ditulis ke output_dir.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch") as pool:
+        futures = {pool.submit(_process_batch_file, path, model_path, output_dir): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                print(f"Batch item {path} failed: {e}")
+                row = {name: None for name in BATCH_COLUMNS}
+                row.update(file=os.path.basename(path), status="failed", error=str(e))
+                yield row
+
+
+def build_batch_zip(rows, zip_path):
+    """
+    Satu arsip zip berisi semua output teranotasi, CSV per file dan ringkasan batch
+    """
+    import pandas as pd
+
+    os.makedirs(os.path.dirname(zip_path) or ".", exist_ok=True)
+    used_names = set()
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for i, row in enumerate(rows):
+            for key in ("output_path", "csv_path"):
+                path = row.get(key)
+                if path and os.path.exists(path):
+                    # Nama anggota arsip harus unik meski dua input bernama sama
+                    arcname = os.path.basename(path)
+                    if arcname in used_names:
+                        arcname = f"{i}_{arcname}"
+                    used_names.add(arcname)
+                    # Media sudah terkompresi; simpan tanpa deflate
+                    compress = zipfile.ZIP_DEFLATED if path.endswith(".csv") else zipfile.ZIP_STORED
+                    archive.write(path, arcname=arcname, compress_type=compress)
+        summary = pd.DataFrame(rows, columns=BATCH_COLUMNS)
+        archive.writestr("batch_summary.csv", summary.to_csv(index=False))
+    return zip_path
+
+
+if __name__ == "__main__":
+    from datetime import datetime
+
+    stages = build_observation_stages(datetime.utcnow(), -6.2088, 106.8456)
+    start = time.perf_counter()
+    for result in run_stages(stages):
+        print(result)
+    print(f"total {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+
+import cv2
+import numpy as np
+
+PREVIEW_DIR = os.environ.get("HILAL_PREVIEW_DIR", os.path.join("assets", "previews"))
+# Lebar piramida preview (px); resolusi penuh hanya lewat tombol unduh
+PREVIEW_SIZES = (160, 480, 1280)
+DEFAULT_PREVIEW_WIDTH = 1280
+JPEG_QUALITY = 85
+
+# Faktor decode tereduksi yang didukung OpenCV untuk JPEG
+_REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _artifact_key(path):
+    """
+    Kunci cache dari path + ukuran + mtime: berubah jika file ditimpa
+    """
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _lock_for(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def preview_path(path, width):
+    return os.path.join(PREVIEW_DIR, f"{_artifact_key(path)}_{width}.jpg")
+
+
+def image_size(path):
+    """
+    Ukuran (lebar, tinggi) dari header saja, tanpa decode piksel
+    """
+    from PIL import Image
+    with Image.open(path) as image:
+        return image.size
+
+
+def embedded_thumbnail(path):
+    """
+    Thumbnail JPEG yang tertanam di EXIF (biasanya 160x120), None jika tidak ada
+    """
+    import exifread
+    try:
+        with open(path, "rb") as f:
+            tags = exifread.process_file(f, details=False, extract_thumbnail=True)
+    except Exception:
+        return None
+    data = tags.get("JPEGThumbnail")
+    if not data:
+        return None
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return image
+
+
+def decode_reduced(path, target_width):
+    """
+    Decode gambar pada skala terkecil (1/2, 1/4, 1/8) yang masih >= target_width.
+    JPEG didekode langsung pada skala tereduksi (DCT scaling), jauh lebih murah
+    daripada decode penuh lalu resize.
+    """
+    try:
+        width, _ = image_size(path)
+    except Exception:
+        width = None
+    if width:
+        for factor, flag in _REDUCED_FLAGS.items():
+            if width // factor >= target_width:
+                image = cv2.imread(path, flag)
+                if image is not None:
+                    return image
+                break
+    return cv2.imread(path, cv2.IMREAD_COLOR)
+
+
+def _resize_to_width(image, width):
+    height, current = image.shape[:2]
+    if current <= width:
+        return image
+    return cv2.resize(image, (width, round(height * width / current)), interpolation=cv2.INTER_AREA)
+
+
+def _write_jpeg(image, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.tobytes())
+    os.replace(tmp_path, path)
+
+
+def build_preview_pyramid(path, sizes=PREVIEW_SIZES):
+    """
+    Bangun semua ukuran preview untuk satu artefak dari satu decode tereduksi.
+    Ukuran yang tidak lebih besar dari thumbnail EXIF diambil dari thumbnail.
+    Returns: dict lebar -> path JPEG preview
+    """
+    sizes = sorted(sizes)
+    key = _artifact_key(path)
+    with _lock_for(key):
+        targets = {width: preview_path(path, width) for width in sizes}
+        missing = [width for width, target in targets.items() if not os.path.exists(target)]
+        if not missing:
+            return targets
+
+        thumbnail = embedded_thumbnail(path) if missing[0] <= PREVIEW_SIZES[0] else None
+        source = None
+        for width in reversed(missing):
+            if thumbnail is not None and width <= thumbnail.shape[1]:
+                image = _resize_to_width(thumbnail, width)
+            else:
+                if source is None:
+                    source = decode_reduced(path, max(missing))
+                    if source is None:
+                        raise ValueError(f"Could not decode {path}")
+                image = _resize_to_width(source, width)
+                # Ukuran berikutnya lebih kecil: turunkan dari hasil ini, bukan dari sumber
+                source = image
+            _write_jpeg(image, targets[width])
+        return targets
+
+
+def get_preview(path, width=DEFAULT_PREVIEW_WIDTH):
+    """
+    Path JPEG preview terkecil dalam piramida yang lebarnya >= width.
+    Jika gagal (format tidak didukung), kembalikan path asli.
+    """
+    try:
+        pyramid = build_preview_pyramid(path)
+    except Exception as e:
+        print(f"Preview failed for {path}: {e}")
+        return str(path)
+    for size in sorted(pyramid):
+        if size >= width:
+            return pyramid[size]
+    return pyramid[max(pyramid)]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    for target in sys.argv[1:]:
+        start = time.perf_counter()
+        pyramid = build_preview_pyramid(target)
+        elapsed = time.perf_counter() - start
+        sizes = ", ".join(f"{w}px={os.path.getsize(p) // 1024} KB" for w, p in sorted(pyramid.items()))
+        print(f"{target}: {sizes} ({elapsed:.2f} s)")
@@ -0,0 +1,337 @@
+"""
+Layanan HTTP headless untuk deteksi hilal dan data astronomi (tanpa Streamlit).
+
+    python service.py --port 8600 --max-batch 8 --max-wait-ms 20
+
+Endpoint:
+    GET  /health
+    POST /detect/image            body: byte gambar (JPEG/PNG)
+    POST /jobs/video              body: byte video; -> {"job_id": ...}
+    GET  /jobs/<job_id>           status + progres + hasil
+    GET  /astro/position?lat=&lon=&time=ISO
+    GET  /astro/visibility?lat=&lon=&date=YYYY-MM-DD&criterion=MABIMS
+    GET  /astro/moon-phase?time=ISO
+    GET  /astro/hijri?date=YYYY-MM-DD&criterion=MABIMS
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+DEFAULT_MODEL_PATH = os.environ.get("HILAL_MODEL_PATH", "best.pt")
+DEFAULT_MAX_BATCH = 8
+DEFAULT_MAX_WAIT_MS = 20
+DEFAULT_CONFIDENCE = 0.25
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+JOBS_DIR = os.path.join("assets", "jobs")
+
+
+def _result_to_detections(result, class_names):
+    """
+    Satu hasil ultralytics -> list dict deteksi (kolom sama dengan CSV detect.py)
+    """
+    if result.boxes is None:
+        return []
+    boxes = result.boxes.xyxy.cpu().numpy()
+    confidences = result.boxes.conf.cpu().numpy()
+    classes = result.boxes.cls.cpu().numpy()
+    detections = []
+    for i, (box, conf, cls) in enumerate(zip(boxes, confidences, classes)):
+        x1, y1, x2, y2 = (float(v) for v in box)
+        detections.append({
+            'detection_id': i + 1,
+            'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
+            'confidence': float(conf),
+            'class': int(cls),
+            'class_name': class_names.get(int(cls), f'Class_{int(cls)}'),
+        })
+    return detections
+
+
+class MicroBatcher:
+    """
+    Kumpulkan permintaan gambar tunggal yang datang bersamaan menjadi satu
+    batch inferensi: batch dijalankan saat penuh (max_batch) atau saat
+    permintaan tertua sudah menunggu max_wait_ms.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, max_batch=DEFAULT_MAX_BATCH,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, conf=DEFAULT_CONFIDENCE, imgsz=640):
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.conf = conf
+        self.imgsz = imgsz
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "largest_batch": 0}
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="micro-batcher")
+            self._thread.start()
+        return self
+
+    def submit(self, image):
+        """
+        Antrekan satu gambar BGR. Returns: Future -> (list deteksi, ukuran batch)
+        """
+        future = Future()
+        self._queue.put((image, future))
+        with self._lock:
+            self._stats["requests"] += 1
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        from detect import _predict_lock, load_model
+
+        while True:
+            batch = self._collect()
+            futures = [future for _, future in batch if future.set_running_or_notify_cancel()]
+            images = [image for image, future in batch if future in futures]
+            if not images:
+                continue
+            try:
+                model = load_model(self.model_path)
+                # Model yang sama dipakai detect_image/detect_video di thread lain
+                with _predict_lock:
+                    results = model.predict(source=images, imgsz=self.imgsz, conf=self.conf, verbose=False)
+                class_names = getattr(model, 'names', {0: 'Hilal'})
+                with self._lock:
+                    self._stats["batches"] += 1
+                    self._stats["largest_batch"] = max(self._stats["largest_batch"], len(images))
+                for future, result in zip(futures, results):
+                    future.set_result((_result_to_detections(result, class_names), len(images)))
+            except Exception as e:
+                print(f"Batch inference failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+
+
+class VideoJobs:
+    """
+    Antrean job deteksi video (satu video diproses pada satu waktu)
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, max_workers=1):
+        self.model_path = model_path
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="video-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, data, suffix=".mp4"):
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        path = os.path.join(JOBS_DIR, f"{job_id}{suffix}")
+        with open(path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            self._jobs[job_id] = {"job_id": job_id, "status": "queued", "progress": None,
+                                  "submitted_at": datetime.utcnow().isoformat(timespec="seconds")}
+        self._pool.submit(self._run, job_id, path)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, path):
+        from detect import detect_video
+
+        self._update(job_id, status="running")
+
+        def progress(_frame, stats):
+            self._update(job_id, progress=stats)
+            return True
+
+        try:
+            result = detect_video(path, self.model_path, preview_callback=progress, preview_every=30)
+            self._update(job_id, status="done", output_path=result.output_path, csv_path=result.csv_path,
+                         summary=result.stats, timings=result.timings,
+                         finished_at=datetime.utcnow().isoformat(timespec="seconds"))
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e))
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else datetime.utcnow().date()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def astro_position(params):
+    from utils import compute_hilal_position
+    alt, az = compute_hilal_position(_parse_time(params.get("time")), float(params["lat"]), float(params["lon"]))
+    return {"altitude": alt, "azimuth": az}
+
+
+def astro_visibility(params):
+    from visibility import evaluate_visibility_points
+    result = evaluate_visibility_points(
+        _parse_date(params.get("date")), [float(params["lat"])], [float(params["lon"])],
+        params.get("criterion", "MABIMS")
+    )
+    return {
+        key: (value[0].item() if isinstance(value, np.ndarray) and value.size == 1 else value)
+        for key, value in result.items()
+    }
+
+
+def astro_moon_phase(params):
+    from utils import calculate_moon_phase
+    return calculate_moon_phase(_parse_time(params.get("time")))
+
+
+def astro_hijri(params):
+    from hijri import gregorian_to_hijri
+    return gregorian_to_hijri(_parse_date(params.get("date")), params.get("criterion", "MABIMS"))
+
+
+ASTRO_ENDPOINTS = {
+    "/astro/position": astro_position,
+    "/astro/visibility": astro_visibility,
+    "/astro/moon-phase": astro_moon_phase,
+    "/astro/hijri": astro_hijri,
+}
+
+
+class HilalRequestHandler(BaseHTTPRequestHandler):
+    server_version = "hilal-deteksi/1.0"
+    batcher = None
+    jobs = None
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0 or length > MAX_UPLOAD_BYTES:
+            raise ValueError("Body kosong atau terlalu besar")
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == "/health":
+                return self._send_json({"status": "ok", "batcher": self.batcher.stats})
+            if url.path.startswith("/jobs/"):
+                job = self.jobs.get(url.path.rsplit("/", 1)[-1])
+                return self._send_json(job or {"error": "job not found"}, 200 if job else 404)
+            if url.path in ASTRO_ENDPOINTS:
+                return self._send_json(ASTRO_ENDPOINTS[url.path](params))
+            self._send_json({"error": "not found"}, 404)
+        except (KeyError, ValueError) as e:
+            self._send_json({"error": f"parameter tidak valid: {e}"}, 400)
+        except Exception as e:
+            self._send_json({"error": str(e)}, 500)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == "/detect/image":
+                import cv2
+                image = cv2.imdecode(np.frombuffer(self._read_body(), np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    raise ValueError("Gambar tidak dapat didekode")
+                start = time.perf_counter()
+                detections, batch_size = self.batcher.submit(image).result()
+                return self._send_json({
+                    "detections": detections,
+                    "count": len(detections),
+                    "batch_size": batch_size,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                })
+            if url.path == "/jobs/video":
+                suffix = Path(parse_qs(url.query).get("filename", ["video.mp4"])[-1]).suffix or ".mp4"
+                job_id = self.jobs.submit(self._read_body(), suffix)
+                return self._send_json({"job_id": job_id, "status_url": f"/jobs/{job_id}"}, 202)
+            self._send_json({"error": "not found"}, 404)
+        except ValueError as e:
+            self._send_json({"error": str(e)}, 400)
+        except Exception as e:
+            self._send_json({"error": str(e)}, 500)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+
+def create_server(host="0.0.0.0", port=8600, model_path=DEFAULT_MODEL_PATH,
+                  max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    """
+    Server HTTP multi-thread; setiap permintaan di thread sendiri, inferensi
+    gambar digabung oleh MicroBatcher bersama.
+    """
+    handler = type("Handler", (HilalRequestHandler,), {
+        "batcher": MicroBatcher(model_path, max_batch=max_batch, max_wait_ms=max_wait_ms).start(),
+        "jobs": VideoJobs(model_path),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hilal detection HTTP service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.model, args.max_batch, args.max_wait_ms)
+    print(f"Serving on http://{args.host}:{args.port} (max batch {args.max_batch}, max wait {args.max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,87 @@
+"""
+Ukur biaya impor (cold start) modul aplikasi dengan `python -X importtime`.
+
+    python startup_profile.py                      # laporan per modul
+    python startup_profile.py --budget 1.5         # exit 1 jika total > 1.5 s
+    python startup_profile.py utils detect --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Modul yang diimpor app.py sebelum halaman pertama tampil
+DEFAULT_MODULES = ["utils", "pipeline", "locations", "detect"]
+# Dependensi berat yang seharusnya TIDAK ikut terimpor saat startup
+HEAVY_MODULES = ["torch", "ultralytics", "skyfield", "hilalpy", "exifread", "requests", "scipy"]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _interpreter_modules():
+    """
+    Modul yang sudah diimpor interpreter kosong (site, encodings, ...), tidak dihitung
+    """
+    return measure_imports([])[2]
+
+
+def measure_imports(modules):
+    """
+    Impor modul di interpreter baru dan kembalikan
+    (total_detik, {paket_top_level: kumulatif_detik}, set modul yang terimpor)
+    """
+    code = "; ".join(f"import {name}" for name in modules) or "pass"
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    per_package = {}
+    imported = set()
+    baseline = _interpreter_modules() if modules else set()
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        imported.add(name)
+        # Hanya impor level teratas (indentasi 1) yang dijumlahkan agar tidak dihitung ganda
+        if indent == 1 and name not in baseline:
+            package = name.split(".")[0]
+            per_package[package] = per_package.get(package, 0.0) + cumulative_us / 1e6
+    return sum(per_package.values()), per_package, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget", type=float, help="batas total waktu impor (detik)")
+    parser.add_argument("--top", type=int, default=10, help="jumlah paket termahal yang ditampilkan")
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        total, _, _ = measure_imports([module])
+        print(f"{module:<20} {total * 1000:8.1f} ms")
+
+    total, per_package, imported = measure_imports(args.modules)
+    print(f"{'total':<20} {total * 1000:8.1f} ms")
+    print("\nPaket termahal:")
+    for package, seconds in sorted(per_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<18} {seconds * 1000:8.1f} ms")
+
+    eager = sorted(name for name in HEAVY_MODULES if name in imported)
+    if eager:
+        print(f"\nDependensi berat ikut terimpor saat startup: {', '.join(eager)}")
+
+    if args.budget is not None and total > args.budget:
+        print(f"\nMelebihi budget cold start: {total:.2f} s > {args.budget:.2f} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import numpy as np
+
+from detect import filter_candidates, nms, rethreshold_detections, save_candidates
+
+# Kotak 0 dan 1: IoU = 80 / 120 = 0.667; kotak 2 terpisah
+BOXES = np.array([[0, 0, 10, 10], [2, 0, 12, 10], [50, 50, 60, 60]], np.float32)
+
+
+def test_nms_keeps_highest_score_and_orders_by_score():
+    scores = np.array([0.6, 0.9, 0.7], np.float32)
+    assert nms(BOXES, scores, 0.5).tolist() == [1, 2]
+
+
+def test_nms_keeps_overlap_below_threshold():
+    scores = np.array([0.6, 0.9, 0.7], np.float32)
+    assert nms(BOXES, scores, 0.7).tolist() == [1, 2, 0]
+
+
+def test_filter_candidates_applies_confidence_first():
+    confidences = np.array([0.6, 0.2, 0.7], np.float32)
+    classes = np.zeros(3, np.int32)
+    # Kotak 1 di bawah ambang, jadi tidak menekan kotak 0
+    assert sorted(filter_candidates(BOXES, confidences, classes, conf=0.25, iou=0.5).tolist()) == [0, 2]
+
+
+def test_filter_candidates_nms_is_per_class():
+    confidences = np.array([0.6, 0.9, 0.7], np.float32)
+    same_class = np.zeros(3, np.int32)
+    other_class = np.array([1, 0, 0], np.int32)
+    assert sorted(filter_candidates(BOXES, confidences, same_class, conf=0.25, iou=0.5).tolist()) == [1, 2]
+    assert sorted(filter_candidates(BOXES, confidences, other_class, conf=0.25, iou=0.5).tolist()) == [0, 1, 2]
+
+
+def test_filter_candidates_empty():
+    confidences = np.array([0.1, 0.1, 0.1], np.float32)
+    assert filter_candidates(BOXES, confidences, np.zeros(3, np.int32)).size == 0
+
+
+def test_rethreshold_video_filters_each_frame(tmp_path):
+    # Frame 3: dua kotak tumpang tindih (hanya yang terkuat lolos); frame 1: satu kotak lemah
+    frames = np.array([3, 3, 1, 3], np.int32)
+    boxes = np.array([[0, 0, 10, 10], [2, 0, 12, 10], [0, 0, 10, 10], [50, 50, 60, 60]], np.float32)
+    confidences = np.array([0.6, 0.9, 0.3, 0.5], np.float32)
+    classes = np.zeros(4, np.int32)
+    path = save_candidates(tmp_path / "c.npz", frames, boxes, confidences, classes, {0: "Hilal"},
+                           tmp_path / "video.mp4", is_video=True, fps=30.0)
+
+    result = rethreshold_detections(path, conf=0.4, iou=0.5, output_dir=tmp_path)
+    data = result.detections.data
+    assert sorted(zip(data["frame"].tolist(), data["x1"].tolist())) == [(3, 2.0), (3, 50.0)]
+    assert sorted(data["detection_id"].tolist()) == [1, 2]
+
+    result = rethreshold_detections(path, conf=0.25, iou=0.5, output_dir=tmp_path)
+    assert sorted(result.detections.data["frame"].tolist()) == [1, 3, 3]
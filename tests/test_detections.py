@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from detections import DetectionArray
+
+
+def test_append_grows_capacity_and_keeps_rows():
+    detections = DetectionArray(capacity=2, image_size=(100, 50))
+    detections.append([[0, 0, 10, 10], [5, 5, 15, 25]], [0.9, 0.8], [0, 0], frame=0)
+    detections.append([[20, 10, 40, 30], [1, 1, 2, 2], [3, 3, 4, 4]], [0.7, 0.6, 0.5], [0, 1, 0], frame=4)
+    assert len(detections) == 5
+    assert len(detections._data) == 8
+    assert detections.data["frame"].tolist() == [0, 0, 4, 4, 4]
+    assert detections.data["detection_id"].tolist() == [1, 2, 1, 2, 3]
+    assert detections.xyxy[2].tolist() == [20, 10, 40, 30]
+
+
+def test_derived_columns_and_normalized():
+    detections = DetectionArray(image_size=(100, 50))
+    detections.append([[10, 5, 30, 25]], [0.5], [0])
+    assert detections.width.tolist() == [20]
+    assert detections.height.tolist() == [20]
+    assert detections.center_x.tolist() == [20]
+    assert detections.center_y.tolist() == [15]
+    assert detections.area.tolist() == [400]
+    normalized = detections.normalized()
+    assert normalized["rel_x1"].tolist() == pytest.approx([0.1])
+    assert normalized["rel_y1"].tolist() == pytest.approx([0.1])
+    assert normalized["rel_x2"].tolist() == pytest.approx([0.3])
+    assert normalized["rel_y2"].tolist() == pytest.approx([0.5])
+
+
+def test_normalized_requires_image_size():
+    with pytest.raises(ValueError):
+        DetectionArray().normalized()
+
+
+def test_from_arrays_ranks_ids_within_unsorted_frames():
+    frames = [7, 2, 7, 2, 7]
+    boxes = np.arange(20, dtype=np.float32).reshape(5, 4)
+    detections = DetectionArray.from_arrays(boxes, [0.1, 0.2, 0.3, 0.4, 0.5], [0] * 5, frames)
+    assert detections.data["frame"].tolist() == frames
+    assert detections.data["detection_id"].tolist() == [1, 1, 2, 2, 3]
+    assert [frame for frame, _ in detections.frames()] == [2, 7]
+
+
+def test_from_arrays_empty():
+    detections = DetectionArray.from_arrays(np.zeros((0, 4)), [], [], [])
+    assert len(detections) == 0
+    assert detections.stats()["total_detections"] == 0
+
+
+def test_stats():
+    detections = DetectionArray.from_arrays([[0, 0, 1, 1]] * 3, [0.2, 0.4, 0.9], [0, 0, 0], [1, 1, 5])
+    stats = detections.stats()
+    assert stats["total_detections"] == 3
+    assert stats["frames_with_detections"] == 2
+    assert stats["max_confidence"] == pytest.approx(0.9)
+    assert stats["avg_confidence"] == pytest.approx(0.5)
@@ -1,10 +1,13 @@
-import requests
-import json
-from datetime import datetime
+import io
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from collections import OrderedDict
+import threading
 import math
-import exifread
-from skyfield.api import load, wgs84
-import hilalpy
+import numpy as np
+
+# exifread, skyfield dan hilalpy diimpor saat fitur yang membutuhkannya dipakai,
+# agar halaman pertama tidak menunggu impor dependensi berat
 
 def parse_exif_datetime(dt_str):
     """Parse EXIF datetime string to Python datetime object."""
@@ -23,15 +26,45 @@ def parse_exif_gps(gps_tag):
     except Exception:
         return None
 
-def extract_exif_metadata(image_path):
+# EXIF (APP1) selalu berada di awal JPEG dan maksimal 64 KB
+EXIF_HEADER_BYTES = 128 * 1024
+# Tag EXIF terakhir yang dibutuhkan; GPS sudah terbaca dari IFD0 sebelumnya
+EXIF_STOP_TAG = 'DateTimeOriginal'
+
+def _exif_incomplete(tags):
+    if not tags:
+        return True
+    if 'Image GPSInfo' in tags and 'GPS GPSLatitude' not in tags:
+        return True
+    return 'Image ExifOffset' in tags and 'EXIF DateTimeOriginal' not in tags
+
+def read_exif_tags(image_path, header_bytes=EXIF_HEADER_BYTES):
+    """
+    Baca hanya tag EXIF yang diperlukan dari header file (tanpa MakerNote/thumbnail).
+    Jatuh ke pembacaan seluruh file bila IFD berada di luar header.
+    """
+    import exifread
+    options = dict(details=False, extract_thumbnail=False, stop_tag=EXIF_STOP_TAG)
     with open(image_path, 'rb') as f:
-        tags = exifread.process_file(f)
-        camera = tags.get('Image Model', None)
-        dt_raw = tags.get('EXIF DateTimeOriginal', None)
-        gps_lat = tags.get('GPS GPSLatitude', None)
-        gps_lat_ref = tags.get('GPS GPSLatitudeRef', None)
-        gps_lon = tags.get('GPS GPSLongitude', None)
-        gps_lon_ref = tags.get('GPS GPSLongitudeRef', None)
+        head = f.read(header_bytes)
+        try:
+            tags = exifread.process_file(io.BytesIO(head), **options)
+        except Exception:
+            tags = {}
+        if len(head) == header_bytes and _exif_incomplete(tags):
+            tags = exifread.process_file(f, **options)
+    return tags
+
+def exif_tags_to_metadata(tags):
+    """
+    Ubah tag exifread menjadi (camera, datetime, lat, lon)
+    """
+    camera = tags.get('Image Model', None)
+    dt_raw = tags.get('EXIF DateTimeOriginal', None)
+    gps_lat = tags.get('GPS GPSLatitude', None)
+    gps_lat_ref = tags.get('GPS GPSLatitudeRef', None)
+    gps_lon = tags.get('GPS GPSLongitude', None)
+    gps_lon_ref = tags.get('GPS GPSLongitudeRef', None)
 
     dt = parse_exif_datetime(dt_raw)
     lat = parse_exif_gps(gps_lat)
@@ -44,21 +77,138 @@ def extract_exif_metadata(image_path):
 
     return camera, dt, lat, lon
 
+def extract_exif_metadata(image_path):
+    return exif_tags_to_metadata(read_exif_tags(image_path))
+
+@lru_cache(maxsize=None)
+def load_timescale():
+    """Timescale skyfield, dimuat sekali per proses."""
+    from skyfield.api import load
+    return load.timescale()
+
+@lru_cache(maxsize=None)
+def load_ephemeris(filename='de421.bsp'):
+    """Ephemeris JPL, dimuat sekali per proses dan dipakai ulang."""
+    from skyfield.api import load
+    return load(filename)
+
+# Toleransi kuantisasi untuk memoization posisi/visibilitas hilal
+ASTRO_CACHE_CONFIG = {
+    "time_resolution_s": 60,
+    "coord_resolution_deg": 0.01,
+    "maxsize": 2048,
+}
+
+_astro_caches = []
+
+def quantize_observation(dt, latitude, longitude, time_resolution_s=60, coord_resolution_deg=0.01):
+    """
+    Bulatkan waktu dan koordinat ke grid kuantisasi (misal menit dan 0.01°)
+    """
+    midnight = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = (dt - midnight).total_seconds()
+    snapped_dt = midnight + timedelta(seconds=round(seconds / time_resolution_s) * time_resolution_s)
+    snapped_lat = round(round(float(latitude) / coord_resolution_deg) * coord_resolution_deg, 6)
+    snapped_lon = round(round(float(longitude) / coord_resolution_deg) * coord_resolution_deg, 6)
+    return snapped_dt, snapped_lat, snapped_lon
+
+def quantized_memoize(func):
+    """
+    Memoization LRU untuk fungsi (dt, latitude, longitude) dengan input yang
+    dikuantisasi. Cache dipakai bersama oleh semua sesi Streamlit dalam proses.
+    """
+    cache = OrderedDict()
+    lock = threading.Lock()
+    stats = {"hits": 0, "misses": 0}
+
+    @wraps(func)
+    def wrapper(dt, latitude, longitude):
+        if not (dt and latitude is not None and longitude is not None):
+            return func(dt, latitude, longitude)
+
+        key = quantize_observation(
+            dt, latitude, longitude,
+            ASTRO_CACHE_CONFIG["time_resolution_s"],
+            ASTRO_CACHE_CONFIG["coord_resolution_deg"],
+        )
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                stats["hits"] += 1
+                return cache[key]
+            stats["misses"] += 1
+
+        result = func(*key)
+
+        with lock:
+            cache[key] = result
+            cache.move_to_end(key)
+            while len(cache) > ASTRO_CACHE_CONFIG["maxsize"]:
+                cache.popitem(last=False)
+        return result
+
+    def cache_info():
+        with lock:
+            lookups = stats["hits"] + stats["misses"]
+            return {
+                "function": func.__name__,
+                "hits": stats["hits"],
+                "misses": stats["misses"],
+                "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0,
+                "size": len(cache),
+                "maxsize": ASTRO_CACHE_CONFIG["maxsize"],
+            }
+
+    def cache_clear():
+        with lock:
+            cache.clear()
+            stats["hits"] = stats["misses"] = 0
+
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
+    _astro_caches.append(wrapper)
+    return wrapper
+
+def configure_astro_cache(time_resolution_s=None, coord_resolution_deg=None, maxsize=None):
+    """
+    Ubah toleransi kuantisasi / ukuran cache. Cache dikosongkan karena kunci lama
+    tidak lagi sebanding.
+    """
+    if time_resolution_s is not None:
+        ASTRO_CACHE_CONFIG["time_resolution_s"] = time_resolution_s
+    if coord_resolution_deg is not None:
+        ASTRO_CACHE_CONFIG["coord_resolution_deg"] = coord_resolution_deg
+    if maxsize is not None:
+        ASTRO_CACHE_CONFIG["maxsize"] = maxsize
+    for cached in _astro_caches:
+        cached.cache_clear()
+    return dict(ASTRO_CACHE_CONFIG)
+
+def get_astro_cache_stats():
+    """
+    Statistik hit rate untuk setiap fungsi astro yang di-memoize
+    """
+    return [cached.cache_info() for cached in _astro_caches]
+
+@quantized_memoize
 def compute_hilal_position(dt, latitude, longitude):
     if not (dt and latitude is not None and longitude is not None):
         return None, None
-    ts = load.timescale()
+    from skyfield.api import wgs84
+    ts = load_timescale()
     t = ts.utc(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
-    eph = load('de421.bsp')
+    eph = load_ephemeris()
     observer = wgs84.latlon(latitude, longitude)
     moon = eph['moon']
     astrometric = observer.at(t).observe(moon)
     alt, az, _ = astrometric.apparent().altaz()
     return alt.degrees, az.degrees
 
+@quantized_memoize
 def predict_hilal_visibility(dt, latitude, longitude):
     if not (dt and latitude is not None and longitude is not None):
         return "Data tidak lengkap untuk prediksi visibilitas."
+    import hilalpy
     return hilalpy.visibility_prediction(dt, latitude, longitude)
 
 def get_weather(lat, lon):
@@ -70,34 +220,17 @@ def get_weather(lat, lon):
         lat_f = float(lat)
         lon_f = float(lon)
         
-        # Try OpenWeatherMap API first (you need to replace with your API key)
-        # For demo purposes, we'll use a mock response based on location
-        
-        # Attempt 1: Try OpenWeatherMap (requires API key)
-        try:
-            # Replace 'YOUR_API_KEY' with actual API key
-            # api_key = "YOUR_API_KEY"
-            # owm_url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat_f}&lon={lon_f}&appid={api_key}&units=metric"
-            # response = requests.get(owm_url, timeout=5)
-            # if response.status_code == 200:
-            #     data = response.json()
-            #     return parse_openweather_data(data)
-            pass
-        except:
-            pass
-        
-        # Attempt 2: Try alternative weather service
+        # Attempt 1: Query all configured providers (OpenWeatherMap if an API
+        # key is set, wttr.in) concurrently under one deadline, via the cache
         try:
-            # Using wttr.in service as fallback
-            wttr_url = f"https://wttr.in/{lat_f},{lon_f}?format=j1"
-            response = requests.get(wttr_url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return parse_wttr_data(data)
+            from weather import get_default_client
+            data = get_default_client().get(lat_f, lon_f)
+            if data is not None:
+                return data
         except Exception as e:
-            print(f"wttr.in failed: {e}")
+            print(f"Weather providers failed: {e}")
         
-        # Attempt 3: Use geographical estimation
+        # Attempt 2: Use geographical estimation
         return get_weather_estimation(lat_f, lon_f)
         
     except Exception as e:
@@ -215,6 +348,23 @@ def calculate_moon_phase(date=None):
     if date is None:
         date = datetime.now()
     
+    # Exact phase from the precomputed conjunction table when available
+    try:
+        from hijri import get_moon_age, new_moon_table_available
+        if not new_moon_table_available():
+            raise LookupError("tabel ijtima' belum tersedia")
+        age = get_moon_age(date)
+        return {
+            'phase_degrees': age['phase_degrees'],
+            'phase_name': get_moon_phase_name(age['phase_degrees']),
+            'illumination': age['illumination'],
+            'days_in_cycle': round(age['age_days'], 1),
+            'previous_ijtima': age['previous_ijtima'],
+            'next_ijtima': age['next_ijtima']
+        }
+    except Exception as e:
+        print(f"New moon table unavailable, using mean cycle: {e}")
+    
     # Simplified moon phase calculation
     # Based on synodic month cycle (29.53 days)
     
@@ -240,6 +390,83 @@ def calculate_moon_phase(date=None):
         'days_in_cycle': round(cycle_position * synodic_month, 1)
     }
 
+SYNODIC_MONTH = 29.530588861
+REFERENCE_NEW_MOON = np.datetime64('2000-01-06T18:14')  # New moon on Jan 6, 2000
+PHASE_BOUNDARIES = np.array([7, 90, 97, 173, 187, 263, 277, 353])
+PHASE_NAMES = np.array([
+    "🌑 New Moon", "🌒 Waxing Crescent", "🌓 First Quarter", "🌔 Waxing Gibbous",
+    "🌕 Full Moon", "🌖 Waning Gibbous", "🌗 Last Quarter", "🌘 Waning Crescent", "🌑 New Moon"
+])
+
+def _to_datetime64(dates):
+    """
+    List datetime / DatetimeIndex / array datetime64 -> array datetime64[s] (UTC naif)
+    """
+    if hasattr(dates, 'tz_convert') and dates.tz is not None:
+        dates = dates.tz_convert('UTC').tz_localize(None)
+    return np.asarray(dates, dtype='datetime64[s]')
+
+def get_moon_phase_names(degrees):
+    """
+    Versi vektor get_moon_phase_name: array derajat -> array nama fase
+    """
+    return PHASE_NAMES[np.digitize(np.mod(degrees, 360), PHASE_BOUNDARIES)]
+
+def calculate_moon_phases(dates, method='table'):
+    """
+    Fase bulan untuk banyak waktu sekaligus (kalender bulanan, grafik,
+    anotasi timestamp frame video).
+
+    method: 'table' (tabel ijtima', fallback ke siklus rata-rata),
+            'mean' (siklus sinodik rata-rata),
+            'ephemeris' (elongasi sebenarnya dari skyfield)
+    Returns: dict array (phase_degrees, illumination [%], illumination_fraction,
+             age_days, phase_name)
+    """
+    times = _to_datetime64(dates)
+    seconds = (times - np.datetime64('1970-01-01T00:00:00', 's')).astype(np.float64)
+
+    age_days = None
+    if method in ('table', 'ephemeris'):
+        try:
+            from hijri import load_new_moon_table, new_moon_table_available
+            if not new_moon_table_available():
+                raise LookupError("tabel ijtima' belum tersedia")
+            table = load_new_moon_table()
+            index = np.searchsorted(table, seconds, side='right') - 1
+            if index.size and (index.min() < 0 or index.max() >= len(table) - 1):
+                raise ValueError("Tanggal di luar rentang tabel ijtima'")
+            age_seconds = seconds - table[index]
+            age_days = age_seconds / 86400.0
+            phase_degrees = 360.0 * age_seconds / (table[index + 1] - table[index])
+        except Exception as e:
+            print(f"New moon table unavailable, using mean cycle: {e}")
+    if age_days is None:
+        days_since = (times - REFERENCE_NEW_MOON) / np.timedelta64(1, 'D')
+        age_days = np.mod(days_since, SYNODIC_MONTH)
+        phase_degrees = age_days / SYNODIC_MONTH * 360.0
+
+    illumination_fraction = 0.5 * (1 - np.cos(np.radians(phase_degrees)))
+
+    if method == 'ephemeris':
+        try:
+            from skyfield import almanac
+            ts = load_timescale()
+            eph = load_ephemeris()
+            t = ts.utc(1970, 1, 1, 0, 0, seconds)
+            phase_degrees = np.asarray(almanac.moon_phase(eph, t).degrees)
+            illumination_fraction = np.asarray(almanac.fraction_illuminated(eph, 'moon', t))
+        except Exception as e:
+            print(f"Ephemeris phase failed, using table/mean cycle: {e}")
+
+    return {
+        'phase_degrees': phase_degrees,
+        'illumination': illumination_fraction * 100,
+        'illumination_fraction': illumination_fraction,
+        'age_days': age_days,
+        'phase_name': get_moon_phase_names(phase_degrees),
+    }
+
 def get_moon_phase_name(degrees):
     """
     Convert moon phase degrees to readable name
@@ -321,13 +548,61 @@ def calculate_sun_position(lat, lon, date=None):
     except Exception as e:
         return {"status": "Error", "error": str(e)}
 
-def get_islamic_calendar_info():
+def calculate_sunset_utc(lat, lon, date=None):
     """
-    Informasi kalender Islam sederhana
+    Perkiraan waktu matahari terbenam dalam UTC (akurasi ~1-2 menit)
+    Returns: datetime UTC (naive) atau None untuk siang/malam kutub
     """
-    # This is a simplified version - in reality you'd need accurate Islamic calendar calculations
-    current_date = datetime.now()
+    if date is None:
+        date = datetime.utcnow()
+    
+    day_of_year = date.timetuple().tm_yday
+    lat_rad = math.radians(float(lat))
+    
+    # Solar declination angle
+    declination = math.radians(23.45) * math.sin(math.radians(360 * (284 + day_of_year) / 365))
     
+    # Equation of time (minutes)
+    b = math.radians(360 * (day_of_year - 81) / 364)
+    equation_of_time = 9.87 * math.sin(2 * b) - 7.53 * math.cos(b) - 1.5 * math.sin(b)
+    
+    # Hour angle when the sun's centre is 0.833° below the horizon
+    cos_hour_angle = ((math.sin(math.radians(-0.833)) - math.sin(lat_rad) * math.sin(declination))
+                      / (math.cos(lat_rad) * math.cos(declination)))
+    if not -1 <= cos_hour_angle <= 1:
+        return None
+    hour_angle_hours = math.degrees(math.acos(cos_hour_angle)) / 15
+    
+    solar_noon_utc = 12 - float(lon) / 15 - equation_of_time / 60
+    midnight = datetime(date.year, date.month, date.day)
+    return midnight + timedelta(hours=solar_noon_utc + hour_angle_hours)
+
+def get_islamic_calendar_info(date=None, criterion="MABIMS"):
+    """
+    Informasi kalender Islam (Hijriah) berdasarkan tabel ijtima' dan kriteria visibilitas
+    """
+    current_date = date or datetime.now()
+    
+    try:
+        from hijri import gregorian_to_hijri, new_moon_table_available, next_new_moon
+        if not new_moon_table_available():
+            raise LookupError("tabel ijtima' belum tersedia")
+        hijri_date = gregorian_to_hijri(current_date, criterion)
+        return {
+            "hijri_year": hijri_date["year"],
+            "hijri_month": hijri_date["month"],
+            "hijri_day": hijri_date["day"],
+            "month_name": hijri_date["month_name"],
+            "month_start": hijri_date["month_start"].isoformat(),
+            "next_ijtima": next_new_moon(current_date).strftime("%Y-%m-%d %H:%M UTC"),
+            "estimated_hijri_year": hijri_date["year"],
+            "estimated_month": hijri_date["month_name"],
+            "note": f"Hisab ijtima' + kriteria {criterion} - konfirmasi dengan keputusan otoritas resmi"
+        }
+    except Exception as e:
+        print(f"Hijri engine unavailable, using rough estimate: {e}")
+    
+    # Fallback: very rough approximation
     # Estimated Hijri year (very rough approximation)
     hijri_year_approx = 1445 + ((current_date.year - 2024) * 354.37 / 365.25)
     
@@ -453,6 +728,57 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     
     return round(c * r, 1)
 
+MAKKAH_LAT, MAKKAH_LON = 21.4225, 39.8262
+EARTH_RADIUS_KM = 6371.0
+CARDINAL_DIRECTIONS = np.array([
+    "N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+    "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"
+])
+
+def calculate_distances(lat1, lon1, lat2, lon2):
+    """
+    Versi vektor calculate_distance (Haversine, km) dengan broadcasting NumPy
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def calculate_qibla_directions(lats, lons):
+    """
+    Versi vektor calculate_qibla_direction untuk array koordinat.
+    Returns: dict array (qibla_direction, cardinal_direction, distance_km)
+    """
+    loc_lat = np.radians(np.asarray(lats, dtype=np.float64))
+    loc_lon = np.radians(np.asarray(lons, dtype=np.float64))
+    makkah_lat = math.radians(MAKKAH_LAT)
+    delta_lon = math.radians(MAKKAH_LON) - loc_lon
+
+    y = np.sin(delta_lon) * math.cos(makkah_lat)
+    x = np.cos(loc_lat) * math.sin(makkah_lat) - np.sin(loc_lat) * math.cos(makkah_lat) * np.cos(delta_lon)
+    bearing = np.mod(np.degrees(np.arctan2(y, x)), 360)
+
+    return {
+        "qibla_direction": bearing,
+        "cardinal_direction": CARDINAL_DIRECTIONS[np.round(bearing / 22.5).astype(int) % 16],
+        "distance_km": calculate_distances(lats, lons, MAKKAH_LAT, MAKKAH_LON)
+    }
+
+def get_location_types(lats, lons):
+    """
+    Versi vektor get_location_type untuk array koordinat
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    return np.select(
+        [
+            (lats >= -11) & (lats <= 6) & (lons >= 95) & (lons <= 141),
+            (lats >= 20) & (lats <= 50) & (lons >= -10) & (lons <= 40),
+            (lats >= -40) & (lats <= 40) & (lons >= -180) & (lons <= 180),
+        ],
+        ["Indonesia", "Middle East/Mediterranean", "Tropical/Subtropical"],
+        default="Other Region"
+    )
+
 def get_astronomical_data(lat, lon, date=None):
     """
     Dapatkan data astronomis lengkap untuk lokasi dan waktu tertentu
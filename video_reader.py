@@ -0,0 +1,185 @@
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+FFMPEG_PATH = os.environ.get("HILAL_FFMPEG") or shutil.which("ffmpeg")
+FFMPEG_AVAILABLE = FFMPEG_PATH is not None
+# Model bekerja pada 640 px (sisi terpanjang); decode lebih besar hanya membuang CPU
+INFERENCE_DECODE_SIZE = 640
+# Stride sebesar ini atau lebih: lompat dengan seek, bukan grab frame demi frame
+SEEK_STRIDE = 60
+
+
+def _even(value):
+    return max(int(round(value / 2)) * 2, 2)
+
+
+class VideoReader:
+    """
+    Baca frame video BGR pada resolusi yang sudah diperkecil.
+
+    Dengan ffmpeg, skala dilakukan saat decode dan frame mentah dipipe langsung
+    ke buffer NumPy yang dialokasikan di depan; tanpa ffmpeg, cv2.VideoCapture
+    dipakai (decode penuh lalu resize ke buffer yang sama).
+
+    max_side: sisi terpanjang frame hasil (None = resolusi asli)
+    start, end: rentang waktu (detik); awal dicapai dengan seek
+    stride: ambil setiap frame ke-stride
+    buffers: jumlah buffer bergilir. Frame yang di-yield adalah view ke buffer
+    yang akan ditimpa; salin (frame.copy()) jika perlu disimpan lebih lama.
+    """
+
+    def __init__(self, path, max_side=None, start=None, end=None, stride=1, buffers=2, backend=None):
+        self.path = str(path)
+        self.stride = max(int(stride), 1)
+        self.start = max(float(start or 0.0), 0.0)
+        self.end = float(end) if end else None
+
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open {self.path}")
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.source_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.source_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.source_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        longest = max(self.source_width, self.source_height)
+        if max_side and longest > max_side:
+            factor = max_side / longest
+            self.width, self.height = _even(self.source_width * factor), _even(self.source_height * factor)
+        else:
+            self.width, self.height = self.source_width, self.source_height
+        # Faktor untuk mengembalikan koordinat ke resolusi asli
+        self.scale = (self.source_width / self.width, self.source_height / self.height)
+
+        self.start_frame = int(round(self.start * self.fps))
+        end_frame = self.source_frames if self.end is None else min(int(round(self.end * self.fps)), self.source_frames)
+        self.frame_count = max(-(-(end_frame - self.start_frame) // self.stride), 0)
+
+        self.backend = backend or ("ffmpeg" if FFMPEG_AVAILABLE else "opencv")
+        self._buffers = np.empty((max(int(buffers), 1), self.height, self.width, 3), np.uint8)
+        self._process = None
+        self._cap = None
+
+    @property
+    def scaled(self):
+        return (self.width, self.height) != (self.source_width, self.source_height)
+
+    def scale_boxes(self, boxes):
+        """
+        Kotak xyxy pada frame hasil decode -> koordinat resolusi asli
+        """
+        sx, sy = self.scale
+        return np.asarray(boxes, np.float32).reshape(-1, 4) * np.float32([sx, sy, sx, sy])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        """
+        Yield (indeks frame sumber, frame BGR)
+        """
+        if self.backend == "ffmpeg":
+            try:
+                yield from self._iter_ffmpeg()
+                return
+            except (OSError, ValueError) as e:
+                print(f"ffmpeg decode failed, falling back to OpenCV: {e}")
+                self.close()
+                self.backend = "opencv"
+        yield from self._iter_opencv()
+
+    def _ffmpeg_command(self):
+        command = [FFMPEG_PATH, "-v", "error", "-nostdin"]
+        if self.start:
+            # Seek di input: langsung ke keyframe terdekat, tanpa decode dari awal
+            command += ["-ss", f"{self.start:.3f}"]
+        command += ["-i", self.path]
+        if self.end is not None:
+            command += ["-t", f"{max(self.end - self.start, 0):.3f}"]
+        filters = []
+        if self.stride > 1:
+            # Frame yang dilewati dibuang sebelum scale dan pipe
+            filters.append(f"select='not(mod(n\\,{self.stride}))'")
+        if self.scaled:
+            filters.append(f"scale={self.width}:{self.height}:flags=area")
+        if filters:
+            command += ["-vf", ",".join(filters)]
+        command += ["-vsync", "0", "-an", "-sn", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        return command
+
+    def _iter_ffmpeg(self):
+        self._process = subprocess.Popen(
+            self._ffmpeg_command(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0
+        )
+        stdout = self._process.stdout
+        frame_bytes = self.width * self.height * 3
+        produced = 0
+        while True:
+            buffer = self._buffers[produced % len(self._buffers)]
+            view = memoryview(buffer.reshape(-1))
+            filled = 0
+            while filled < frame_bytes:
+                read = stdout.readinto(view[filled:])
+                if not read:
+                    break
+                filled += read
+            if filled < frame_bytes:
+                break
+            yield self.start_frame + produced * self.stride, buffer
+            produced += 1
+
+        returncode = self._process.wait()
+        error = self._process.stderr.read().decode(errors="replace").strip()
+        self._process = None
+        if produced == 0 and returncode != 0:
+            raise ValueError(error or f"ffmpeg exited with {returncode}")
+
+    def _iter_opencv(self):
+        self._cap = cv2.VideoCapture(self.path)
+        cap = self._cap
+        if self.start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        index = self.start_frame
+        produced = 0
+        while produced < self.frame_count or self.source_frames <= 0:
+            buffer = self._buffers[produced % len(self._buffers)]
+            if self.scaled:
+                ok, frame = cap.read()
+                if ok:
+                    cv2.resize(frame, (self.width, self.height), dst=buffer, interpolation=cv2.INTER_AREA)
+            else:
+                ok, frame = cap.read(buffer)
+                if ok and frame is not buffer:
+                    buffer[...] = frame
+            if not ok:
+                break
+            yield index, buffer
+            produced += 1
+
+            if self.stride >= SEEK_STRIDE:
+                index += self.stride
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            else:
+                # grab() tanpa retrieve: frame dilewati tanpa konversi warna/salinan
+                for _ in range(self.stride - 1):
+                    if not cap.grab():
+                        return
+                index += self.stride
+        self.close()
+
+    def close(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
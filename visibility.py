@@ -0,0 +1,338 @@
+import time
+from datetime import date as date_cls, datetime
+
+import numpy as np
+
+from utils import load_ephemeris, load_timescale
+
+# Wilayah peta visibilitas: (lat_min, lat_max, lon_min, lon_max)
+REGIONS = {
+    "indonesia": (-11.0, 6.0, 95.0, 141.0),
+    "asia_tenggara": (-12.0, 21.0, 92.0, 142.0),
+    "timur_tengah": (12.0, 42.0, 25.0, 63.0),
+    "global": (-60.0, 60.0, -180.0, 180.0),
+}
+
+# Kode zona per kriteria (indeks 0 = paling mudah terlihat)
+CRITERIA_ZONES = {
+    "MABIMS": ["Memenuhi", "Tidak Memenuhi"],
+    "Odeh": ["A", "B", "C", "D"],
+    "Yallop": ["A", "B", "C", "D", "E", "F"],
+}
+
+# Zona yang dianggap "mungkin terlihat" (mata telanjang atau alat optik)
+VISIBLE_ZONES = {
+    "MABIMS": 1,
+    "Odeh": 3,
+    "Yallop": 4,
+}
+
+SUNSET_ALTITUDE = -0.8333  # derajat, pusat matahari saat terbenam (refraksi + semidiameter)
+EARTH_RADIUS_KM = 6378.14
+MOON_RADIUS_KM = 1737.4
+AU_KM = 149597870.7
+SIDEREAL_RATE = 15.04107  # derajat per jam
+
+
+def _wrap180(deg):
+    return (deg + 180.0) % 360.0 - 180.0
+
+
+def _resolve_region(region):
+    if isinstance(region, str):
+        if region not in REGIONS:
+            raise ValueError(f"Wilayah tidak dikenal: {region}")
+        return REGIONS[region]
+    lat_min, lat_max, lon_min, lon_max = region
+    return float(lat_min), float(lat_max), float(lon_min), float(lon_max)
+
+
+def build_grid(region="indonesia", resolution=0.1):
+    """
+    Buat grid lat/lon (baris utara ke selatan, kolom barat ke timur)
+    """
+    lat_min, lat_max, lon_min, lon_max = _resolve_region(region)
+    n_lat = int(round((lat_max - lat_min) / resolution)) + 1
+    n_lon = int(round((lon_max - lon_min) / resolution)) + 1
+    lats = lat_max - np.arange(n_lat) * resolution
+    lons = lon_min + np.arange(n_lon) * resolution
+    return lats, lons
+
+
+def sample_ephemeris(evening, lon_min, lon_max, step_minutes=30):
+    """
+    Sampel posisi geosentris matahari & bulan (RA, Dec, jarak) dan GAST
+    sepanjang jendela UTC yang mencakup semua waktu maghrib di wilayah.
+
+    Satu panggilan skyfield berbentuk array menggantikan ribuan panggilan skalar;
+    nilai per titik grid kemudian diinterpolasi.
+    """
+    # Maghrib lokal ~18:00 waktu matahari rata-rata -> UTC = 18 - lon/15,
+    # ditambah margin untuk efek lintang dan equation of time
+    start_h = 18.0 - lon_max / 15.0 - 4.0
+    end_h = 18.0 - lon_min / 15.0 + 4.0
+    hours = np.arange(start_h, end_h + step_minutes / 60.0, step_minutes / 60.0)
+
+    ts = load_timescale()
+    eph = load_ephemeris()
+    t = ts.utc(evening.year, evening.month, evening.day, hours)
+    earth = eph['earth']
+    observer = earth.at(t)
+
+    sun_ra, sun_dec, sun_dist = observer.observe(eph['sun']).apparent().radec(epoch='date')
+    moon_ra, moon_dec, moon_dist = observer.observe(eph['moon']).apparent().radec(epoch='date')
+
+    return {
+        "hours": hours,
+        "gast": np.unwrap(np.radians(t.gast * 15.0)),
+        "sun_ra": np.unwrap(sun_ra.radians),
+        "sun_dec": sun_dec.radians,
+        "moon_ra": np.unwrap(moon_ra.radians),
+        "moon_dec": moon_dec.radians,
+        "moon_dist_km": moon_dist.au * AU_KM,
+    }
+
+
+def _interp(samples, key, hours):
+    return np.interp(hours, samples["hours"], samples[key])
+
+
+def _altaz(lat_rad, lha, dec):
+    sin_alt = np.sin(lat_rad) * np.sin(dec) + np.cos(lat_rad) * np.cos(dec) * np.cos(lha)
+    alt = np.arcsin(np.clip(sin_alt, -1.0, 1.0))
+    az = np.arctan2(
+        -np.cos(dec) * np.sin(lha),
+        np.sin(dec) * np.cos(lat_rad) - np.cos(dec) * np.sin(lat_rad) * np.cos(lha),
+    )
+    return np.degrees(alt), np.degrees(az) % 360.0
+
+
+def compute_sunset_geometry(lat_grid, lon_grid, samples, iterations=3):
+    """
+    Hitung geometri hilal saat matahari terbenam untuk setiap titik grid.
+
+    Semua besaran dalam derajat kecuali lebar sabit (menit busur) dan
+    waktu maghrib (jam UTC relatif terhadap tanggal pengamatan).
+    """
+    lat_rad = np.radians(lat_grid)
+    lon_rad = np.radians(lon_grid)
+    h0 = np.radians(SUNSET_ALTITUDE)
+
+    # Iterasi waktu maghrib: cari t sehingga sudut jam matahari = H0
+    hours = 18.0 - lon_grid / 15.0
+    for _ in range(iterations):
+        sun_dec = _interp(samples, "sun_dec", hours)
+        cos_h0 = (np.sin(h0) - np.sin(lat_rad) * np.sin(sun_dec)) / (np.cos(lat_rad) * np.cos(sun_dec))
+        h_set = np.degrees(np.arccos(np.clip(cos_h0, -1.0, 1.0)))
+        lha = np.degrees(_interp(samples, "gast", hours) + lon_rad - _interp(samples, "sun_ra", hours))
+        hours = hours + _wrap180(h_set - lha) / SIDEREAL_RATE
+
+    # Titik tanpa maghrib (siang/malam kutub)
+    no_sunset = np.abs(cos_h0) > 1.0
+
+    gast = _interp(samples, "gast", hours)
+    sun_ra = _interp(samples, "sun_ra", hours)
+    sun_dec = _interp(samples, "sun_dec", hours)
+    moon_ra = _interp(samples, "moon_ra", hours)
+    moon_dec = _interp(samples, "moon_dec", hours)
+    moon_dist = _interp(samples, "moon_dist_km", hours)
+
+    sun_alt, sun_az = _altaz(lat_rad, gast + lon_rad - sun_ra, sun_dec)
+    moon_alt_geo, moon_az = _altaz(lat_rad, gast + lon_rad - moon_ra, moon_dec)
+
+    # Koreksi paralaks ke topocentris
+    parallax = np.arcsin(EARTH_RADIUS_KM / moon_dist)
+    moon_alt = moon_alt_geo - np.degrees(parallax * np.cos(np.radians(moon_alt_geo)))
+
+    # Elongasi geosentris (ARCL) dan beda azimut (DAZ)
+    cos_arcl = (np.sin(sun_dec) * np.sin(moon_dec)
+                + np.cos(sun_dec) * np.cos(moon_dec) * np.cos(sun_ra - moon_ra))
+    arcl = np.degrees(np.arccos(np.clip(cos_arcl, -1.0, 1.0)))
+    daz = _wrap180(sun_az - moon_az)
+
+    # Lebar sabit topocentris (menit busur)
+    semi_diameter = np.degrees(np.arcsin(MOON_RADIUS_KM / moon_dist)) * 60.0
+    semi_diameter_topo = semi_diameter * (1.0 + np.sin(np.radians(moon_alt)) * np.sin(parallax))
+    width = semi_diameter_topo * (1.0 - np.cos(np.radians(arcl)))
+
+    geometry = {
+        "sunset_utc_hours": hours,
+        "sun_alt": sun_alt,
+        "sun_az": sun_az,
+        "moon_alt": moon_alt,
+        "moon_alt_geo": moon_alt_geo,
+        "moon_az": moon_az,
+        "arcv": moon_alt_geo - sun_alt,
+        "arcv_topo": moon_alt - sun_alt,
+        "arcl": arcl,
+        "daz": daz,
+        "width": width,
+    }
+    for key in geometry:
+        geometry[key] = np.where(no_sunset, np.nan, geometry[key])
+    return geometry
+
+
+def _polynomial_arcv(width):
+    return -0.1018 * width**3 + 0.7319 * width**2 - 6.3226 * width
+
+
+def evaluate_mabims(geometry):
+    """MABIMS (2021): tinggi hilal >= 3° dan elongasi >= 6.4°"""
+    ok = (geometry["moon_alt"] >= 3.0) & (geometry["arcl"] >= 6.4)
+    value = np.minimum(geometry["moon_alt"] - 3.0, geometry["arcl"] - 6.4)
+    return value, np.where(ok, 0, 1).astype(np.int8)
+
+
+def evaluate_odeh(geometry):
+    """Odeh (2004): V = ARCV - (-0.1018 W³ + 0.7319 W² - 6.3226 W + 7.1651)"""
+    value = geometry["arcv_topo"] - (_polynomial_arcv(geometry["width"]) + 7.1651)
+    zone = np.select([value >= 5.65, value >= 2.0, value >= -0.96], [0, 1, 2], default=3)
+    return value, zone.astype(np.int8)
+
+
+def evaluate_yallop(geometry):
+    """Yallop (1997): q = (ARCV - (11.8371 - 6.3226 W' + 0.7319 W'² - 0.1018 W'³)) / 10"""
+    value = (geometry["arcv"] - (_polynomial_arcv(geometry["width"]) + 11.8371)) / 10.0
+    zone = np.select(
+        [value > 0.216, value > -0.014, value > -0.160, value > -0.232, value > -0.293],
+        [0, 1, 2, 3, 4],
+        default=5,
+    )
+    return value, zone.astype(np.int8)
+
+
+CRITERIA = {
+    "MABIMS": evaluate_mabims,
+    "Odeh": evaluate_odeh,
+    "Yallop": evaluate_yallop,
+}
+
+
+def apply_criterion(geometry, criterion):
+    """
+    Nilai dan kode zona kriteria; hilal yang sudah terbenam (atau tanpa maghrib)
+    selalu masuk zona terburuk
+    """
+    value, zone = CRITERIA[criterion](geometry)
+    worst = len(CRITERIA_ZONES[criterion]) - 1
+    invalid = ~np.isfinite(geometry["moon_alt"]) | (geometry["moon_alt"] <= 0)
+    return value, np.where(invalid, worst, zone).astype(np.int8)
+
+
+def compute_visibility_map(evening, criterion="MABIMS", region="indonesia", resolution=0.1):
+    """
+    Peta visibilitas hilal untuk satu malam (saat maghrib lokal) di seluruh grid.
+
+    Mengembalikan dict berisi sumbu lat/lon, nilai kriteria, kode zona,
+    mask visibilitas, serta besaran geometri (ARCV, ARCL, lebar sabit, dsb).
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Kriteria tidak dikenal: {criterion}")
+    if isinstance(evening, datetime):
+        evening = evening.date()
+    elif not isinstance(evening, date_cls):
+        evening = datetime.strptime(str(evening), "%Y-%m-%d").date()
+
+    start = time.perf_counter()
+    lat_min, lat_max, lon_min, lon_max = _resolve_region(region)
+    lats, lons = build_grid((lat_min, lat_max, lon_min, lon_max), resolution)
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+
+    samples = sample_ephemeris(evening, lon_min, lon_max)
+    geometry = compute_sunset_geometry(lat_grid, lon_grid, samples)
+
+    value, zone = apply_criterion(geometry, criterion)
+
+    return {
+        "date": evening.isoformat(),
+        "criterion": criterion,
+        "region": region if isinstance(region, str) else "custom",
+        "resolution": resolution,
+        "lats": lats,
+        "lons": lons,
+        "value": value,
+        "zone": zone,
+        "visible": zone < VISIBLE_ZONES[criterion],
+        "zone_labels": CRITERIA_ZONES[criterion],
+        **geometry,
+        "compute_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+# Warna zona (RGB), dari paling mudah terlihat ke tidak terlihat
+ZONE_COLORS = np.array([
+    [46, 204, 113],
+    [241, 196, 15],
+    [230, 126, 34],
+    [231, 76, 60],
+    [155, 89, 182],
+    [60, 60, 90],
+], dtype=np.uint8)
+
+
+def visibility_map_to_image(result):
+    """
+    Ubah kode zona menjadi gambar RGB untuk ditampilkan (st.image)
+    """
+    zone = np.asarray(result["zone"])
+    n_zones = len(result["zone_labels"])
+    colors = ZONE_COLORS[: n_zones - 1]
+    palette = np.vstack([colors, ZONE_COLORS[-1:]])
+    return palette[zone]
+
+
+def summarize_visibility_map(result):
+    """
+    Ringkasan persentase area per zona
+    """
+    zone = np.asarray(result["zone"])
+    counts = np.bincount(zone.ravel(), minlength=len(result["zone_labels"]))
+    total = max(int(zone.size), 1)
+    return {
+        label: round(100.0 * int(count) / total, 1)
+        for label, count in zip(result["zone_labels"], counts)
+    }
+
+
+def evaluate_visibility_points(evening, lats, lons, criterion="MABIMS"):
+    """
+    Evaluasi kriteria untuk sekumpulan titik sembarang (bukan grid) pada satu malam
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Kriteria tidak dikenal: {criterion}")
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    samples = sample_ephemeris(evening, float(lons.min()), float(lons.max()))
+    geometry = compute_sunset_geometry(lats, lons, samples)
+
+    value, zone = apply_criterion(geometry, criterion)
+    return {
+        "value": value,
+        "zone": zone,
+        "zone_label": np.asarray(CRITERIA_ZONES[criterion])[zone],
+        "visible": zone < VISIBLE_ZONES[criterion],
+        **geometry,
+    }
+
+
+def compute_moon_altaz(datetimes, lats, lons):
+    """
+    Tinggi/azimut topocentris bulan untuk banyak (waktu UTC, lokasi) sekaligus.
+    Satu panggilan skyfield untuk semua waktu, sisanya aritmetika NumPy.
+    """
+    from skyfield.api import utc
+
+    ts = load_timescale()
+    eph = load_ephemeris()
+    t = ts.from_datetimes([
+        dt.replace(tzinfo=utc) if dt.tzinfo is None else dt for dt in datetimes
+    ])
+    moon_ra, moon_dec, moon_dist = eph['earth'].at(t).observe(eph['moon']).apparent().radec(epoch='date')
+
+    lat_rad = np.radians(np.asarray(lats, dtype=float))
+    lha = np.radians(t.gast * 15.0) + np.radians(np.asarray(lons, dtype=float)) - moon_ra.radians
+    alt_geo, az = _altaz(lat_rad, lha, moon_dec.radians)
+    parallax = np.arcsin(EARTH_RADIUS_KM / (moon_dist.au * AU_KM))
+    alt = alt_geo - np.degrees(parallax * np.cos(np.radians(alt_geo)))
+    return alt, az
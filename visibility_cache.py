@@ -0,0 +1,297 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as date_cls, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from visibility import compute_visibility_map
+
+# Lokasi tile di disk (satu direktori per kunci, satu .npy per array)
+CACHE_DIR = Path(os.environ.get("HILAL_TILE_CACHE", Path("assets") / "visibility_tiles"))
+
+# Kombinasi yang dipra-hitung di latar belakang
+PRECOMPUTE_CRITERIA = ("MABIMS", "Odeh", "Yallop")
+PRECOMPUTE_REGIONS = (("indonesia", 0.1), ("global", 1.0))
+
+# Tile terbuka (memmap) yang dipakai bersama, LRU agar jumlah file terbuka terbatas
+MAX_OPEN_TILES = 36
+# Direktori tile sementara lebih tua dari ini dianggap sisa proses yang terhenti
+TEMP_TILE_MAX_AGE = 3600
+
+_open_tiles = OrderedDict()
+_key_locks = {}
+_lock = threading.Lock()
+_precompute_thread = None
+_precompute_day = None
+
+
+def _normalize_date(evening):
+    if isinstance(evening, datetime):
+        return evening.date()
+    if isinstance(evening, date_cls):
+        return evening
+    return datetime.strptime(str(evening), "%Y-%m-%d").date()
+
+
+def tile_key(evening, criterion, region, resolution):
+    """
+    Kunci tile: (tanggal, kriteria, wilayah, resolusi)
+    """
+    return f"{_normalize_date(evening).isoformat()}_{criterion}_{region}_{float(resolution):g}"
+
+
+def _acquire_key_lock(key):
+    """
+    Lock per kunci dengan hitungan pemakai; dihapus saat pemakai terakhir selesai
+    """
+    with _lock:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    return entry[0]
+
+
+def _release_key_lock(key):
+    with _lock:
+        entry = _key_locks[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _key_locks[key]
+
+
+def _cached_tile(key):
+    with _lock:
+        tile = _open_tiles.get(key)
+        if tile is not None:
+            _open_tiles.move_to_end(key)
+        return tile
+
+
+def _publish_tile(key, tile):
+    with _lock:
+        _open_tiles[key] = tile
+        _open_tiles.move_to_end(key)
+        while len(_open_tiles) > MAX_OPEN_TILES:
+            _open_tiles.popitem(last=False)
+
+
+def save_tile(result, key, cache_dir=None):
+    """
+    Simpan hasil compute_visibility_map sebagai direktori .npy.
+    Ditulis ke direktori sementara lalu di-rename agar pembaca tidak pernah
+    melihat tile setengah jadi.
+    """
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    final_dir = cache_dir / key
+    tmp_dir = cache_dir / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    meta = {}
+    for name, value in result.items():
+        if isinstance(value, np.ndarray):
+            np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(value))
+        else:
+            meta[name] = value
+    with open(tmp_dir / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+    try:
+        os.replace(tmp_dir, final_dir)
+    except OSError:
+        # Proses lain sudah menulis tile yang sama
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return final_dir
+
+
+def load_tile(key, cache_dir=None):
+    """
+    Buka tile sebagai memory-map (read-only). None jika belum ada.
+    """
+    tile_dir = Path(cache_dir or CACHE_DIR) / key
+    meta_path = tile_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+    with open(meta_path) as f:
+        tile = json.load(f)
+    for npy_path in tile_dir.glob("*.npy"):
+        tile[npy_path.stem] = np.load(npy_path, mmap_mode="r")
+    return tile
+
+
+def get_visibility_map(evening, criterion="MABIMS", region="indonesia", resolution=0.1, compute=True):
+    """
+    Ambil peta visibilitas dari cache tile; hitung dan simpan bila belum ada.
+    Tile yang sudah dibuka dipakai bersama oleh semua sesi dalam proses.
+    """
+    key = tile_key(evening, criterion, region, resolution)
+    tile = _cached_tile(key)
+    if tile is not None:
+        return tile
+
+    key_lock = _acquire_key_lock(key)
+    try:
+        with key_lock:
+            tile = _cached_tile(key) or load_tile(key)
+            if tile is None:
+                if not compute:
+                    return None
+                result = compute_visibility_map(evening, criterion, region, resolution)
+                save_tile(result, key)
+                tile = load_tile(key) or result
+            _publish_tile(key, tile)
+    finally:
+        _release_key_lock(key)
+    return tile
+
+
+def lookup_point(tile, lat, lon):
+    """
+    Ambil nilai satu sel grid tanpa memuat seluruh array (indeks langsung)
+    """
+    lats, lons = tile["lats"], tile["lons"]
+    resolution = float(tile["resolution"])
+    row = int(round((float(lats[0]) - lat) / resolution))
+    col = int(round((lon - float(lons[0])) / resolution))
+    if not (0 <= row < len(lats) and 0 <= col < len(lons)):
+        return None
+    zone = int(tile["zone"][row, col])
+    return {
+        "latitude": float(lats[row]),
+        "longitude": float(lons[col]),
+        "zone": tile["zone_labels"][zone],
+        "value": float(tile["value"][row, col]),
+        "visible": bool(tile["visible"][row, col]),
+        "moon_alt": float(tile["moon_alt"][row, col]),
+        "arcl": float(tile["arcl"][row, col]),
+        "width": float(tile["width"][row, col]),
+    }
+
+
+def slice_region(tile, lat_min, lat_max, lon_min, lon_max):
+    """
+    Potong sub-wilayah dari tile sebagai view (tanpa salinan)
+    """
+    lats, lons = np.asarray(tile["lats"]), np.asarray(tile["lons"])
+    rows = np.flatnonzero((lats >= lat_min) & (lats <= lat_max))
+    cols = np.flatnonzero((lons >= lon_min) & (lons <= lon_max))
+    if len(rows) == 0 or len(cols) == 0:
+        return None
+    rs = slice(rows[0], rows[-1] + 1)
+    cs = slice(cols[0], cols[-1] + 1)
+    sliced = {}
+    for name, value in tile.items():
+        if isinstance(value, np.ndarray) and value.ndim == 2:
+            sliced[name] = value[rs, cs]
+        else:
+            sliced[name] = value
+    sliced["lats"] = tile["lats"][rs]
+    sliced["lons"] = tile["lons"][cs]
+    return sliced
+
+
+def upcoming_month_end_evenings(start=None, days=40):
+    """
+    Malam-malam rukyat mendatang: tanggal ijtima' dan sehari sesudahnya
+    """
+    from skyfield import almanac
+    from utils import load_ephemeris, load_timescale
+
+    start = _normalize_date(start or datetime.utcnow())
+    end = start + timedelta(days=days)
+    ts = load_timescale()
+    t0 = ts.utc(start.year, start.month, start.day)
+    t1 = ts.utc(end.year, end.month, end.day)
+    times, phases = almanac.find_discrete(t0, t1, almanac.moon_phases(load_ephemeris()))
+
+    evenings = []
+    for t, phase in zip(times, phases):
+        if phase != 0:
+            continue
+        conjunction_date = t.utc_datetime().date()
+        for offset in (0, 1):
+            evening = conjunction_date + timedelta(days=offset)
+            if evening >= start and evening not in evenings:
+                evenings.append(evening)
+    return evenings
+
+
+def precompute_tiles(evenings=None, criteria=PRECOMPUTE_CRITERIA, regions=PRECOMPUTE_REGIONS):
+    """
+    Hitung semua tile untuk malam-malam yang diberikan (lewati yang sudah ada)
+    """
+    if evenings is None:
+        evenings = upcoming_month_end_evenings()
+    computed = 0
+    for evening in evenings:
+        for criterion in criteria:
+            for region, resolution in regions:
+                key = tile_key(evening, criterion, region, resolution)
+                if (CACHE_DIR / key / "meta.json").exists():
+                    continue
+                try:
+                    get_visibility_map(evening, criterion, region, resolution)
+                    computed += 1
+                except Exception as e:
+                    print(f"Precompute tile {key} failed: {e}")
+    return computed
+
+
+def start_background_precompute(**kwargs):
+    """
+    Jalankan precompute_tiles di thread daemon (paling banyak sekali sehari per proses)
+    """
+    global _precompute_thread, _precompute_day
+    today = datetime.utcnow().date()
+    with _lock:
+        if _precompute_thread is not None and (_precompute_thread.is_alive() or _precompute_day == today):
+            return _precompute_thread
+        _precompute_day = today
+        clean_temp_tiles()
+        _precompute_thread = threading.Thread(
+            target=precompute_tiles, kwargs=kwargs, name="visibility-precompute", daemon=True
+        )
+        _precompute_thread.start()
+    return _precompute_thread
+
+
+def list_cached_tiles(cache_dir=None):
+    """
+    Daftar kunci tile yang tersedia di disk
+    """
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    if not cache_dir.exists():
+        return []
+    return sorted(p.name for p in cache_dir.iterdir() if not p.name.startswith(".") and (p / "meta.json").exists())
+
+
+def clean_temp_tiles(cache_dir=None, max_age=TEMP_TILE_MAX_AGE):
+    """
+    Hapus direktori sementara .<kunci>.*.tmp sisa penulisan yang terputus
+    (hanya yang lebih tua dari max_age detik, agar penulis aktif tidak terganggu)
+    """
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    if not cache_dir.exists():
+        return 0
+    removed = 0
+    now = time.time()
+    for path in cache_dir.glob(".*.tmp"):
+        try:
+            if now - path.stat().st_mtime < max_age:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    print(f"Precomputing visibility tiles into {CACHE_DIR} ...")
+    clean_temp_tiles()
+    print(f"{precompute_tiles()} tiles computed")
+    print(list_cached_tiles())
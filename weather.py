@@ -0,0 +1,322 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import parse_wttr_data, parse_openweather_data
+
+WTTR_BASE_URL = os.environ.get("HILAL_WTTR_URL", "https://wttr.in")
+OPENWEATHER_URL = os.environ.get("HILAL_OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")
+OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "")
+WEATHER_DB_PATH = os.environ.get("HILAL_WEATHER_DB", os.path.join("assets", "weather_cache.sqlite"))
+
+DEFAULT_TTL = 600            # detik: data dianggap segar
+DEFAULT_STALE_TTL = 6 * 3600  # detik: data lama masih boleh disajikan sambil diperbarui
+DEFAULT_DEADLINE = 4.0       # detik: batas total untuk semua provider sekaligus
+
+_provider_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="weather-provider")
+
+
+def create_session(pool_size=10):
+    """
+    requests.Session dengan keep-alive dan connection pool bersama
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "hilal-deteksi/1.0"})
+    return session
+
+
+def fetch_wttr(session, lat, lon, timeout, base_url=WTTR_BASE_URL):
+    """
+    Provider wttr.in. None jika gagal.
+    """
+    response = session.get(f"{base_url.rstrip('/')}/{lat},{lon}?format=j1", timeout=timeout)
+    if response.status_code != 200:
+        return None
+    data = parse_wttr_data(response.json())
+    return None if data.get('status') == 'API Unavailable' else data
+
+
+def fetch_openweather(session, lat, lon, timeout, api_key=OPENWEATHER_API_KEY, url=OPENWEATHER_URL):
+    """
+    Provider OpenWeatherMap (butuh API key). None jika gagal.
+    """
+    if not api_key:
+        return None
+    response = session.get(
+        url, params={"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}, timeout=timeout
+    )
+    if response.status_code != 200:
+        return None
+    data = parse_openweather_data(response.json())
+    return None if data.get('status') == 'API Unavailable' else data
+
+
+def default_providers(base_url=WTTR_BASE_URL, api_key=OPENWEATHER_API_KEY):
+    """
+    Daftar provider (nama, fungsi) berurutan menurut prioritas
+    """
+    providers = []
+    if api_key:
+        providers.append(("openweathermap", partial(fetch_openweather, api_key=api_key)))
+    providers.append(("wttr.in", partial(fetch_wttr, base_url=base_url)))
+    return providers
+
+
+def merge_weather(results):
+    """
+    Gabungkan hasil beberapa provider: nilai provider berprioritas tinggi
+    dipakai, kolom 'N/A' diisi dari provider lain.
+    """
+    merged = {}
+    for name, data in results:
+        for key, value in data.items():
+            if merged.get(key, 'N/A') == 'N/A':
+                merged[key] = value
+    merged['source'] = "+".join(name for name, _ in results)
+    return merged
+
+
+def fetch_weather_concurrent(session, lat, lon, providers, deadline=DEFAULT_DEADLINE, merge=False):
+    """
+    Jalankan semua provider secara bersamaan di bawah satu batas waktu total.
+
+    merge=False: kembalikan hasil valid pertama yang tiba dan batalkan sisanya.
+    merge=True: kumpulkan semua hasil yang tiba sebelum deadline lalu gabungkan.
+    None jika tidak ada provider yang berhasil sebelum deadline.
+    """
+    end = time.monotonic() + deadline
+    futures = {
+        _provider_pool.submit(func, session, lat, lon, deadline): (priority, name)
+        for priority, (name, func) in enumerate(providers)
+    }
+    pending = set(futures)
+    results = []
+
+    while pending:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            priority, name = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"{name} failed: {e}")
+                continue
+            if data:
+                results.append((priority, name, data))
+        if results and not merge:
+            break
+
+    # Provider yang belum mulai dibatalkan; yang sedang berjalan dibatasi timeout-nya
+    for future in pending:
+        future.cancel()
+
+    if not results:
+        return None
+    results.sort(key=lambda item: item[0])
+    if merge:
+        return merge_weather([(name, data) for _, name, data in results])
+    _, name, data = results[0]
+    return {**data, 'source': name}
+
+
+class WeatherClient:
+    """
+    Klien cuaca multi-provider dengan session bersama, cache TTL di memori
+    dan tier SQLite opsional (stale-while-revalidate).
+    """
+
+    def __init__(self, base_url=WTTR_BASE_URL, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL,
+                 db_path=None, coord_precision=2, deadline=DEFAULT_DEADLINE, session=None,
+                 providers=None, merge=False):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.db_path = db_path
+        self.coord_precision = coord_precision
+        self.deadline = deadline
+        self.session = session or create_session()
+        self.providers = providers if providers is not None else default_providers(self.base_url)
+        self.merge = merge
+
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "stale_served": 0, "fetches": 0, "errors": 0}
+
+        if self.db_path:
+            self._init_db()
+
+    # --- Kunci & penyimpanan ---
+
+    def cache_key(self, lat, lon):
+        return f"{round(float(lat), self.coord_precision)},{round(float(lon), self.coord_precision)}"
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS weather_cache ("
+                "key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+
+    def _db_get(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT fetched_at, payload FROM weather_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row:
+                return row[0], json.loads(row[1])
+        except sqlite3.Error as e:
+            print(f"Weather cache read failed: {e}")
+        return None
+
+    def _db_put(self, key, fetched_at, data):
+        if not self.db_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO weather_cache (key, fetched_at, payload) VALUES (?, ?, ?)",
+                    (key, fetched_at, json.dumps(data)),
+                )
+        except sqlite3.Error as e:
+            print(f"Weather cache write failed: {e}")
+
+    def _store(self, key, data):
+        fetched_at = time.time()
+        with self._lock:
+            self._memory[key] = (fetched_at, data)
+        self._db_put(key, fetched_at, data)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None:
+            self.stats["memory_hits"] += 1
+            return entry
+        entry = self._db_get(key)
+        if entry is not None:
+            self.stats["db_hits"] += 1
+            with self._lock:
+                self._memory[key] = entry
+        return entry
+
+    # --- Pengambilan data ---
+
+    def fetch(self, lat, lon):
+        """
+        Ambil langsung dari semua provider secara bersamaan (tanpa cache).
+        None jika tidak ada yang berhasil sebelum deadline.
+        """
+        self.stats["fetches"] += 1
+        data = fetch_weather_concurrent(
+            self.session, lat, lon, self.providers, deadline=self.deadline, merge=self.merge
+        )
+        if data is None:
+            self.stats["errors"] += 1
+        return data
+
+    def _refresh(self, key, lat, lon):
+        try:
+            data = self.fetch(lat, lon)
+            if data is not None:
+                self._store(key, data)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_in_background(self, key, lat, lon):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, lat, lon), daemon=True).start()
+
+    def get(self, lat, lon):
+        """
+        Data cuaca untuk koordinat (dibulatkan). Data segar langsung dikembalikan;
+        data kedaluwarsa tapi masih dalam stale_ttl dikembalikan sambil diperbarui
+        di latar belakang. None jika tidak ada data sama sekali.
+        """
+        key = self.cache_key(lat, lon)
+        q_lat, q_lon = key.split(",")
+        entry = self._lookup(key)
+
+        if entry is not None:
+            fetched_at, data = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                return data
+            if age < self.stale_ttl:
+                self.stats["stale_served"] += 1
+                self._refresh_in_background(key, q_lat, q_lon)
+                return data
+
+        data = self.fetch(q_lat, q_lon)
+        if data is not None:
+            self._store(key, data)
+            return data
+        # API gagal: lebih baik data lama daripada tidak ada
+        return entry[1] if entry is not None else None
+
+    def refresh(self, lat, lon):
+        """
+        Paksa ambil ulang dan simpan ke cache (dipakai oleh prefetcher)
+        """
+        key = self.cache_key(lat, lon)
+        q_lat, q_lon = key.split(",")
+        data = self.fetch(q_lat, q_lon)
+        if data is not None:
+            self._store(key, data)
+        return data
+
+    def age(self, lat, lon):
+        """
+        Umur data di cache memori dalam detik (None jika belum ada)
+        """
+        with self._lock:
+            entry = self._memory.get(self.cache_key(lat, lon))
+        return None if entry is None else time.time() - entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM weather_cache")
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_default_client():
+    """
+    Klien cuaca bersama untuk seluruh proses
+    """
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = WeatherClient(db_path=WEATHER_DB_PATH or None)
+        return _default_client
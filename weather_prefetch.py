@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from locations import get_observation_posts
+from utils import calculate_sunset_utc
+from weather import get_default_client
+
+# Mulai menghangatkan cache sebelum maghrib lokal (jendela puncak ~30 menit sebelum maghrib)
+DEFAULT_LEAD_MINUTES = 60
+# Tetap diperbarui sampai sesudah maghrib selama rukyat berlangsung
+DEFAULT_TAIL_MINUTES = 30
+DEFAULT_POLL_SECONDS = 60
+
+
+class WeatherPrefetcher:
+    """
+    Penjadwal yang memperbarui cache cuaca setiap pos observasi menjelang
+    maghrib lokal, sehingga permintaan interaktif dilayani dari data hangat.
+    """
+
+    def __init__(self, client=None, lead_minutes=DEFAULT_LEAD_MINUTES, tail_minutes=DEFAULT_TAIL_MINUTES,
+                 poll_seconds=DEFAULT_POLL_SECONDS, refresh_seconds=None, max_workers=4):
+        self.client = client or get_default_client()
+        self.lead = timedelta(minutes=lead_minutes)
+        self.tail = timedelta(minutes=tail_minutes)
+        self.poll_seconds = poll_seconds
+        # Perbarui sebelum TTL habis agar tidak ada permintaan yang jatuh ke cache dingin
+        self.refresh_seconds = refresh_seconds or max(self.client.ttl * 0.8, 60)
+        self.max_workers = max_workers
+        self.stats = {"cycles": 0, "refreshed": 0, "failed": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def prefetch_window(self, lat, lon, now):
+        """
+        Jendela prefetch (UTC) di sekitar maghrib lokal hari ini
+        """
+        sunset = calculate_sunset_utc(lat, lon, now)
+        if sunset is None:
+            return None
+        # Maghrib yang sudah lewat -> pakai maghrib berikutnya
+        if sunset + self.tail < now:
+            sunset = calculate_sunset_utc(lat, lon, now + timedelta(days=1))
+        return sunset - self.lead, sunset + self.tail
+
+    def due_posts(self, now=None):
+        """
+        Pos yang sedang dalam jendela prefetch dan datanya perlu diperbarui
+        """
+        now = now or datetime.utcnow()
+        due = []
+        for name, post in get_observation_posts().items():
+            window = self.prefetch_window(post["lat"], post["lon"], now)
+            if window is None or not (window[0] <= now <= window[1]):
+                continue
+            age = self.client.age(post["lat"], post["lon"])
+            if age is None or age >= self.refresh_seconds:
+                due.append((name, post))
+        return due
+
+    def _refresh_post(self, item):
+        name, post = item
+        try:
+            return self.client.refresh(post["lat"], post["lon"]) is not None
+        except Exception as e:
+            print(f"Weather prefetch for {name} failed: {e}")
+            return False
+
+    def run_once(self, now=None):
+        """
+        Satu siklus: perbarui semua pos yang jatuh tempo (paralel terbatas)
+        """
+        due = self.due_posts(now)
+        if due:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="weather-prefetch") as pool:
+                for ok in pool.map(self._refresh_post, due):
+                    self.stats["refreshed" if ok else "failed"] += 1
+        self.stats["cycles"] += 1
+        return [name for name, _ in due]
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Weather prefetch cycle failed: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="weather-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def start_weather_prefetcher(**kwargs):
+    """
+    Jalankan satu prefetcher bersama untuk seluruh proses
+    """
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = WeatherPrefetcher(**kwargs)
+        return _prefetcher.start()
+
+
+if __name__ == "__main__":
+    prefetcher = WeatherPrefetcher()
+    now = datetime.utcnow()
+    for name, post in get_observation_posts().items():
+        window = prefetcher.prefetch_window(post["lat"], post["lon"], now)
+        print(f"{name}: prefetch window {window}")
+    print(f"Due now: {prefetcher.run_once(now)}")